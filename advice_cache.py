@@ -0,0 +1,153 @@
+"""
+Cache of LLM trading advice.
+
+Advice is keyed on the symbol, the normalized question and the market
+state quantized into buckets (price band in pips, RSI band, MACD sign and
+magnitude), so asking the same thing about an essentially unchanged
+market is answered without another completion. Pip bands use the same
+pip size as the pip distances shown with the advice
+(llm_advice.pip_size). Entries expire after `ttl` seconds, the in-memory
+copy is LRU-bounded, and everything is backed by a small SQLite file so
+restarts and sibling processes share it. Expired rows are deleted every
+`sweep_every` writes.
+"""
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from llm_advice import pip_size
+
+
+def normalize_question(question):
+    return ' '.join(re.sub(r'[^a-z0-9/]+', ' ', question.lower()).split())
+
+
+class AdviceCache:
+    """TTL + LRU advice cache with an SQLite backing store"""
+
+    def __init__(self, path=None, ttl=300.0, max_entries=1000, price_pips=20, rsi_step=5.0, macd_pips=5,
+                 sweep_every=100):
+        self.path = path or os.getenv(
+            'ADVICE_CACHE_PATH',
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'advice_cache.sqlite')
+        )
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.price_pips = price_pips
+        self.rsi_step = rsi_step
+        self.macd_pips = macd_pips
+        self.sweep_every = sweep_every
+        self._entries = OrderedDict()
+        # Guards the in-memory entries and counters; SQLite has its own lock
+        # so a slow disk never holds up a memory hit
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        self._puts = 0
+        self.counters = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+
+    def buckets(self, symbol, price, rsi, macd, predicted=None):
+        """Quantized market state; prices/MACD in pip bands of symbol, RSI in rsi_step bands"""
+        pip = pip_size(symbol)
+        state = [
+            math.floor(price / (pip * self.price_pips)),
+            None if math.isnan(rsi) else math.floor(rsi / self.rsi_step),
+            None if math.isnan(macd) else (int(math.copysign(1, macd)) if macd else 0),
+            None if math.isnan(macd) else math.floor(abs(macd) / (pip * self.macd_pips)),
+        ]
+        if predicted is not None:
+            state.append(math.floor(predicted / (pip * self.price_pips)))
+        return tuple(state)
+
+    def key(self, symbol, question, price, rsi, macd, predicted=None):
+        raw = f"{symbol.upper().replace('/', '')}|{normalize_question(question)}|{self.buckets(symbol, price, rsi, macd, predicted)}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def _connect(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS advice (key TEXT PRIMARY KEY, created REAL, advice TEXT)')
+        return self._db
+
+    def get(self, key):
+        """Cached advice for key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return entry[1]
+                del self._entries[key]
+                self.counters['expired'] += 1
+        try:
+            with self._db_lock:
+                row = self._connect().execute(
+                    'SELECT created, advice FROM advice WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error as e:
+            print("Error reading advice cache:", str(e))
+            row = None
+        with self._lock:
+            if row is not None and now - row[0] < self.ttl:
+                self._remember(key, row)
+                self.counters['disk_hits'] += 1
+                return row[1]
+            self.counters['misses'] += 1
+            return None
+
+    def put(self, key, advice):
+        entry = (time.time(), advice)
+        with self._lock:
+            self._remember(key, entry)
+            self._puts += 1
+            sweep = self._puts % self.sweep_every == 0
+        try:
+            with self._db_lock:
+                db = self._connect()
+                with db:
+                    db.execute('INSERT OR REPLACE INTO advice VALUES (?, ?, ?)', (key, *entry))
+                    if sweep:
+                        db.execute('DELETE FROM advice WHERE created < ?', (entry[0] - self.ttl,))
+        except sqlite3.Error as e:
+            print("Error saving advice cache:", str(e))
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters, entries=len(self._entries))
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_advice_cache():
+    """Process-wide cache configured from ADVICE_CACHE_* environment variables"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = AdviceCache(
+                    ttl=float(os.getenv('ADVICE_CACHE_TTL', '300')),
+                    max_entries=int(os.getenv('ADVICE_CACHE_MAX_ENTRIES', '1000')),
+                    price_pips=float(os.getenv('ADVICE_CACHE_PRICE_PIPS', '20')),
+                    rsi_step=float(os.getenv('ADVICE_CACHE_RSI_STEP', '5')),
+                    macd_pips=float(os.getenv('ADVICE_CACHE_MACD_PIPS', '5')),
+                )
+    return _default_cache
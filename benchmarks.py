@@ -0,0 +1,420 @@
+"""
+Offline microbenchmarks for the refresh-cycle hot paths.
+
+Each benchmark times one hot path over synthetic (seeded random-walk) or
+recorded bar series. It reports the median and best time per call and
+the peak memory allocated during a call. Network-bound paths run against
+the local Binance/Frankfurter stand-ins in stub_servers.py, and the Flask
+routes go through the test client. Results are saved as JSON baselines;
+`compare` flags benchmarks that got slower (or allocate more) than a
+baseline by more than a threshold.
+
+Usage:
+    python benchmarks.py run --json baseline.json
+    python benchmarks.py run --sizes 100,10000,1000000 --only indicators
+    python benchmarks.py run --csv btc_1m.csv --compare baseline.json
+    python benchmarks.py compare baseline.json current.json --threshold 0.25
+"""
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+import indicators
+
+DEFAULT_SIZES = (100, 10_000, 100_000)
+MIN_TIME = 0.3
+MAX_RUNS = 50
+BAR_SECONDS = 60
+
+# name -> (setup(ctx, n) -> fn, sized, options)
+BENCHMARKS = {}
+
+
+def benchmark(name, sized=True, max_size=None, runs=None, warmup=True):
+    """
+    Register setup(ctx, n) returning the function to time. Sized
+    benchmarks run once per --sizes entry (up to max_size); runs fixes
+    the number of timed calls for slow paths.
+    """
+    def register(setup):
+        BENCHMARKS[name] = (setup, sized, {'max_size': max_size, 'runs': runs, 'warmup': warmup})
+        return setup
+    return register
+
+
+class Context:
+    """Temp directories, input series and stub upstreams shared by the benchmarks"""
+
+    def __init__(self, csv_path=None, seed=0):
+        self.root = tempfile.mkdtemp(prefix='bench-')
+        self.seed = seed
+        self.recorded = load_csv(csv_path) if csv_path else None
+        self._servers = None
+        self._web_api = None
+
+    def bars(self, n):
+        """(timestamps, opens, highs, lows, closes) with n rows"""
+        if self.recorded is not None:
+            return tuple(column[-n:] for column in self.recorded)
+        rng = np.random.default_rng(self.seed)
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, n)))
+        opens = np.concatenate(([closes[0]], closes[:-1]))
+        spread = np.abs(rng.normal(0, 5e-4, n)) * closes
+        timestamps = 1_700_000_000 + np.arange(n, dtype=np.int64) * BAR_SECONDS
+        return timestamps, opens, np.maximum(opens, closes) + spread, np.minimum(opens, closes) - spread, closes
+
+    def frame(self, n):
+        """n bars as the DataFrame the desktop app builds, read back through a bar store"""
+        from bar_store import BarStore
+        store = BarStore(self.path('frames', str(n), 'x'))
+        if store.count('BTCUSD') == 0:
+            store.append_bars('BTCUSD', *self.bars(n))
+        return store.frame('BTCUSD', n)
+
+    def path(self, *parts):
+        path = os.path.join(self.root, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def upstreams(self):
+        if self._servers is None:
+            import stub_servers
+            self._servers = stub_servers.start_upstreams()
+        return self._servers
+
+    def web_api(self):
+        """web_api imported against the stubs, with its stores in the temp directory"""
+        if self._web_api is None:
+            import stub_servers
+            os.environ.update(stub_servers.upstream_env(self.upstreams()))
+            os.environ.update(BAR_STORE_DIR=self.path('api', 'bars'), MODEL_CACHE_DIR=self.path('api', 'models'),
+                              ADVICE_CACHE_PATH=self.path('api', 'advice.sqlite'), WARM_UP='0')
+            import web_api
+            self._web_api = web_api
+        return self._web_api
+
+    def close(self):
+        if self._servers is not None:
+            import stub_servers
+            stub_servers.stop_upstreams(self._servers)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def load_csv(path):
+    """Recorded bars from a CSV with a close column (open/high/low/timestamp optional)"""
+    import pandas as pd
+    df = pd.read_csv(path)
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    closes = df['close'].to_numpy(dtype=np.float64)
+    opens = df['open'].to_numpy(dtype=np.float64) if 'open' in df else np.concatenate(([closes[0]], closes[:-1]))
+    highs = df['high'].to_numpy(dtype=np.float64) if 'high' in df else np.maximum(opens, closes)
+    lows = df['low'].to_numpy(dtype=np.float64) if 'low' in df else np.minimum(opens, closes)
+    timestamps = 1_700_000_000 + np.arange(len(closes), dtype=np.int64) * BAR_SECONDS
+    return timestamps, opens, highs, lows, closes
+
+
+# Indicators and features
+
+@benchmark('indicators.run')
+def bench_indicators_run(ctx, n):
+    closes = ctx.bars(n)[4]
+    return lambda: indicators.run(closes)
+
+
+@benchmark('StoreIndicators.latest')
+def bench_store_indicators(ctx, n):
+    # Steady-state refresh: history already folded in, only the live bar is recomputed
+    from bar_store import BarStore
+    store = BarStore(ctx.path('indicators', str(n), 'x'))
+    store.append_bars('BTCUSD', *ctx.bars(n))
+    state = indicators.StoreIndicators(store)
+    state.latest('BTCUSD')
+    return lambda: state.latest('BTCUSD')
+
+
+@benchmark('FeatureMatrix')
+def bench_features(ctx, n):
+    from features import FeatureMatrix
+    closes = ctx.bars(n)[4]
+    return lambda: FeatureMatrix(closes)
+
+
+@benchmark('predict_next_price', sized=False, runs=1, warmup=False)
+def bench_predict(ctx, n):
+    import predictor
+    closes = ctx.bars(100)[4]
+    return lambda: predictor.predict_next_price(closes, cpus=1)
+
+
+@benchmark('predict_next_price (cached)', sized=False, runs=3)
+def bench_predict_cached(ctx, n):
+    # Parameters come from the model cache; the cached forest is warm-refit with the new bar
+    import predictor
+    from model_cache import ModelCache
+    timestamps, _, _, _, closes = ctx.bars(101)
+    cache = ModelCache(ctx.path('models', 'x'))
+    predictor.predict_next_price(closes[:-1], cpus=1, symbol='BTCUSD', timestamp=int(timestamps[-2]), cache=cache)
+    return lambda: predictor.predict_next_price(closes, cpus=1, symbol='BTCUSD', timestamp=int(timestamps[-1]),
+                                                cache=cache)
+
+
+# Data access
+
+@benchmark('MarketDataClient.quote', sized=False)
+def bench_quote(ctx, n):
+    import stub_servers
+    from bar_store import BarStore
+    from market_data import MarketDataClient
+    env = stub_servers.upstream_env(ctx.upstreams())
+    client = MarketDataClient(env['BINANCE_API_URL'], env['FRANKFURTER_API_URL'],
+                              store=BarStore(ctx.path('quote', 'x')))
+    return lambda: client.quote('BTCUSD')
+
+
+@benchmark('bars_frame')
+def bench_bars_frame(ctx, n):
+    # What the desktop app builds from the store on every refresh (TradingAssistant.bars_frame)
+    from bar_store import BarStore
+    store = BarStore(ctx.path('frame', str(n), 'x'))
+    store.append_bars('BTCUSD', *ctx.bars(n))
+    return lambda: store.frame('BTCUSD', n)
+
+
+# File analysis
+
+@benchmark('chunk_text')
+def bench_chunk_text(ctx, n):
+    import file_analysis
+    timestamps, _, _, _, closes = ctx.bars(n)
+    text = '\n'.join(f"{t},{c:.5f},some free-form note about this row" for t, c in zip(timestamps, closes))
+    return lambda: file_analysis.chunk_text(text)
+
+
+@benchmark('table_digest.digest_file', runs=None)
+def bench_table_digest(ctx, n):
+    import table_digest
+    path = ctx.path('tables', f'{n}.csv')
+    ctx.frame(n).to_csv(path)
+    return lambda: table_digest.digest_file(path)
+
+
+# Chart
+
+def _renderer(style):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from chart_view import ChartRenderer
+    fig = Figure(figsize=(6, 4), dpi=100)
+    ax = fig.add_subplot(111)
+    canvas = FigureCanvasAgg(fig)
+    colors = {'accent': '#2196f3', 'success': '#4caf50', 'danger': '#f44336'}
+    return ChartRenderer(ax, canvas, colors, style), canvas
+
+
+@benchmark('update_chart (new bar)')
+def bench_chart_full(ctx, n):
+    # Alternating lengths makes every update a structural change: pyramid rebuild + full draw
+    renderer, canvas = _renderer('candlestick')
+    frames = [ctx.frame(n), ctx.frame(n).iloc[:-1]]
+    calls = [0]
+
+    def run():
+        calls[0] += 1
+        renderer.update(frames[calls[0] % 2], 'BTC/USD')
+        canvas.draw()
+    return run
+
+
+@benchmark('update_chart (live bar)')
+def bench_chart_live(ctx, n):
+    renderer, canvas = _renderer('candlestick')
+    base = ctx.frame(n)
+    moved = base.copy()
+    moved.iloc[-1, moved.columns.get_loc('close')] = (base['close'].iloc[-1] + base['open'].iloc[-1]) / 2
+    frames = [base, moved]
+    renderer.update(base, 'BTC/USD')
+    canvas.draw()
+    calls = [0]
+
+    def run():
+        calls[0] += 1
+        renderer.update(frames[calls[0] % 2], 'BTC/USD')
+    return run
+
+
+# Flask routes (test client, stubbed upstreams)
+
+def _route(path, miss):
+    def setup(ctx, n):
+        api = ctx.web_api()
+        client = api.app.test_client()
+        assert client.get(path).status_code == 200, path
+
+        def run():
+            if miss:
+                api.snapshots.invalidate()
+            response = client.get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} returned {response.status_code}")
+        return run
+    return setup
+
+
+for _path in ('/price?symbol=BTCUSD', '/rsi?symbol=BTCUSD', '/prices', '/indicators?symbols=BTCUSD,EURUSD'):
+    benchmark(f'GET {_path} (cached)', sized=False)(_route(_path, miss=False))
+    benchmark(f'GET {_path} (miss)', sized=False)(_route(_path, miss=True))
+
+
+# Running
+
+def measure(fn, runs=None, warmup=True, min_time=MIN_TIME, max_runs=MAX_RUNS):
+    """Timing stats and peak traced memory for fn()"""
+    if warmup:
+        fn()
+    times = []
+    started = time.perf_counter()
+    while True:
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+        if runs is not None:
+            if len(times) >= runs:
+                break
+        elif len(times) >= max_runs or (len(times) >= 3 and time.perf_counter() - started >= min_time):
+            break
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'median': statistics.median(times), 'min': min(times), 'runs': len(times), 'peak_kb': peak / 1024}
+
+
+def run(sizes, only=None, csv_path=None):
+    ctx = Context(csv_path)
+    results = {}
+    try:
+        for name, (setup, sized, options) in BENCHMARKS.items():
+            if only and not any(fnmatch.fnmatch(name, f"*{pattern}*") for pattern in only):
+                continue
+            for n in (sizes if sized else [None]):
+                if n is not None and options['max_size'] is not None and n > options['max_size']:
+                    continue
+                key = f"{name}[{n}]" if n is not None else name
+                try:
+                    fn = setup(ctx, n)
+                    result = results[key] = measure(fn, options['runs'], options['warmup'])
+                except Exception as e:
+                    print(f"{key:<52} FAILED: {e}")
+                    continue
+                print(f"{key:<52} {format_time(result['median']):>10} (min {format_time(result['min'])}, "
+                      f"{result['runs']} runs)  peak {result['peak_kb']:9.0f} KB")
+    finally:
+        ctx.close()
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'sizes': list(sizes),
+            'input': os.path.basename(csv_path) if csv_path else 'synthetic',
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=0.2, min_delta=1e-4, memory_threshold=None):
+    """
+    Regressions of current against baseline: benchmarks whose median time
+    grew by more than threshold (and min_delta seconds), or whose memory
+    peak grew by more than memory_threshold (default: threshold) and 64 KB.
+    Returns (lines, regressions).
+    """
+    memory_threshold = threshold if memory_threshold is None else memory_threshold
+    lines, regressions = [], []
+    base_results, results = baseline['results'], current['results']
+    for key in sorted(set(base_results) | set(results)):
+        if key not in results or key not in base_results:
+            lines.append(f"  {key:<52} {'only in baseline' if key not in results else 'new'}")
+            continue
+        old, new = base_results[key], results[key]
+        ratio = new['median'] / old['median'] if old['median'] else float('inf')
+        flags = []
+        if ratio > 1 + threshold and new['median'] - old['median'] > min_delta:
+            flags.append('SLOWER')
+        if new['peak_kb'] > old['peak_kb'] * (1 + memory_threshold) and new['peak_kb'] - old['peak_kb'] > 64:
+            flags.append('MORE MEMORY')
+        if flags:
+            regressions.append(key)
+        lines.append(f"{'!' if flags else ' '} {key:<52} {format_time(old['median']):>10} -> "
+                     f"{format_time(new['median']):>10} ({ratio:5.2f}x)  "
+                     f"{old['peak_kb']:8.0f} -> {new['peak_kb']:8.0f} KB  {' '.join(flags)}")
+    return lines, regressions
+
+
+def format_time(seconds):
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} us"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline microbenchmarks for the refresh-cycle hot paths")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run the benchmarks")
+    run_parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                            help="comma-separated bar counts for sized benchmarks (default 100,10000,100000)")
+    run_parser.add_argument('--only', nargs='+', help="only benchmarks whose name contains one of these")
+    run_parser.add_argument('--csv', help="recorded bars (CSV with a close column) instead of synthetic ones")
+    run_parser.add_argument('--json', help="write results to this file (e.g. a new baseline)")
+    run_parser.add_argument('--compare', help="compare against this baseline when done")
+    run_parser.add_argument('--threshold', type=float, default=0.2, help="regression threshold (default 0.2 = 20%%)")
+
+    compare_parser = commands.add_parser('compare', help="compare two result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.2, help="regression threshold (default 0.2 = 20%%)")
+    compare_parser.add_argument('--min-delta', type=float, default=1e-4,
+                                help="ignore slowdowns smaller than this many seconds (default 0.0001)")
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        current = run([int(s) for s in args.sizes.split(',') if s], args.only, args.csv)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(current, f, indent=2)
+        if not args.compare:
+            return 0
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        lines, regressions = compare(baseline, current, args.threshold)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        lines, regressions = compare(baseline, current, args.threshold, args.min_delta)
+    print('\n'.join(lines))
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}" if regressions else "No regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
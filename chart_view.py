@@ -0,0 +1,281 @@
+"""
+Incremental price chart for the Tk app.
+
+The line and the candles are created once and their data replaced in
+place on refresh instead of clearing the axes. All candles are one
+PolyCollection of bodies plus one LineCollection of wicks, colored per
+bar. The newest bar (the one still forming) is drawn by separate
+animated artists: when a refresh only changes that bar, the rest of the
+chart is restored from a cached bitmap and just the live bar is redrawn
+and blitted. The full chart is redrawn only when a bar is added, the
+style or symbol changes, or the view is zoomed, and then only the bars
+inside the visible range are handed to the collections.
+
+Long histories go through a level-of-detail pyramid: level k merges
+2**k consecutive bars into one (first open, max high, min low, last
+close). Each redraw picks the coarsest level that still gives every
+candle MIN_CANDLE_PX pixels, or every pixel column a min/max pair of line
+points. The number of drawn points is therefore bounded by the axes
+width, not by how many bars are in view.
+"""
+import numpy as np
+import matplotlib.dates as mdates
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba
+
+# Body width as a fraction of the bar spacing
+BODY_WIDTH = 0.8
+Y_MARGIN = 0.05
+MIN_CANDLE_PX = 3
+# Line LOD buckets per pixel; each bucket is drawn as its min and max
+LINE_BUCKETS_PER_PX = 1
+
+
+class LodPyramid:
+    """Bars merged pairwise into coarser levels; bar i of level k spans base bars [i * 2**k, (i+1) * 2**k)"""
+
+    def __init__(self, x, opens, highs, lows, closes):
+        self.levels = [(x, opens, highs, lows, closes)]
+        while len(x) > 1:
+            starts = np.arange(0, len(x), 2)
+            ends = np.minimum(starts + 2, len(x)) - 1
+            x, opens, highs, lows, closes = (
+                x[starts], opens[starts],
+                np.maximum.reduceat(highs, starts), np.minimum.reduceat(lows, starts),
+                closes[ends],
+            )
+            self.levels.append((x, opens, highs, lows, closes))
+
+    def window(self, start, stop, budget):
+        """(level, x, o, h, l, c) covering base bars [start, stop) in at most ~budget bars"""
+        level = 0
+        while level < len(self.levels) - 1 and (stop - start) >> level > budget:
+            level += 1
+        if stop <= start:
+            return (level,) + tuple(column[:0] for column in self.levels[level])
+        lo, hi = start >> level, ((stop - 1) >> level) + 1
+        return (level,) + tuple(column[lo:hi] for column in self.levels[level])
+
+
+class ChartRenderer:
+    def __init__(self, ax, canvas, colors, style='line'):
+        self.ax = ax
+        self.canvas = canvas
+        self.colors = colors
+        self.style = style
+        self.title = None
+        self.x = np.empty(0)
+        self.ohlc = np.empty((0, 4))
+        self.spacing = 1 / 288
+        self.zoomed = False
+        self._background = None
+        self._pyramids = {}
+        self.lod_level = 0
+
+        self.line, = ax.plot([], [], color=colors['accent'], linewidth=2)
+        self.live_line, = ax.plot([], [], color=colors['accent'], linewidth=2, animated=True)
+        self.bodies = PolyCollection([], linewidths=0)
+        self.wicks = LineCollection([], linewidths=1)
+        self.live_body = PolyCollection([], linewidths=0, animated=True)
+        self.live_wick = LineCollection([], linewidths=1, animated=True)
+        for collection in (self.bodies, self.wicks, self.live_body, self.live_wick):
+            ax.add_collection(collection, autolim=False)
+
+        ax.xaxis_date()
+        ax.set_xlabel('Time')
+        ax.set_ylabel('Price')
+        ax.grid(True, alpha=0.3)
+        ax.figure.autofmt_xdate()
+        ax.callbacks.connect('xlim_changed', self._on_xlim_changed)
+        canvas.mpl_connect('draw_event', self._on_draw)
+
+    @property
+    def live_artists(self):
+        if self.style == 'candlestick':
+            return (self.live_body, self.live_wick)
+        return (self.live_line,)
+
+    def set_style(self, style):
+        if style != self.style:
+            self.style = style
+            if not self.zoomed:
+                self._autoscale()
+            self._set_static(self._visible_slice())
+            self._set_live()
+            self.canvas.draw_idle()
+
+    def set_colors(self, colors):
+        if colors is not self.colors:
+            self.colors = colors
+            self.line.set_color(colors['accent'])
+            self.live_line.set_color(colors['accent'])
+            self._set_static(self._visible_slice())
+            self._set_live()
+            self.canvas.draw_idle()
+
+    def update(self, df, title):
+        """Show the bars in df (open/high/low/close indexed by time), redrawing as little as possible"""
+        x = mdates.date2num(df.index.values)
+        ohlc = df[['open', 'high', 'low', 'close']].to_numpy(dtype=np.float64)
+        live_only = (
+            title == self.title and len(x) == len(self.x) and len(x) > 0
+            and x[-1] == self.x[-1] and np.array_equal(ohlc[:-1], self.ohlc[:-1])
+        )
+        self.x, self.ohlc = x, ohlc
+        if not live_only:
+            self.spacing = float(np.median(np.diff(x))) if len(x) > 1 else 1 / 288
+            self._pyramids = {}
+        if title != self.title:
+            self.title = title
+            self.ax.set_title(title)
+            self.zoomed = False
+        if live_only and self._background is not None and self._live_in_view():
+            self._set_live()
+            self._blit_live()
+            return
+        if not self.zoomed:
+            self._autoscale()
+        self._set_static(self._visible_slice())
+        self._set_live()
+        self.canvas.draw_idle()
+
+    def zoom(self, factor):
+        """Zoom around the center of the current view"""
+        x0, x1 = self.ax.get_xlim()
+        y0, y1 = self.ax.get_ylim()
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        rx, ry = (x1 - x0) / factor / 2, (y1 - y0) / factor / 2
+        self.zoomed = True
+        self.ax.set_xlim(cx - rx, cx + rx)
+        self.ax.set_ylim(cy - ry, cy + ry)
+        self.canvas.draw_idle()
+
+    def reset_zoom(self):
+        self.zoomed = False
+        self._autoscale()
+        self.canvas.draw_idle()
+
+    def _autoscale(self):
+        if not len(self.x):
+            return
+        self.ax.set_xlim(self.x[0] - self.spacing, self.x[-1] + self.spacing)
+        self._autoscale_y(slice(0, len(self.x)))
+
+    def _autoscale_y(self, window):
+        if self.style == 'candlestick':
+            lows, highs = self.ohlc[window, 2], self.ohlc[window, 1]
+        else:
+            lows = highs = self.ohlc[window, 3]
+        if not len(lows) or np.all(np.isnan(lows)):
+            return
+        low, high = np.nanmin(lows), np.nanmax(highs)
+        pad = (high - low) * Y_MARGIN or abs(high) * 1e-4 or 1.0
+        self.ax.set_ylim(low - pad, high + pad)
+
+    def _visible_slice(self):
+        x0, x1 = self.ax.get_xlim()
+        start = int(np.searchsorted(self.x, x0 - self.spacing, side='left'))
+        stop = int(np.searchsorted(self.x, x1 + self.spacing, side='right'))
+        return slice(start, stop)
+
+    def _on_xlim_changed(self, ax):
+        if len(self.x):
+            self._set_static(self._visible_slice())
+
+    def _pyramid(self):
+        """LOD pyramid of the completed bars for the current style, built on first use"""
+        pyramid = self._pyramids.get(self.style)
+        if pyramid is None:
+            x, ohlc = self.x[:-1], self.ohlc[:-1]
+            if self.style == 'candlestick':
+                pyramid = LodPyramid(x, *ohlc.T)
+            else:
+                # The line follows closes at every level, so merged bars keep the close's range
+                closes = ohlc[:, 3]
+                pyramid = LodPyramid(x, closes, closes, closes, closes)
+            self._pyramids[self.style] = pyramid
+        return pyramid
+
+    def _set_static(self, window):
+        """Data for the completed bars in window (everything but the live bar)"""
+        candles = self.style == 'candlestick'
+        self.line.set_visible(not candles)
+        self.bodies.set_visible(candles)
+        self.wicks.set_visible(candles)
+        width_px = max(self.ax.bbox.width, 1)
+        budget = width_px / MIN_CANDLE_PX if candles else width_px * LINE_BUCKETS_PER_PX
+        stop = min(window.stop, len(self.x) - 1)
+        level, x, o, h, l, c = self._pyramid().window(window.start, stop, int(budget))
+        span = self.spacing * (1 << level)
+        if candles:
+            # Center merged candles on the bars they cover
+            verts, segments, colors = self._candles(x + span / 2 - self.spacing / 2, o, h, l, c, span)
+            self.bodies.set_verts(verts)
+            self.bodies.set_facecolors(colors)
+            self.wicks.set_segments(segments)
+            self.wicks.set_colors(colors)
+            self.line.set_data([], [])
+        elif level == 0:
+            self.line.set_data(x, c)
+        else:
+            # Each merged bar becomes its extremes, in the order the bar's direction suggests
+            rising = c >= o
+            first, second = np.where(rising, l, h), np.where(rising, h, l)
+            xs = np.column_stack([x, x + span / 2]).ravel()
+            ys = np.column_stack([first, second]).ravel()
+            self.line.set_data(xs, ys)
+        if not candles:
+            self.bodies.set_verts([])
+            self.wicks.set_segments([])
+        self.lod_level = level
+
+    def _set_live(self):
+        for artist in (self.live_line, self.live_body, self.live_wick):
+            artist.set_visible(False)
+        if not len(self.x):
+            return
+        last = len(self.x) - 1
+        if self.style == 'candlestick':
+            verts, segments, colors = self._candles(self.x[last:], *self.ohlc[last:].T, self.spacing)
+            self.live_body.set_verts(verts)
+            self.live_body.set_facecolors(colors)
+            self.live_wick.set_segments(segments)
+            self.live_wick.set_colors(colors)
+        else:
+            # Start at the previous close so the live segment joins the static line
+            start = max(last - 1, 0)
+            self.live_line.set_data(self.x[start:], self.ohlc[start:, 3])
+        for artist in self.live_artists:
+            artist.set_visible(True)
+
+    def _candles(self, x, o, h, l, c, spacing):
+        """Vectorized body polygons, wick segments and colors for candles `spacing` apart"""
+        half = spacing * BODY_WIDTH / 2
+        bottom, top = np.minimum(o, c), np.maximum(o, c)
+        verts = np.stack([
+            np.column_stack([x - half, bottom]),
+            np.column_stack([x - half, top]),
+            np.column_stack([x + half, top]),
+            np.column_stack([x + half, bottom]),
+        ], axis=1)
+        segments = np.stack([np.column_stack([x, l]), np.column_stack([x, h])], axis=1)
+        colors = np.where((c >= o)[:, None], [to_rgba(self.colors['success'])], [to_rgba(self.colors['danger'])])
+        return verts, segments, colors
+
+    def _live_in_view(self):
+        y0, y1 = self.ax.get_ylim()
+        x0, x1 = self.ax.get_xlim()
+        _, high, low, _ = self.ohlc[-1]
+        return x0 <= self.x[-1] <= x1 and y0 <= low and high <= y1
+
+    def _on_draw(self, event):
+        # Full redraws skip the animated live artists; remember the result, then add them on top
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        for artist in self.live_artists:
+            self.ax.draw_artist(artist)
+
+    def _blit_live(self):
+        self.canvas.restore_region(self._background)
+        for artist in self.live_artists:
+            self.ax.draw_artist(artist)
+        self.canvas.blit(self.ax.bbox)
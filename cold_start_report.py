@@ -0,0 +1,98 @@
+"""
+Cold/warm latency of the serverless handlers in web-frontend/api.
+
+Each handler is loaded in a fresh Python process, as a new container
+would load it: "import" is the module import, "cold" the first
+invocation (connections, bar store backfill, indicator warm-up) and
+"warm" the median of the following invocations in the same process.
+The modules each handler pulled in are listed so heavy imports on a
+path stand out.
+
+Point BINANCE_API_URL / FRANKFURTER_API_URL at stub servers to measure
+without the real upstreams.
+
+Usage:
+    python cold_start_report.py
+    python cold_start_report.py --handlers price rsi --warm 50 --json cold_start.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web-frontend', 'api')
+HEAVY_MODULES = ('pandas', 'ta', 'openai', 'sklearn', 'matplotlib', 'dotenv')
+
+# Runs inside the child process; prints one JSON line
+PROBE = """
+import json, statistics, sys, time
+from types import SimpleNamespace
+sys.path.insert(0, {api_dir!r})
+before = set(sys.modules)
+start = time.perf_counter()
+module = __import__({handler!r})
+imported = time.perf_counter() - start
+request = SimpleNamespace(method={method!r}, args={args!r}, json={body!r})
+timings = []
+status = None
+for _ in range({calls}):
+    start = time.perf_counter()
+    status = module.handler(request)[1]
+    timings.append(time.perf_counter() - start)
+loaded = sorted({{name.split('.')[0] for name in set(sys.modules) - before}})
+print(json.dumps({{'import': imported, 'cold': timings[0], 'warm': statistics.median(timings[1:]) if len(timings) > 1 else None,
+                  'status': status, 'heavy': [m for m in loaded if m in {heavy!r}]}}))
+"""
+
+REQUESTS = {
+    'index': ('GET', {}, None),
+    'price': ('GET', {'symbol': 'BTCUSD'}, None),
+    'rsi': ('GET', {'symbol': 'BTCUSD'}, None),
+    'advice': ('POST', {}, {'symbol': 'BTCUSD', 'question': 'Should I buy?'}),
+}
+
+
+def measure(handler, warm_calls=20):
+    method, args, body = REQUESTS[handler]
+    code = PROBE.format(api_dir=API_DIR, handler=handler, method=method, args=args, body=body,
+                        calls=warm_calls + 1, heavy=HEAVY_MODULES)
+    env = dict(os.environ)
+    # A fresh /tmp store per run, like a new container
+    env.setdefault('BAR_STORE_DIR', tempfile.mkdtemp(prefix='bars-'))
+    env.setdefault('ADVICE_CACHE_PATH', os.path.join(tempfile.mkdtemp(prefix='advice-'), 'advice.sqlite'))
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, cwd=API_DIR)
+    lines = [line for line in result.stdout.splitlines() if line.startswith('{')]
+    if result.returncode != 0 or not lines:
+        raise RuntimeError(f"{handler} probe failed:\n{result.stderr.strip()}")
+    return json.loads(lines[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold/warm latency of the serverless handlers")
+    parser.add_argument('--handlers', nargs='+', default=['index', 'price', 'rsi'], choices=sorted(REQUESTS),
+                        help="handlers to measure (default index price rsi)")
+    parser.add_argument('--warm', type=int, default=20, help="warm invocations after the cold one (default 20)")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'handler':<8} {'import':>9} {'cold':>9} {'warm':>9}  status  heavy imports")
+    for handler in args.handlers:
+        try:
+            r = results[handler] = measure(handler, args.warm)
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            continue
+        warm = f"{r['warm'] * 1000:7.2f}ms" if r['warm'] is not None else '        -'
+        print(f"{handler:<8} {r['import'] * 1000:7.1f}ms {r['cold'] * 1000:7.1f}ms {warm}  {r['status']:>6}  "
+              f"{', '.join(r['heavy']) or '-'}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0 if len(results) == len(args.handlers) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
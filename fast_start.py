@@ -0,0 +1,128 @@
+"""
+Startup timing and background warm-up of heavy imports.
+
+The app modules import pandas, matplotlib, PIL, openai and sklearn where
+they are first needed rather than at the top, so the window (or the
+first request) doesn't wait for them. warm_up() then imports them on a
+daemon thread once the app is responsive, so first use usually finds
+them already loaded. mark() records startup milestones. report() prints
+the milestones along with per-module import times.
+
+The entry modules import this module first, so times count from the top
+of the entry module; only interpreter startup comes before. With
+STARTUP_REPORT=1 every import from then on is timed, eager or lazy: each
+module that wasn't loaded yet is charged the time of its outermost
+import, including whatever it pulled in.
+
+FAST_START=0 imports everything up front instead, which is handy for
+comparing; STARTUP_REPORT=1 prints the report.
+"""
+import builtins
+import importlib
+import os
+import sys
+import threading
+import time
+
+STARTED = time.perf_counter()
+ENABLED = os.getenv('FAST_START', '1') != '0'
+REPORT = os.getenv('STARTUP_REPORT', '0') == '1'
+
+_marks = {}
+_imports = {}
+_lock = threading.Lock()
+# Set while a timed import runs on this thread, so nested imports count towards it
+_importing = threading.local()
+_builtin_import = builtins.__import__
+
+
+def elapsed():
+    return time.perf_counter() - STARTED
+
+
+def mark(label):
+    """Record the first time label is reached; True if this call recorded it"""
+    with _lock:
+        if label in _marks:
+            return False
+        _marks[label] = elapsed()
+        return True
+
+
+def _record_import(name, took):
+    with _lock:
+        _imports.setdefault(name, took)
+
+
+def timed_import(name):
+    """Import a module, recording how long it took if it wasn't loaded yet"""
+    if name in sys.modules:
+        return sys.modules[name]
+    outermost = not getattr(_importing, 'active', False)
+    _importing.active = True
+    start = time.perf_counter()
+    try:
+        module = importlib.import_module(name)
+    except ImportError as e:
+        print(f"Warm-up skipped {name}:", str(e))
+        return None
+    finally:
+        if outermost:
+            _importing.active = False
+    if outermost:
+        _record_import(name, time.perf_counter() - start)
+    return module
+
+
+def _timing_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """builtins.__import__ that records the outermost import of each new module"""
+    if level or name in sys.modules or getattr(_importing, 'active', False):
+        return _builtin_import(name, globals, locals, fromlist, level)
+    _importing.active = True
+    start = time.perf_counter()
+    try:
+        return _builtin_import(name, globals, locals, fromlist, level)
+    finally:
+        _importing.active = False
+        if name in sys.modules:
+            _record_import(name, time.perf_counter() - start)
+
+
+if REPORT:
+    builtins.__import__ = _timing_import
+
+
+def preload(modules):
+    """In eager mode (FAST_START=0), import modules now on the calling thread"""
+    if not ENABLED:
+        for name in modules:
+            timed_import(name)
+
+
+def warm_up(modules, then=None):
+    """Import modules one by one on a daemon thread, then call then() there"""
+    def run():
+        for name in modules:
+            timed_import(name)
+        mark('warm-up done')
+        if then is not None:
+            then()
+
+    thread = threading.Thread(target=run, name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def report(title='Startup'):
+    """Print milestones and module import times (only with STARTUP_REPORT=1)"""
+    if not REPORT:
+        return
+    with _lock:
+        marks = sorted(_marks.items(), key=lambda item: item[1])
+        imports = sorted(_imports.items(), key=lambda item: -item[1])
+    lines = [f"{title} ({'fast start' if ENABLED else 'eager imports'}):"]
+    lines += [f"  {label:<24} {at:7.3f} s" for label, at in marks]
+    if imports:
+        lines.append("  Module imports:")
+        lines += [f"    {name:<22} {took:7.3f} s" for name, took in imports]
+    print('\n'.join(lines))
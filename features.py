@@ -0,0 +1,56 @@
+"""
+Feature pipeline for the price predictor.
+
+The indicator columns are computed once per call over the whole series;
+candidate parameter sets and the live prediction all take row slices of
+the same matrix instead of rebuilding it for each window.
+"""
+import hashlib
+
+import numpy as np
+
+import indicators
+
+FEATURE_COLUMNS = [
+    'time', 'rsi', 'macd', 'sma', 'ema9', 'ema21', 'adx', 'stoch_k', 'cci',
+    'bb_middle', 'bb_upper', 'bb_lower', 'atr', 'ret1', 'ret2', 'ret3'
+]
+
+# Identifies the feature layout; bump FEATURE_VERSION when a column's definition changes
+FEATURE_VERSION = 1
+FEATURE_SCHEMA = hashlib.sha1(
+    f"{FEATURE_VERSION}:{','.join(FEATURE_COLUMNS)}".encode()
+).hexdigest()[:12]
+
+
+class FeatureMatrix:
+    """Feature rows for a close series, with warm-up/NaN rows dropped"""
+
+    def __init__(self, closes):
+        closes = np.asarray(closes, dtype=np.float64)
+        columns = indicators.run(closes)
+        columns['time'] = np.arange(len(closes), dtype=np.float64)
+        X = np.column_stack([columns[name] for name in FEATURE_COLUMNS])
+        valid = ~(np.isnan(X).any(axis=1) | np.isnan(closes))
+        self.X = X[valid]
+        self.close = closes[valid]
+        self.index = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+
+    def __len__(self):
+        return len(self.X)
+
+    def training_set(self, rows):
+        """Features from the last `rows` rows paired with each following close"""
+        X = self.X[-rows:]
+        close = self.close[-rows:]
+        return X[:-1], close[1:]
+
+    def live_row(self):
+        """Newest feature row, shaped for model.predict()"""
+        return self.X[-1:]
+
+    def column(self, name):
+        return self.X[:, self.index[name]]
+
+    def last(self, name):
+        return self.X[-1, self.index[name]]
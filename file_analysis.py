@@ -0,0 +1,170 @@
+"""
+Map-reduce analysis of large text files with GPT-4.
+
+The file is split into chunks that are analyzed concurrently on a
+bounded thread pool (map); failed parts are retried with exponential
+backoff. The per-part analyses, kept in file order, are then merged into
+one summary (reduce). When the partial analyses are too long for one
+request they are merged in groups first, and the group summaries merged
+again, until a single summary remains.
+"""
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+MAP_MODEL = "gpt-4"
+REDUCE_MODEL = "gpt-4"
+SYSTEM_PROMPT = "You are a data analysis expert."
+
+MAX_WORKERS = 8
+RETRIES = 2
+RETRY_BACKOFF = 1.0
+# Characters of partial analyses merged per reduce request
+REDUCE_INPUT_CHARS = 12000
+
+
+def chunk_text(content, max_chunk_size=4000):
+    """Split text on line boundaries into chunks of under max_chunk_size characters"""
+    chunks = []
+    current_chunk = ""
+    for line in content.split('\n'):
+        if len(current_chunk) + len(line) < max_chunk_size:
+            current_chunk += line + '\n'
+        else:
+            chunks.append(current_chunk)
+            current_chunk = line + '\n'
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+
+def _chat(api_key, model, prompt, max_tokens):
+    import llm_advice
+    response = llm_advice.client(api_key).chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=max_tokens
+    )
+    return response.choices[0].message.content
+
+
+def with_retries(fn, retries=RETRIES, backoff=RETRY_BACKOFF, check=None):
+    """Call fn(), retrying failures with jittered exponential backoff"""
+    for attempt in range(retries + 1):
+        if check is not None:
+            check()
+        try:
+            return fn()
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+
+
+def map_chunks(chunks, analyze, workers=MAX_WORKERS, retries=RETRIES, check=None, on_progress=None):
+    """
+    analyze(i, chunk) for every chunk, at most `workers` at a time. Returns
+    the results in chunk order; a part that still fails after `retries`
+    retries yields its exception instead. on_progress(done, total) is
+    called as parts finish; check() raising aborts the remaining parts.
+    """
+    results = [None] * len(chunks)
+    done = 0
+
+    def run(i):
+        try:
+            return with_retries(lambda: analyze(i, chunks[i]), retries, check=check)
+        except Exception as e:
+            if check is not None:
+                check()
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as pool:
+        futures = {pool.submit(run, i): i for i in range(len(chunks))}
+        try:
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                done += 1
+                if on_progress is not None:
+                    on_progress(done, len(chunks))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return results
+
+
+def reduce_analyses(partials, merge, max_chars=REDUCE_INPUT_CHARS, check=None):
+    """Merge a list of analyses with merge(texts) -> text, in groups of at most max_chars"""
+    while len(partials) > 1:
+        if check is not None:
+            check()
+        groups, group, size = [], [], 0
+        for text in partials:
+            if group and size + len(text) > max_chars:
+                groups.append(group)
+                group, size = [], 0
+            group.append(text)
+            size += len(text)
+        groups.append(group)
+        if len(groups) == len(partials):
+            # Every analysis is already max_chars long; merge pairs regardless
+            groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+        partials = [merge(group) if len(group) > 1 else group[0] for group in groups]
+    return partials[0] if partials else ""
+
+
+def analyze_text(content, api_key, workers=MAX_WORKERS, check=None, on_progress=None):
+    """
+    Map-reduce GPT-4 analysis of a text file. Returns the report shown to
+    the user: the merged summary followed by the per-part analyses.
+    """
+    chunks = chunk_text(content)
+    total = len(chunks)
+
+    def analyze(i, chunk):
+        return _chat(api_key, MAP_MODEL,
+                     f"Analyze this text content (part {i+1}/{total}):\n\n{chunk}\n\nProvide insights and summary.",
+                     1000)
+
+    def merge(texts):
+        joined = "\n\n".join(texts)
+        return with_retries(lambda: _chat(
+            api_key, REDUCE_MODEL,
+            "These are analyses of consecutive parts of one file. Merge them into a single coherent "
+            "summary of the whole file: key insights, patterns, anomalies and conclusions. "
+            f"Don't describe the parts separately.\n\n{joined}",
+            1000), check=check)
+
+    results = map_chunks(chunks, analyze, workers, check=check, on_progress=on_progress)
+
+    combined_analysis = ""
+    for i, result in enumerate(results):
+        if isinstance(result, Exception):
+            combined_analysis += f"\nError analyzing part {i+1}: {str(result)}\n"
+        else:
+            combined_analysis += f"\nPart {i+1} Analysis:\n{result}\n"
+    partials = [f"Part {i+1}:\n{result}" for i, result in enumerate(results) if not isinstance(result, Exception)]
+    if len(partials) < 2:
+        return combined_analysis
+    try:
+        summary = reduce_analyses(partials, merge, check=check)
+    except Exception as e:
+        if check is not None:
+            check()
+        return f"Error merging part analyses: {str(e)}\n{combined_analysis}"
+    return f"Summary:\n{summary}\n\n--- Part Analyses ---\n{combined_analysis}"
+
+
+def analyze_digest(digest_text, api_key, check=None):
+    """Single GPT-4 analysis of a table digest built by table_digest"""
+    analysis = with_retries(lambda: _chat(
+        api_key, REDUCE_MODEL,
+        "This is a statistical digest of a tabular data file, computed locally over every row. "
+        "Analyze it: what the data covers, trends, volatility, notable anomalies and, if it is "
+        f"price data, what the indicators suggest.\n\n{digest_text}",
+        1000), check=check)
+    return f"Data Digest:\n{digest_text}\n\nAnalysis:\n{analysis}"
@@ -0,0 +1,129 @@
+"""
+Background task runner for the Tk app.
+
+Work runs on a small thread pool; everything that touches widgets is
+handed back to the Tk thread through a queue the main loop drains every
+few milliseconds (Tk calls from other threads aren't safe). Tasks are
+submitted on a named channel: a new submission supersedes the task
+already running on that channel, whose callbacks are then dropped.
+Cancellation is cooperative - workers call task.check() between stages.
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_MS = 15
+
+
+class TaskCancelled(Exception):
+    """Raised inside a worker whose task was cancelled or superseded"""
+
+
+class Task:
+    def __init__(self, runner, channel):
+        self.runner = runner
+        self.channel = channel
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise TaskCancelled()
+
+    def post(self, callback, *args):
+        """Run callback(*args) on the Tk thread unless this task has been cancelled by then"""
+        self.runner._post(self, callback, args)
+
+
+class TaskRunner:
+    """Thread pool whose results are marshalled back to the Tk main loop"""
+
+    def __init__(self, root, workers=4):
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gui-task')
+        self.tasks = {}
+        self._results = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._poll_id = self.root.after(POLL_MS, self._poll)
+
+    def submit(self, channel, fn, *args, on_done=None, on_error=None):
+        """
+        Run fn(task, *args) in the pool, superseding whatever runs on channel.
+        on_done(result) / on_error(exception) are called on the Tk thread
+        unless the task was cancelled first.
+        """
+        task = Task(self, channel)
+        with self._lock:
+            previous = self.tasks.get(channel)
+            self.tasks[channel] = task
+        if previous is not None:
+            previous.cancel()
+
+        def run():
+            try:
+                result = fn(task, *args)
+            except TaskCancelled:
+                return
+            except Exception as e:
+                if on_error is not None:
+                    task.post(on_error, e)
+                else:
+                    print(f"Error in background task '{channel}':", str(e))
+            else:
+                if on_done is not None:
+                    task.post(on_done, result)
+            finally:
+                task.post(self._finish, task)
+
+        self.executor.submit(run)
+        return task
+
+    def cancel(self, channel):
+        with self._lock:
+            task = self.tasks.pop(channel, None)
+        if task is not None:
+            task.cancel()
+
+    def busy(self, channel):
+        return channel in self.tasks
+
+    def _finish(self, task):
+        with self._lock:
+            if self.tasks.get(task.channel) is task:
+                del self.tasks[task.channel]
+
+    def call_soon(self, callback, *args):
+        """Run callback(*args) on the Tk thread; safe to call from any thread"""
+        self._results.put((None, callback, args))
+
+    def _post(self, task, callback, args):
+        self._results.put((task, callback, args))
+
+    def _poll(self):
+        try:
+            while True:
+                task, callback, args = self._results.get_nowait()
+                if task is not None and task.cancelled:
+                    continue
+                try:
+                    callback(*args)
+                except Exception as e:
+                    print("Error in UI callback:", str(e))
+        except queue.Empty:
+            pass
+        self._poll_id = self.root.after(POLL_MS, self._poll)
+
+    def shutdown(self):
+        with self._lock:
+            tasks = list(self.tasks.values())
+            self.tasks.clear()
+        for task in tasks:
+            task.cancel()
+        self.root.after_cancel(self._poll_id)
+        self.executor.shutdown(wait=False, cancel_futures=True)
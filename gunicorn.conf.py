@@ -0,0 +1,99 @@
+"""
+Production server settings for the API:
+
+    gunicorn -c gunicorn.conf.py web_api:app
+
+Workers are processes, so the CPU-bound routes (indicators, JSON) scale
+with cores. Each worker handles THREADS requests at once (gthread), so a
+slow completion holds one thread, not a whole process. /advice may use
+at most ADVICE_CONCURRENCY of those threads (default half), which keeps
+the rest free for /price and /rsi. The app is imported once in the
+master and forked (preload), and workers share loaded snapshots through
+shared_cache.py, so N workers don't mean N times the upstream requests.
+Workers also publish their metrics to METRICS_DIR, so /metrics on any
+worker reports the whole server.
+
+With gthread every open /stream connection holds one of those threads
+until the client leaves, so a worker accepts at most STREAM_LIMIT
+streams (default a quarter of its threads) and answers 503 beyond that.
+For many subscribers run a second server with WORKER_CLASS=gevent: each
+connection is then a greenlet, and a worker holds up to
+WORKER_CONNECTIONS of them (streams may take all but a tenth). gevent
+must patch the standard library before the app is imported, so that
+mode doesn't preload.
+
+Every setting can be overridden with the environment variable next to it
+or on the gunicorn command line.
+"""
+import glob
+import multiprocessing
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+# One per core by default, capped so small instances don't run out of memory
+workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count(), 4)))
+worker_class = os.getenv('WORKER_CLASS', 'gthread')
+threads = int(os.getenv('THREADS', '8'))
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', '1000'))
+preload_app = worker_class != 'gevent'
+
+# Workers silent for this long are killed and replaced; per-request limits
+# come from the upstream and LLM_TIMEOUT client timeouts
+timeout = int(os.getenv('WORKER_TIMEOUT', '120'))
+# On SIGTERM, in-flight requests get this long to finish
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', '30'))
+# Seconds an idle client connection is kept open
+keepalive = int(os.getenv('KEEPALIVE', '5'))
+# Recycle workers now and then to cap slow memory growth
+max_requests = int(os.getenv('MAX_REQUESTS', '5000'))
+max_requests_jitter = max_requests // 10
+# Heartbeat files in memory, so a slow disk can't make workers look hung
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+accesslog = '-' if os.getenv('ACCESS_LOG', '0') == '1' else None
+
+# The shared cache waits on file locks, which would stall every greenlet in a gevent worker
+os.environ.setdefault('SHARED_CACHE', '0' if worker_class == 'gevent' else '1')
+# A request waiting for a completion slot holds a thread too; turn it away at once
+os.environ.setdefault('ADVICE_QUEUE_TIMEOUT', '0')
+
+# Workers publish their metrics here so /metrics can add them up (see metrics.py)
+if not os.environ.get('METRICS_DIR'):
+    os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='metrics-')
+
+# Threads don't survive fork (and gevent patches them in the worker):
+# import the app with its warm-up off, then start the warm-up in each worker
+_warm_up = os.environ.get('WARM_UP', '1') != '0'
+os.environ['WARM_UP'] = '0'
+
+
+def post_worker_init(worker):
+    import web_api
+    if worker.cfg.worker_class_str == 'gthread' and 'ADVICE_CONCURRENCY' not in os.environ:
+        # Half of the threads this worker really has (--threads may override THREADS)
+        web_api.limit_advice(worker.cfg.threads // 2)
+    if 'STREAM_LIMIT' not in os.environ:
+        if worker.cfg.worker_class_str == 'gthread':
+            web_api.limit_streams(worker.cfg.threads // 4)
+        elif worker.cfg.worker_class_str == 'gevent':
+            web_api.limit_streams(worker.cfg.worker_connections * 9 // 10)
+    if _warm_up:
+        web_api.start_warm_up()
+    import metrics
+    metrics.start_publisher()
+
+
+def on_starting(server):
+    # Counts left by an earlier run of the server don't belong to this one
+    for path in glob.glob(os.path.join(os.environ['METRICS_DIR'], '*.json')):
+        os.remove(path)
+
+
+def worker_exit(server, worker):
+    import metrics
+    metrics.publish()
+
+
+def child_exit(server, worker):
+    import metrics
+    metrics.mark_process_dead(worker.pid)
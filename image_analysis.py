@@ -0,0 +1,172 @@
+"""
+Chart screenshot analysis with GPT-4o.
+
+Before upload, a screenshot has its uniform borders cropped and is scaled
+to the resolution the model works at for high-detail images (at most
+2048 px on the long side and 768 px on the short side). It is then
+re-encoded as whichever of JPEG or PNG is smaller. Results are cached
+under both the SHA-256 of the uploaded file and a difference hash of the
+prepared pixels, so re-uploading the same chart, or the same chart saved
+in another format or size, costs no API call.
+"""
+import base64
+import hashlib
+import io
+import os
+import threading
+
+from PIL import Image, ImageChops, ImageOps
+
+from advice_cache import AdviceCache
+
+MODELS = ("gpt-4o", "gpt-4o-mini")
+PROMPT = ("Please analyze this trading chart or financial image and provide detailed observations about "
+          "the market patterns, indicators, and potential trading opportunities:")
+MAX_LONG_SIDE = 2048
+MAX_SHORT_SIDE = 768
+JPEG_QUALITY = 85
+# Per-channel difference below which a border pixel counts as background
+BORDER_TOLERANCE = 12
+# Grid width of the difference hash; 32 gives a 1024-bit hash, fine enough
+# that two charts only match if they look the same, not just similar
+HASH_SIZE = 32
+
+
+def crop_borders(img, tolerance=BORDER_TOLERANCE):
+    """Crop rows/columns matching the top-left pixel colour from every edge"""
+    background = Image.new(img.mode, img.size, img.getpixel((0, 0)))
+    diff = ImageChops.difference(img, background).convert('L')
+    bbox = diff.point(lambda v: 255 if v > tolerance else 0).getbbox()
+    return img.crop(bbox) if bbox and bbox != (0, 0) + img.size else img
+
+
+def fit_size(width, height, long_side=MAX_LONG_SIDE, short_side=MAX_SHORT_SIDE):
+    scale = min(1.0, long_side / max(width, height), short_side / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def difference_hash(img, size=HASH_SIZE):
+    """Hex dHash: whether each pixel is brighter than its right neighbour on a (size+1) x size grid"""
+    small = img.convert('L').resize((size + 1, size), Image.LANCZOS)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            offset = row * (size + 1) + col
+            bits = (bits << 1) | (pixels[offset] > pixels[offset + 1])
+    return f"{bits:0{size * size // 4}x}"
+
+
+def prepare_image(path):
+    """
+    Load, crop and downscale the image at path. Returns
+    (data_uri, perceptual_hash, info) where info has the original and
+    prepared sizes and byte counts.
+    """
+    with Image.open(path) as img:
+        original_size = img.size
+        img = ImageOps.exif_transpose(img).convert('RGB')
+    img = crop_borders(img)
+    size = fit_size(*img.size)
+    if size != img.size:
+        img = img.resize(size, Image.LANCZOS)
+
+    encoded = {}
+    for fmt, options in (('JPEG', {'quality': JPEG_QUALITY, 'optimize': True}), ('PNG', {'optimize': True})):
+        buffer = io.BytesIO()
+        img.save(buffer, fmt, **options)
+        encoded[fmt] = buffer.getvalue()
+    fmt = min(encoded, key=lambda f: len(encoded[f]))
+    data = encoded[fmt]
+    info = {
+        'original_size': original_size,
+        'original_bytes': os.path.getsize(path),
+        'size': img.size,
+        'bytes': len(data),
+        'format': fmt,
+    }
+    data_uri = f"data:image/{fmt.lower()};base64,{base64.b64encode(data).decode('ascii')}"
+    return data_uri, difference_hash(img), info
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _ask(model, data_uri, api_key):
+    import llm_advice
+    response = llm_advice.client(api_key).chat.completions.create(
+        model=model,
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": PROMPT},
+                    {"type": "image_url", "image_url": {"url": data_uri, "detail": "high"}}
+                ]
+            }
+        ],
+        max_tokens=500
+    )
+    return response.choices[0].message.content
+
+
+def analyze_image(path, api_key, cache=None, check=None):
+    """
+    Analysis text for the chart image at path, from the cache when the
+    same image was analyzed before. Falls back to the smaller model if the
+    first one fails; returns an error description if both do.
+    """
+    cache = cache or get_image_cache()
+    content_key = 'sha256:' + file_hash(path)
+    result = cache.get(content_key)
+    if result is not None:
+        return result
+
+    data_uri, phash, info = prepare_image(path)
+    pixel_key = 'dhash:' + phash
+    result = cache.get(pixel_key)
+    if result is not None:
+        cache.put(content_key, result)
+        return result
+
+    errors = []
+    for model in MODELS:
+        if check is not None:
+            check()
+        try:
+            analysis = _ask(model, data_uri, api_key)
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        label = "Image Analysis" if model == MODELS[0] else "Image Analysis (using backup model)"
+        result = f"{label}:\n{analysis}"
+        cache.put(content_key, result)
+        cache.put(pixel_key, result)
+        return result
+    return f"Error analyzing image: {errors[0]}\nBackup model also failed: {errors[-1]}"
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_image_cache():
+    """Process-wide cache of image analyses, configured from IMAGE_CACHE_* environment variables"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = AdviceCache(
+                    path=os.getenv(
+                        'IMAGE_CACHE_PATH',
+                        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'image_cache.sqlite')
+                    ),
+                    ttl=float(os.getenv('IMAGE_CACHE_TTL', str(7 * 24 * 3600))),
+                    max_entries=int(os.getenv('IMAGE_CACHE_MAX_ENTRIES', '200')),
+                )
+    return _default_cache
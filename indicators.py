@@ -0,0 +1,461 @@
+"""
+Streaming technical indicators.
+
+Each indicator keeps just the running state it needs (EMA accumulators,
+Wilder smoothing, sliding-window sums/Welford variance, monotonic deques
+for rolling extremes) and folds in one bar per update() call, so the cost
+of a refresh no longer depends on how much history is stored. Warm-up
+conventions follow the `ta` library so values line up with
+RSIIndicator, MACD, BollingerBands, AverageTrueRange, ADXIndicator,
+StochasticOscillator and CCIIndicator on the same input series.
+"""
+import copy
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+NAN = float('nan')
+
+
+class StreamingIndicator:
+    """Base class: subclasses implement update() and expose .value"""
+    value = NAN
+
+    def update(self, close, high=None, low=None):
+        raise NotImplementedError
+
+    def snapshot(self):
+        """Return a deep copy of the running state"""
+        return copy.deepcopy(self.__dict__)
+
+    def restore(self, state):
+        """Reset the running state to a previous snapshot()"""
+        self.__dict__.clear()
+        self.__dict__.update(copy.deepcopy(state))
+        return self
+
+
+class EMA(StreamingIndicator):
+    """Exponential moving average (pandas ewm(adjust=False))"""
+
+    def __init__(self, span=None, alpha=None, min_periods=0):
+        self.alpha = alpha if alpha is not None else 2.0 / (span + 1)
+        self.min_periods = min_periods
+        self.count = 0
+        self.mean = NAN
+        self.value = NAN
+
+    def update(self, close, high=None, low=None):
+        if math.isnan(close):
+            return self.value
+        if self.count == 0:
+            self.mean = close
+        else:
+            self.mean += self.alpha * (close - self.mean)
+        self.count += 1
+        self.value = self.mean if self.count >= self.min_periods else NAN
+        return self.value
+
+
+class SMA(StreamingIndicator):
+    """Simple moving average over a sliding window"""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.value = NAN
+
+    def update(self, close, high=None, low=None):
+        self.values.append(close)
+        self.total += close
+        if len(self.values) > self.window:
+            self.total -= self.values.popleft()
+        self.value = self.total / self.window if len(self.values) == self.window else NAN
+        return self.value
+
+
+class RSI(StreamingIndicator):
+    """Relative Strength Index with Wilder smoothing"""
+
+    def __init__(self, window=14):
+        self.window = window
+        self.alpha = 1.0 / window
+        self.prev_close = None
+        self.count = 0
+        self.avg_up = 0.0
+        self.avg_down = 0.0
+        self.value = NAN
+
+    def update(self, close, high=None, low=None):
+        if self.prev_close is None:
+            up = down = 0.0
+        else:
+            diff = close - self.prev_close
+            up = diff if diff > 0 else 0.0
+            down = -diff if diff < 0 else 0.0
+        self.prev_close = close
+        if self.count == 0:
+            self.avg_up, self.avg_down = up, down
+        else:
+            self.avg_up += self.alpha * (up - self.avg_up)
+            self.avg_down += self.alpha * (down - self.avg_down)
+        self.count += 1
+        if self.count < self.window:
+            self.value = NAN
+        elif self.avg_down == 0:
+            self.value = 100.0
+        else:
+            self.value = 100.0 - 100.0 / (1.0 + self.avg_up / self.avg_down)
+        return self.value
+
+
+class MACD(StreamingIndicator):
+    """MACD line, signal line and histogram (value is the histogram, like macd_diff())"""
+
+    def __init__(self, window_slow=26, window_fast=12, window_sign=9):
+        self.fast = EMA(span=window_fast, min_periods=window_fast)
+        self.slow = EMA(span=window_slow, min_periods=window_slow)
+        self.signal_ema = EMA(span=window_sign, min_periods=window_sign)
+        self.macd = NAN
+        self.signal = NAN
+        self.value = NAN
+
+    def update(self, close, high=None, low=None):
+        fast = self.fast.update(close)
+        slow = self.slow.update(close)
+        self.macd = fast - slow
+        self.signal = self.signal_ema.update(self.macd)
+        self.value = self.macd - self.signal
+        return self.value
+
+
+class BollingerBands(StreamingIndicator):
+    """Bollinger Bands from a sliding-window Welford mean/variance (ddof=0)"""
+
+    def __init__(self, window=20, window_dev=2):
+        self.window = window
+        self.window_dev = window_dev
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.mavg = self.hband = self.lband = NAN
+        self.value = NAN
+
+    def update(self, close, high=None, low=None):
+        self.values.append(close)
+        n = len(self.values)
+        if n > self.window:
+            old = self.values.popleft()
+            new_mean = self.mean + (close - old) / self.window
+            self.m2 += (close - old) * (close - new_mean + old - self.mean)
+            self.mean = new_mean
+        else:
+            delta = close - self.mean
+            self.mean += delta / n
+            self.m2 += delta * (close - self.mean)
+        if len(self.values) < self.window:
+            self.mavg = self.hband = self.lband = self.value = NAN
+            return self.value
+        std = math.sqrt(max(self.m2, 0.0) / self.window)
+        self.mavg = self.mean
+        self.hband = self.mean + self.window_dev * std
+        self.lband = self.mean - self.window_dev * std
+        self.value = self.mavg
+        return self.value
+
+
+class ATR(StreamingIndicator):
+    """Average True Range with Wilder smoothing"""
+
+    def __init__(self, window=14):
+        self.window = window
+        self.prev_close = None
+        self.count = 0
+        self.tr_sum = 0.0
+        self.value = NAN
+
+    def update(self, close, high=None, low=None):
+        high = close if high is None else high
+        low = close if low is None else low
+        if self.prev_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.count += 1
+        if self.count < self.window:
+            self.tr_sum += true_range
+            self.value = 0.0
+        elif self.count == self.window:
+            self.value = (self.tr_sum + true_range) / self.window
+        else:
+            self.value = (self.value * (self.window - 1) + true_range) / self.window
+        return self.value
+
+
+class ADX(StreamingIndicator):
+    """
+    Average Directional Index.
+
+    Mirrors ADXIndicator: the smoothed sums reported for bar t-1 already
+    include bar t's movement, and ADX at bar t smooths the DX from bar t-1,
+    with zeros reported until 2 * window bars have been seen.
+    """
+
+    def __init__(self, window=14):
+        self.window = window
+        self.count = 0
+        self.prev = None
+        self.tr_sum = self.pos_sum = self.neg_sum = 0.0
+        self.dx_seed = []
+        self.value = 0.0
+
+    def update(self, close, high=None, low=None):
+        high = close if high is None else high
+        low = close if low is None else low
+        w = self.window
+        if self.prev is not None:
+            prev_high, prev_low, prev_close = self.prev
+            movement = max(high, prev_close) - min(low, prev_close)
+            diff_up = high - prev_high
+            diff_down = prev_low - low
+            pos = diff_up if diff_up > diff_down and diff_up > 0 else 0.0
+            neg = diff_down if diff_down > diff_up and diff_down > 0 else 0.0
+            if self.count <= w:
+                self.tr_sum += movement
+                self.pos_sum += pos
+                self.neg_sum += neg
+            else:
+                self.tr_sum += movement - self.tr_sum / w
+                self.pos_sum += pos - self.pos_sum / w
+                self.neg_sum += neg - self.neg_sum / w
+            if self.count >= w:
+                dx = self._dx()
+                if len(self.dx_seed) < w:
+                    self.dx_seed.append(dx)
+                    if len(self.dx_seed) == w:
+                        self.value = sum(self.dx_seed) / w
+                else:
+                    self.value = (self.value * (w - 1) + dx) / w
+        self.prev = (high, low, close)
+        self.count += 1
+        return self.value
+
+    def _dx(self):
+        dip = 100 * self.pos_sum / self.tr_sum if self.tr_sum != 0 else 0.0
+        din = 100 * self.neg_sum / self.tr_sum if self.tr_sum != 0 else 0.0
+        if dip + din == 0:
+            return 0.0
+        return 100 * abs((dip - din) / (dip + din))
+
+
+class _RollingExtreme:
+    """Sliding-window max (or min) with a monotonic deque, amortized O(1)"""
+
+    def __init__(self, window, is_max):
+        self.window = window
+        self.is_max = is_max
+        self.index = 0
+        self.items = deque()
+
+    def update(self, x):
+        items = self.items
+        if self.is_max:
+            while items and items[-1][1] <= x:
+                items.pop()
+        else:
+            while items and items[-1][1] >= x:
+                items.pop()
+        items.append((self.index, x))
+        if items[0][0] <= self.index - self.window:
+            items.popleft()
+        self.index += 1
+        return items[0][1] if self.index >= self.window else NAN
+
+
+class Stochastic(StreamingIndicator):
+    """Stochastic %K"""
+
+    def __init__(self, window=14):
+        self.highest = _RollingExtreme(window, is_max=True)
+        self.lowest = _RollingExtreme(window, is_max=False)
+        self.value = NAN
+
+    def update(self, close, high=None, low=None):
+        high = close if high is None else high
+        low = close if low is None else low
+        smax = self.highest.update(high)
+        smin = self.lowest.update(low)
+        span = smax - smin
+        self.value = 100 * (close - smin) / span if span != 0 else NAN
+        return self.value
+
+
+class CCI(StreamingIndicator):
+    """
+    Commodity Channel Index. The mean deviation has no running form, so each
+    update walks the window once: O(window), independent of history length.
+    """
+
+    def __init__(self, window=20, constant=0.015):
+        self.window = window
+        self.constant = constant
+        self.values = deque()
+        self.total = 0.0
+        self.value = NAN
+
+    def update(self, close, high=None, low=None):
+        high = close if high is None else high
+        low = close if low is None else low
+        tp = (high + low + close) / 3.0
+        self.values.append(tp)
+        self.total += tp
+        if len(self.values) > self.window:
+            self.total -= self.values.popleft()
+        if len(self.values) < self.window:
+            self.value = NAN
+            return self.value
+        mean = self.total / self.window
+        mad = sum(abs(x - mean) for x in self.values) / self.window
+        self.value = (tp - mean) / (self.constant * mad) if mad != 0 else NAN
+        return self.value
+
+
+class Returns(StreamingIndicator):
+    """Percent change over `periods` bars"""
+
+    def __init__(self, periods=1):
+        self.closes = deque(maxlen=periods + 1)
+        self.value = NAN
+
+    def update(self, close, high=None, low=None):
+        self.closes.append(close)
+        if len(self.closes) == self.closes.maxlen:
+            self.value = close / self.closes[0] - 1.0
+        else:
+            self.value = NAN
+        return self.value
+
+
+# Feature columns produced by IndicatorEngine, in the order used by the predictor
+FEATURES = [
+    'rsi', 'macd', 'sma', 'ema9', 'ema21', 'adx', 'stoch_k', 'cci',
+    'bb_middle', 'bb_upper', 'bb_lower', 'atr', 'ret1', 'ret2', 'ret3'
+]
+
+
+class IndicatorEngine(StreamingIndicator):
+    """Bundle of the indicators the app uses, advanced together one bar at a time"""
+
+    def __init__(self):
+        self.rsi = RSI(14)
+        self.macd = MACD()
+        self.sma = SMA(5)
+        self.ema9 = EMA(span=9)
+        self.ema21 = EMA(span=21)
+        self.adx = ADX(14)
+        self.stoch = Stochastic(14)
+        self.cci = CCI(14)
+        self.bb = BollingerBands(5)
+        self.atr = ATR(5)
+        self.returns = [Returns(1), Returns(2), Returns(3)]
+        self.count = 0
+        self.timestamp = None
+        self.values = dict.fromkeys(FEATURES, NAN)
+
+    def update(self, close, high=None, low=None, timestamp=None):
+        close = float(close)
+        high = close if high is None else float(high)
+        low = close if low is None else float(low)
+        for indicator in (self.rsi, self.macd, self.sma, self.ema9, self.ema21,
+                          self.adx, self.stoch, self.cci, self.bb, self.atr, *self.returns):
+            indicator.update(close, high, low)
+        self.count += 1
+        self.timestamp = timestamp
+        self.values = {
+            'rsi': self.rsi.value,
+            'macd': self.macd.value,
+            'sma': self.sma.value,
+            'ema9': self.ema9.value,
+            'ema21': self.ema21.value,
+            'adx': self.adx.value,
+            'stoch_k': self.stoch.value,
+            'cci': self.cci.value,
+            'bb_middle': self.bb.mavg,
+            'bb_upper': self.bb.hband,
+            'bb_lower': self.bb.lband,
+            'atr': self.atr.value,
+            'ret1': self.returns[0].value,
+            'ret2': self.returns[1].value,
+            'ret3': self.returns[2].value,
+        }
+        return self.values
+
+
+def run(closes, highs=None, lows=None):
+    """Stream a whole series through a fresh engine; returns {feature: ndarray}"""
+    closes = np.asarray(closes, dtype=np.float64)
+    highs = closes if highs is None else np.asarray(highs, dtype=np.float64)
+    lows = closes if lows is None else np.asarray(lows, dtype=np.float64)
+    engine = IndicatorEngine()
+    out = {name: np.empty(len(closes)) for name in FEATURES}
+    for i in range(len(closes)):
+        values = engine.update(closes[i], highs[i], lows[i])
+        for name in FEATURES:
+            out[name][i] = values[name]
+    return out
+
+
+class StoreIndicators:
+    """
+    Per-symbol engines kept in step with a BarStore.
+
+    Closed bars are folded into the engine once. The newest bar is still
+    being updated by live quotes, so the engine's state before it is kept,
+    and the engine is only rewound to that state when the newest bar has
+    changed since the last call.
+    """
+
+    def __init__(self, store, high_low=False):
+        self.store = store
+        # The predictor has always fed close-only series to ADX/ATR/CCI/Stoch
+        self.high_low = high_low
+        # symbol -> {'engine', 'state' (before the newest bar), 'timestamp' (last closed bar), 'forming'}
+        self.engines = {}
+        self._lock = threading.Lock()
+
+    def latest(self, symbol):
+        """Indicator values as of the newest (possibly still forming) bar"""
+        with self._lock:
+            live = self.engines.get(symbol)
+            if live is None:
+                live = self.engines[symbol] = {'engine': IndicatorEngine(), 'state': None,
+                                               'timestamp': None, 'forming': None}
+            engine = live['engine']
+            bars = self.store.tail(symbol)
+            n = len(bars.close)
+            start = 0
+            if live['timestamp'] is not None:
+                start = int(np.searchsorted(bars.timestamp, live['timestamp'], side='right'))
+            if start >= n:
+                return dict(engine.values)
+            forming = (int(bars.timestamp[-1]), float(bars.close[-1]), *self._high_low(bars, -1))
+            if start == n - 1 and forming == live['forming']:
+                return dict(engine.values)
+            if live['forming'] is not None:
+                engine.restore(live['state'])
+            if start < n - 1 or live['state'] is None:
+                for i in range(start, n - 1):
+                    engine.update(bars.close[i], *self._high_low(bars, i), timestamp=int(bars.timestamp[i]))
+                live['timestamp'] = engine.timestamp
+                live['state'] = engine.snapshot()
+            live['forming'] = forming
+            return dict(engine.update(forming[1], *forming[2:], timestamp=forming[0]))
+
+    def _high_low(self, bars, i):
+        if self.high_low:
+            return float(bars.high[i]), float(bars.low[i])
+        return None, None
@@ -0,0 +1,120 @@
+"""
+Fan-out of live market ticks to many subscribers.
+
+One fetch loop polls the snapshot source for the symbols somebody is
+subscribed to and publishes a tick whenever a value changes. Each
+subscriber holds at most one pending tick per symbol: a slow client
+skips intermediate ticks and always gets the newest one, so its backlog
+(and memory) stays bounded no matter how far it falls behind. The loop
+only runs while there are subscribers.
+"""
+import threading
+import time
+
+
+class Subscription:
+    """Pending ticks for one client, conflated per symbol"""
+
+    def __init__(self, symbols=None):
+        self.symbols = set(symbols) if symbols else None
+        self.pending = {}
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def wants(self, symbol):
+        return self.symbols is None or symbol in self.symbols
+
+    def push(self, tick):
+        with self._lock:
+            if tick['symbol'] in self.pending:
+                self.dropped += 1
+            self.pending[tick['symbol']] = tick
+        self._ready.set()
+
+    def get(self, timeout=None):
+        """Wait up to timeout seconds and return the pending ticks (possibly none)"""
+        self._ready.wait(timeout)
+        with self._lock:
+            ticks = list(self.pending.values())
+            self.pending.clear()
+            self._ready.clear()
+        return ticks
+
+
+class LiveFeed:
+    """Shared polling loop publishing ticks to subscriptions"""
+
+    def __init__(self, source, symbols, interval=2.0):
+        # source(symbols) -> {symbol: tick dict or None}
+        self.source = source
+        self.symbols = tuple(symbols)
+        self.interval = interval
+        self.subscribers = set()
+        self.last = {}
+        self.published = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, symbols=None):
+        sub = Subscription(symbols)
+        with self._lock:
+            self.subscribers.add(sub)
+            # Start the new client off with the latest known values
+            for symbol, tick in self.last.items():
+                if sub.wants(symbol):
+                    sub.push(tick)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='live-feed', daemon=True)
+                self._thread.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self.subscribers.discard(sub)
+
+    def publish(self, tick):
+        with self._lock:
+            self.last[tick['symbol']] = tick
+            subscribers = list(self.subscribers)
+        for sub in subscribers:
+            if sub.wants(tick['symbol']):
+                sub.push(tick)
+        self.published += 1
+
+    def _wanted_symbols(self):
+        with self._lock:
+            if not self.subscribers:
+                self._thread = None
+                return None
+            if any(sub.symbols is None for sub in self.subscribers):
+                return list(self.symbols)
+            wanted = set().union(*(sub.symbols for sub in self.subscribers))
+        return [symbol for symbol in self.symbols if symbol in wanted]
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            symbols = self._wanted_symbols()
+            if symbols is None:
+                return
+            try:
+                ticks = self.source(symbols)
+            except Exception as e:
+                print("Error polling live feed:", str(e))
+                ticks = {}
+            for symbol, tick in ticks.items():
+                if tick is None:
+                    continue
+                previous = self.last.get(symbol)
+                if previous is None or any(previous[k] != tick[k] for k in tick if k != 'time'):
+                    self.publish(tick)
+            time.sleep(max(self.interval - (time.monotonic() - started), 0))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self.subscribers),
+                'published': self.published,
+                'dropped': sum(sub.dropped for sub in self.subscribers),
+            }
@@ -0,0 +1,391 @@
+"""
+Offline load test for web_api.py.
+
+Starts the stub Binance, Frankfurter and OpenAI servers from
+stub_servers.py, starts the API against them in a separate process
+(or uses --url for a server that is already running), then sends
+/price, /rsi and /advice requests at a fixed arrival rate in the given
+mix. Arrivals follow a seeded Poisson process and don't wait for
+earlier responses, so a slow server builds a queue instead of slowing
+the test down. Latency is measured from each request's scheduled time,
+so that queueing counts. Reports throughput, errors and p50/p95/p99
+latency per route, plus what each stub upstream saw. Exits non-zero when
+every request to some route failed, which means the setup is broken
+rather than slow. --streams N holds N /stream connections open for the
+whole run, to see what subscribers cost the other routes.
+
+Latency specs are seconds ('0.05'), 'uniform:LOW:HIGH' or
+'lognormal:MEDIAN:SIGMA'.
+
+Usage:
+    python load_test.py --rate 50 --duration 30
+    python load_test.py --mix price=5,rsi=4,advice=1 --latency openai=lognormal:2:0.5 \\
+        --error-rate binance=0.05 --rate-limit openai=3 --json run.json
+    python load_test.py --server-cmd "gunicorn -w 4 -b 127.0.0.1:{port} web_api:app"
+    python load_test.py --streams 20 --server-cmd "gunicorn -c gunicorn.conf.py -w 1 -b 127.0.0.1:{port} web_api:app"
+"""
+import argparse
+import json
+import math
+import os
+import random
+import selectors
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+
+import stub_servers
+from market_data import SUPPORTED_SYMBOLS
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MIX = 'price=6,rsi=3,advice=1'
+# Typical latencies of the real services
+DEFAULT_LATENCY = {
+    'binance': 'lognormal:0.05:0.4',
+    'frankfurter': 'lognormal:0.08:0.4',
+    'openai': 'lognormal:1.5:0.5',
+}
+QUESTIONS = (
+    'Should I buy?',
+    'Should I sell?',
+    'Is this a good entry?',
+    'Where should my stop-loss go?',
+    'What is the short-term outlook?',
+)
+# Flask's threaded development server, without the debug reloader
+DEFAULT_SERVER = [sys.executable, '-c', 'import web_api; web_api.app.run(host="127.0.0.1", port={port}, threaded=True)']
+
+
+def price_request(rng):
+    return 'GET', '/price', {'params': {'symbol': rng.choice(SUPPORTED_SYMBOLS)}}
+
+
+def rsi_request(rng):
+    return 'GET', '/rsi', {'params': {'symbol': rng.choice(SUPPORTED_SYMBOLS)}}
+
+
+def advice_request(rng):
+    return 'POST', '/advice', {'json': {'symbol': rng.choice(SUPPORTED_SYMBOLS), 'question': rng.choice(QUESTIONS)}}
+
+
+ROUTES = {'price': price_request, 'rsi': rsi_request, 'advice': advice_request}
+
+
+def parse_mix(spec):
+    """'price=6,rsi=3,advice=1' -> {'price': 6.0, ...}"""
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ROUTES:
+            raise ValueError(f"Unknown route in mix: {name} (expected one of {', '.join(ROUTES)})")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("The mix needs at least one route with a positive weight")
+    return mix
+
+
+def parse_settings(values, convert):
+    """['openai=3', 'binance=1'] -> {'openai': convert('3'), ...}; a bare value applies to every upstream"""
+    settings = {}
+    for value in values or []:
+        name, sep, setting = value.partition('=')
+        if not sep:
+            settings.update((upstream, convert(name)) for upstream in stub_servers.UPSTREAMS)
+            continue
+        if name not in stub_servers.UPSTREAMS:
+            raise ValueError(f"Unknown upstream: {name} (expected one of {', '.join(stub_servers.UPSTREAMS)})")
+        settings[name] = convert(setting)
+    return settings
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_api(env, command=None, timeout=60):
+    """Start the API in a child process; returns (process, base url) once it answers"""
+    port = free_port()
+    if command:
+        args = [arg.format(port=port) for arg in shlex.split(command)]
+    else:
+        args = [arg.format(port=port) for arg in DEFAULT_SERVER]
+    process = subprocess.Popen(args, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API server exited with {process.returncode}:\n{process.stderr.read().strip()}")
+        try:
+            requests.get(url + '/', timeout=1)
+            return process, url
+        except requests.RequestException:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"API server did not answer within {timeout} s")
+
+
+def stop_api(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def open_streams(url, count, timeout=5.0):
+    """
+    Open `count` /stream connections; returns (open sockets, {status: n}).
+    A connection the server hasn't answered within `timeout` counts as
+    'timeout' and is closed.
+    """
+    parts = urlsplit(url)
+    request = (f"GET /stream HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+               f"Accept: text/event-stream\r\n\r\n").encode()
+    sockets = []
+    for _ in range(count):
+        sock = socket.create_connection((parts.hostname, parts.port or 80), timeout=timeout)
+        sock.sendall(request)
+        sockets.append(sock)
+    opened, statuses = [], {}
+    deadline = time.monotonic() + timeout
+    for sock in sockets:
+        try:
+            sock.settimeout(max(0.01, deadline - time.monotonic()))
+            status = sock.recv(1024).split(b' ', 2)[1].decode()
+        except (OSError, IndexError):
+            status = 'timeout'
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == '200':
+            opened.append(sock)
+        else:
+            sock.close()
+    return opened, statuses
+
+
+def hold_streams(sockets, stop):
+    """Read and drop events on `sockets` until `stop` is set, then close them"""
+    with selectors.DefaultSelector() as selector:
+        for sock in sockets:
+            selector.register(sock, selectors.EVENT_READ)
+        while not stop.is_set() and selector.get_map():
+            for key, _ in selector.select(timeout=0.5):
+                try:
+                    data = key.fileobj.recv(65536)
+                except OSError:
+                    data = b''
+                if not data:
+                    selector.unregister(key.fileobj)
+    for sock in sockets:
+        sock.close()
+
+
+def drive(url, rate, duration, mix, concurrency=64, seed=0, timeout=30.0):
+    """
+    Send requests at `rate` per second for `duration` seconds; returns one
+    dict per request: route, scheduled (offset in seconds), status (None
+    if the request failed) and latency.
+    """
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    local = threading.local()
+    results = []
+    lock = threading.Lock()
+
+    def call(name, method, path, kwargs, scheduled, due):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        try:
+            status = session.request(method, url + path, timeout=timeout, **kwargs).status_code
+            error = None
+        except requests.RequestException as e:
+            status, error = None, type(e).__name__
+        result = {'route': name, 'scheduled': scheduled, 'status': status, 'latency': time.perf_counter() - due}
+        if error:
+            result['error'] = error
+        with lock:
+            results.append(result)
+
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='load')
+    start = time.perf_counter()
+    offset = rng.expovariate(rate)
+    while offset < duration:
+        name = rng.choices(names, weights)[0]
+        method, path, kwargs = ROUTES[name](rng)
+        due = start + offset
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        executor.submit(call, name, method, path, kwargs, offset, due)
+        offset += rng.expovariate(rate)
+    executor.shutdown(wait=True)
+    return results
+
+
+def summarize(results, window):
+    """Per-route (and 'all') counts, throughput over `window` seconds and latency percentiles"""
+    groups = {name: [r for r in results if r['route'] == name] for name in ROUTES}
+    groups = {name: group for name, group in groups.items() if group}
+    groups['all'] = results
+    summary = {}
+    for name, group in groups.items():
+        ok = [r for r in group if r['status'] is not None and r['status'] < 400]
+        latencies = sorted(r['latency'] for r in ok)
+        failures = {}
+        for r in group:
+            if r['status'] is None or r['status'] >= 400:
+                key = str(r['status'] or r.get('error'))
+                failures[key] = failures.get(key, 0) + 1
+        summary[name] = {
+            'requests': len(group),
+            'ok': len(ok),
+            'failures': failures,
+            'throughput': len(ok) / window if window else 0.0,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else None,
+        }
+    return summary
+
+
+def format_ms(seconds):
+    return f"{seconds * 1000:8.1f}" if seconds is not None else f"{'-':>8}"
+
+
+def print_report(report):
+    meta = report['meta']
+    print(f"\n{meta['rate']:g} req/s target for {meta['duration']:g} s (after {meta['warmup']:g} s warm-up), "
+          f"mix {meta['mix']}, server {meta['server']}")
+    print(f"{'route':<8} {'requests':>8} {'ok':>6} {'ok/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  failures")
+    for name, row in report['routes'].items():
+        failures = ', '.join(f"{k}: {v}" for k, v in sorted(row['failures'].items())) or '-'
+        print(f"{name:<8} {row['requests']:>8} {row['ok']:>6} {row['throughput']:>7.1f} {format_ms(row['p50'])} "
+              f"{format_ms(row['p95'])} {format_ms(row['p99'])} {format_ms(row['max'])}  {failures}")
+    if report['streams']:
+        streams = report['streams']
+        refused = ', '.join(f"{status}: {n}" for status, n in sorted(streams.items()) if status != '200')
+        print(f"Streams: {streams.get('200', 0)} of {meta['streams']} held open; refused: {refused or '-'}")
+    if report['upstreams']:
+        print("Upstreams: " + '; '.join(
+            f"{name} {s['hits']} hits, {s['errors']} errors, {s['throttled']} throttled"
+            for name, s in report['upstreams'].items()))
+
+
+def dead_routes(report):
+    """Routes that got requests but answered none of them"""
+    return [name for name, row in report['routes'].items()
+            if name != 'all' and row['requests'] and not row['ok']]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test for the web API")
+    parser.add_argument('--rate', type=float, default=20, help="requests per second (default 20)")
+    parser.add_argument('--duration', type=float, default=30, help="measured seconds (default 30)")
+    parser.add_argument('--warmup', type=float, default=5, help="seconds of load before measuring (default 5)")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"route weights (default {DEFAULT_MIX})")
+    parser.add_argument('--concurrency', type=int, default=64, help="max requests in flight (default 64)")
+    parser.add_argument('--latency', action='append', metavar='[UPSTREAM=]SPEC',
+                        help="upstream latency, e.g. openai=lognormal:2:0.5 (repeatable)")
+    parser.add_argument('--error-rate', action='append', metavar='[UPSTREAM=]FRACTION',
+                        help="fraction of upstream requests failing with 500 (repeatable)")
+    parser.add_argument('--rate-limit', action='append', metavar='[UPSTREAM=]RPS',
+                        help="upstream requests per second before 429s (repeatable)")
+    parser.add_argument('--streams', type=int, default=0, help="/stream connections held open during the run")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--server-cmd', help="command starting the API, with {port} for the port to listen on "
+                                             "(default: Flask's threaded server)")
+    parser.add_argument('--url', help="load an already running API instead of starting one "
+                                      "(it must already point at the stubs to stay offline)")
+    parser.add_argument('--json', help="also write the report and raw samples to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+        latency = dict(DEFAULT_LATENCY, **parse_settings(args.latency, str))
+        error_rate = parse_settings(args.error_rate, float)
+        rate_limit = parse_settings(args.rate_limit, float)
+    except ValueError as e:
+        parser.error(str(e))
+
+    servers = {}
+    process = None
+    try:
+        if args.url:
+            url = args.url.rstrip('/')
+        else:
+            profiles = {name: {'latency': latency[name], 'error_rate': error_rate.get(name, 0.0),
+                               'rate_limit': rate_limit.get(name)} for name in stub_servers.UPSTREAMS}
+            servers = stub_servers.start_upstreams(profiles=profiles, seed=args.seed)
+            scratch = tempfile.mkdtemp(prefix='load-test-')
+            env = dict(os.environ, **stub_servers.upstream_env(servers))
+            # A fresh store and advice cache per run, so runs start from the same state
+            env.update(BAR_STORE_DIR=os.path.join(scratch, 'bars'),
+                       ADVICE_CACHE_PATH=os.path.join(scratch, 'advice.sqlite'))
+            process, url = start_api(env, args.server_cmd)
+
+        streams, stop_streams = {}, threading.Event()
+        if args.streams:
+            sockets, streams = open_streams(url, args.streams)
+            threading.Thread(target=hold_streams, args=(sockets, stop_streams), daemon=True).start()
+        print(f"Loading {url} at {args.rate:g} req/s for {args.warmup + args.duration:g} s...")
+        try:
+            results = drive(url, args.rate, args.warmup + args.duration, mix, args.concurrency, args.seed)
+        finally:
+            stop_streams.set()
+        measured = [r for r in results if r['scheduled'] >= args.warmup]
+        try:
+            server_stats = requests.get(url + '/stats', timeout=5).json()
+        except (requests.RequestException, ValueError):
+            server_stats = None
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        if process is not None:
+            stop_api(process)
+        stub_servers.stop_upstreams(servers)
+
+    report = {
+        'meta': {'rate': args.rate, 'duration': args.duration, 'warmup': args.warmup, 'mix': args.mix,
+                 'concurrency': args.concurrency, 'streams': args.streams, 'seed': args.seed,
+                 'server': args.url or args.server_cmd or 'flask threaded',
+                 'latency': latency if not args.url else None, 'error_rate': error_rate, 'rate_limit': rate_limit},
+        'routes': summarize(measured, args.duration),
+        'streams': streams,
+        'upstreams': {name: server.stats() for name, server in servers.items()},
+        'server_stats': server_stats,
+    }
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(dict(report, samples=measured), f, indent=2)
+    dead = dead_routes(report)
+    for name in dead:
+        failures = ', '.join(f"{k}: {v}" for k, v in sorted(report['routes'][name]['failures'].items()))
+        print(f"FAILED: every /{name} request failed ({failures}); check the server output above",
+              file=sys.stderr)
+    return 1 if dead else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
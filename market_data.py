@@ -0,0 +1,222 @@
+"""
+Upstream market-data client shared by the desktop app and the API.
+
+One requests.Session (keep-alive connection pool) serves every quote and
+history fetch. Concurrent fetches for the same symbol are coalesced
+("singleflight"): the first caller goes upstream and everyone who asks
+while that call is in flight gets its result. The asyncio interface
+coalesces per event loop as well, so any number of awaiting tasks share
+one upstream request.
+
+Base URLs can be pointed at local stub servers with BINANCE_API_URL and
+FRANKFURTER_API_URL.
+"""
+import asyncio
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from bar_store import HISTORY_BARS, frankfurter_timestamp, get_store, normalize_symbol
+
+SUPPORTED_SYMBOLS = ('BTCUSD', 'EURUSD')
+
+UPSTREAM_SECONDS = metrics.Histogram('upstream_request_duration_seconds',
+                                     'Market data API request latency', ('provider',))
+UPSTREAM_ERRORS = metrics.Counter('upstream_errors_total',
+                                  'Failed market data API requests by kind', ('provider', 'kind'))
+
+
+class MarketDataError(Exception):
+    """Upstream quote/history fetch failed"""
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its outcome"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn(*args)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class MarketDataClient:
+    """Pooled Binance/Frankfurter client with in-flight request coalescing"""
+
+    def __init__(self, binance_url=None, frankfurter_url=None, timeout=10, pool_size=32, store=None):
+        self.binance_url = (binance_url or os.getenv('BINANCE_API_URL', 'https://api.binance.com')).rstrip('/')
+        self.frankfurter_url = (frankfurter_url or os.getenv('FRANKFURTER_API_URL', 'https://api.frankfurter.app')).rstrip('/')
+        self.timeout = timeout
+        self.store = store
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._flights = SingleFlight()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='market-data')
+        self._async_calls = weakref.WeakKeyDictionary()
+        # Upstream requests actually sent, per provider
+        self.upstream_calls = {'binance': 0, 'frankfurter': 0}
+        self._calls_lock = threading.Lock()
+
+    def _get_json(self, provider, name, url):
+        with self._calls_lock:
+            self.upstream_calls[provider] += 1
+        start = time.perf_counter()
+        try:
+            r = self.session.get(url, timeout=self.timeout)
+            if r.status_code >= 400:
+                UPSTREAM_ERRORS.inc(provider, f"http_{r.status_code}")
+            return r.json()
+        except requests.exceptions.ConnectionError as e:
+            UPSTREAM_ERRORS.inc(provider, 'connection')
+            raise MarketDataError(f"Failed to connect to {name} API. Please check your internet connection.") from e
+        except requests.exceptions.Timeout as e:
+            UPSTREAM_ERRORS.inc(provider, 'timeout')
+            raise MarketDataError(f"Connection to {name} API timed out. Please try again.") from e
+        except requests.exceptions.RequestException as e:
+            UPSTREAM_ERRORS.inc(provider, 'request')
+            raise MarketDataError(f"Error connecting to {name} API: {str(e)}") from e
+        except ValueError as e:
+            UPSTREAM_ERRORS.inc(provider, 'invalid_json')
+            raise MarketDataError(f"Invalid response from {name} API") from e
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - start, provider)
+
+    # Quotes
+
+    def quote(self, symbol, record=True):
+        """
+        Latest price for symbol. Concurrent callers share one upstream
+        request. With record=True the quote is folded into the bar store
+        (backfilling history first if the store is short).
+        """
+        symbol = normalize_symbol(symbol)
+        if symbol not in SUPPORTED_SYMBOLS:
+            raise MarketDataError(f"Unsupported symbol: {symbol}")
+        price, timestamp = self._flights.do(('quote', symbol), self._fetch_quote, symbol)
+        if record:
+            store = self.store or get_store()
+            store.record_quote(symbol, price, timestamp, history=self.history)
+        return price
+
+    def _fetch_quote(self, symbol):
+        if symbol == 'BTCUSD':
+            data = self._get_json('binance', 'Binance', f"{self.binance_url}/api/v3/ticker/price?symbol=BTCUSDT")
+            if 'price' not in data:
+                print("Binance API response (no price):", data)
+                raise MarketDataError(f"API Error: Could not fetch BTC/USD price. API response: {data}")
+            return float(data['price']), time.time()
+        data = self._get_json('frankfurter', 'Frankfurter', f"{self.frankfurter_url}/latest?from=EUR&to=USD")
+        if 'rates' not in data or 'USD' not in data['rates']:
+            print("Frankfurter API response (no USD):", data)
+            raise MarketDataError(f"API Error: {data.get('error', data.get('message', 'Unknown error'))}")
+        timestamp = frankfurter_timestamp(data['date']) if 'date' in data else time.time()
+        return float(data['rates']['USD']), timestamp
+
+    async def aquote(self, symbol, record=True):
+        """asyncio version of quote(); tasks on the same loop share one in-flight call"""
+        loop = asyncio.get_running_loop()
+        inflight = self._async_calls.setdefault(loop, {})
+        key = (normalize_symbol(symbol), record)
+        future = inflight.get(key)
+        if future is None:
+            future = loop.run_in_executor(self._executor, self.quote, symbol, record)
+            inflight[key] = future
+            future.add_done_callback(lambda f: inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def aquotes(self, symbols, record=True):
+        """Fetch several symbols concurrently; failures come back as MarketDataError values"""
+        results = await asyncio.gather(*(self.aquote(s, record) for s in symbols), return_exceptions=True)
+        return dict(zip((normalize_symbol(s) for s in symbols), results))
+
+    # History (store backfill)
+
+    def history(self, symbol, limit=HISTORY_BARS):
+        """Recent bars for symbol as (timestamps, opens, highs, lows, closes, volumes)"""
+        symbol = normalize_symbol(symbol)
+        if symbol == 'BTCUSD':
+            return self._flights.do(('history', symbol, limit), self._binance_klines, limit)
+        if symbol == 'EURUSD':
+            return self._flights.do(('history', symbol, limit), self._frankfurter_history, limit)
+        return None
+
+    def _binance_klines(self, limit):
+        rows = self._get_json('binance', 'Binance',
+                              f"{self.binance_url}/api/v3/klines?symbol=BTCUSDT&interval=5m&limit={limit}")
+        if not isinstance(rows, list) or not rows:
+            print("Binance klines response:", rows)
+            return None
+        data = np.array([row[:6] for row in rows], dtype=np.float64)
+        return (
+            (data[:, 0] // 1000).astype(np.int64),
+            data[:, 1], data[:, 2], data[:, 3], data[:, 4], data[:, 5]
+        )
+
+    def _frankfurter_history(self, limit):
+        # Business days only, so ask for enough calendar days to cover weekends/holidays
+        start = (datetime.now(timezone.utc) - timedelta(days=int(limit * 1.5) + 10)).strftime('%Y-%m-%d')
+        data = self._get_json('frankfurter', 'Frankfurter', f"{self.frankfurter_url}/{start}..?from=EUR&to=USD")
+        if 'rates' not in data:
+            print("Frankfurter history response (no rates):", data)
+            return None
+        dates = sorted(data['rates'])
+        timestamps = np.array([frankfurter_timestamp(d) for d in dates], dtype=np.int64)
+        closes = np.array([data['rates'][d]['USD'] for d in dates], dtype=np.float64)
+        return timestamps, closes, closes, closes, closes, None
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide client; created on first use"""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = MarketDataClient()
+    return _default_client
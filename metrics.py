@@ -0,0 +1,288 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Counters, gauges and histograms are created once at module level and
+updated with their label values passed positionally, e.g.
+REQUEST_SECONDS.observe(0.012, '/price', 'GET', '200'). An update is a
+dict lookup and a few additions under the metric's lock, a couple of
+microseconds. Values that already live elsewhere (cache counters, say)
+are exposed through collectors, functions called only when render()
+builds the /metrics page.
+
+Under gunicorn each worker process has its own values. With METRICS_DIR
+set (gunicorn.conf.py does this), every worker writes its values to a
+JSON file there every PUBLISH_INTERVAL seconds, and render() adds up
+its own live values and the other workers' files: counters and
+histograms are summed, gauges too unless they ask for one series per
+process. When a worker exits, the master folds its counters and
+histograms into an archive file (mark_process_dead), so totals don't go
+backwards when workers are recycled; its gauges are dropped.
+"""
+import bisect
+import json
+import math
+import os
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Seconds; starts low enough to separate cached responses from upstream calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+MULTIPROCESS_DIR = os.getenv('METRICS_DIR')
+PUBLISH_INTERVAL = float(os.getenv('METRICS_PUBLISH_INTERVAL', '2'))
+ARCHIVE_FILE = 'archive.json'
+
+_metrics = []
+_collectors = []
+_publisher = None
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def family(self):
+        """Current values as a JSON-ready family (see families())"""
+        with self._lock:
+            series = [[list(key), value] for key, value in self._values.items()]
+        return {'name': self.name, 'kind': self.kind, 'help': self.documentation,
+                'labels': list(self.labels), 'series': series}
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    multiprocess says how workers' values combine: 'sum' adds up the
+    live workers, 'pid' keeps one series per worker with a pid label.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=(), multiprocess='sum'):
+        super().__init__(name, documentation, labels)
+        self.multiprocess = multiprocess
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def family(self):
+        return dict(super().family(), mode=self.multiprocess)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        # Per label set: [count per bucket (last one is +Inf), sum]
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def family(self):
+        with self._lock:
+            series = [[list(key), [list(counts), total]] for key, (counts, total) in self._values.items()]
+        return {'name': self.name, 'kind': self.kind, 'help': self.documentation,
+                'labels': list(self.labels), 'buckets': list(self.buckets), 'series': series}
+
+
+def collector(fn):
+    """
+    Register fn() -> [(name, kind, help, [(labels dict, value), ...]), ...],
+    called at every render(). A gauge family may add a fifth item, its
+    multiprocess mode (see Gauge). Usable as a decorator.
+    """
+    _collectors.append(fn)
+    return fn
+
+
+def families():
+    """
+    This process's metrics and collector output as dicts: name, kind,
+    help, labels (names), series ([label values, value]), plus buckets for
+    histograms and mode for gauges.
+    """
+    result = [metric.family() for metric in list(_metrics)]
+    for fn in list(_collectors):
+        try:
+            collected = fn()
+        except Exception as e:
+            print("Metrics collector failed:", str(e))
+            continue
+        for name, kind, documentation, samples, *mode in collected:
+            family = {'name': name, 'kind': kind, 'help': documentation,
+                      'labels': list(samples[0][0]) if samples else [],
+                      'series': [[list(labels.values()), value] for labels, value in samples]}
+            if kind == 'gauge':
+                family['mode'] = mode[0] if mode else 'sum'
+            result.append(family)
+    return result
+
+
+def merge(processes):
+    """Combine [(pid, families), ...] from several processes into one list of families"""
+    merged = {}
+    for pid, process_families in processes:
+        for family in process_families:
+            per_process = family.get('mode') == 'pid'
+            target = merged.get(family['name'])
+            if target is None:
+                target = merged[family['name']] = dict(family, series={})
+                if per_process:
+                    target['labels'] = family['labels'] + ['pid']
+            for key, value in family['series']:
+                key = tuple(key) + ((str(pid),) if per_process else ())
+                if family['kind'] == 'histogram':
+                    counts, total = target['series'].get(key, [[0] * len(value[0]), 0.0])
+                    target['series'][key] = [[a + b for a, b in zip(counts, value[0])], total + value[1]]
+                else:
+                    target['series'][key] = target['series'].get(key, 0) + value
+    return [dict(family, series=[[list(key), value] for key, value in family['series'].items()])
+            for family in merged.values()]
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Error reading metrics file {path}:", str(e))
+        return None
+
+
+def _write(path, data):
+    # Readers only ever see a complete file
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp, path)
+
+
+def _other_processes(directory):
+    own = f"{os.getpid()}.json"
+    processes = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json') and name != own:
+            data = _read(os.path.join(directory, name))
+            if data is not None:
+                processes.append((name[:-len('.json')], data))
+    return processes
+
+
+def publish(directory=None):
+    """Write this process's values where the other workers' render() reads them"""
+    directory = directory or MULTIPROCESS_DIR
+    if directory:
+        try:
+            _write(os.path.join(directory, f"{os.getpid()}.json"), families())
+        except OSError as e:
+            print("Error publishing metrics:", str(e))
+
+
+def start_publisher(interval=None):
+    """publish() every interval seconds on a background thread (with METRICS_DIR set)"""
+    global _publisher
+    if not MULTIPROCESS_DIR or (_publisher is not None and _publisher.is_alive()):
+        return
+
+    def run():
+        while True:
+            publish()
+            time.sleep(interval or PUBLISH_INTERVAL)
+
+    _publisher = threading.Thread(target=run, name='metrics-publisher', daemon=True)
+    _publisher.start()
+
+
+def mark_process_dead(pid, directory=None):
+    """Fold an exited worker's counters and histograms into the archive and drop its file"""
+    directory = directory or MULTIPROCESS_DIR
+    if not directory:
+        return
+    path = os.path.join(directory, f"{pid}.json")
+    data = _read(path)
+    if data is None:
+        return
+    kept = [family for family in data if family['kind'] != 'gauge']
+    archive = os.path.join(directory, ARCHIVE_FILE)
+    _write(archive, merge([('archive', _read(archive) or []), (pid, kept)]))
+    os.remove(path)
+
+
+def _format_family(family):
+    name, labels = family['name'], family['labels']
+    lines = [f"# HELP {name} {family['help']}", f"# TYPE {name} {family['kind']}"]
+    for key, value in sorted(family['series'], key=lambda item: [str(v) for v in item[0]]):
+        if family['kind'] == 'histogram':
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(family['buckets'] + [math.inf], counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{name}_bucket{_format_labels(labels, key, le)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels, key)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels, key)} {cumulative}")
+        else:
+            lines.append(f"{name}{_format_labels(labels, key)} {_format_value(value)}")
+    return lines
+
+
+def render():
+    """Every metric and collector in the Prometheus text exposition format, across workers with METRICS_DIR"""
+    result = families()
+    if MULTIPROCESS_DIR and os.path.isdir(MULTIPROCESS_DIR):
+        result = merge([(os.getpid(), result)] + _other_processes(MULTIPROCESS_DIR))
+    lines = []
+    for family in result:
+        lines += _format_family(family)
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,100 @@
+"""
+Fitted-model cache for the price predictor.
+
+Models are keyed by symbol, feature schema and hyperparameters and kept
+both in memory and as pickles under MODEL_CACHE_DIR (default
+data/models), so the periodic refresh, the advice flow and the next
+launch of the app all reuse the same forests. Entries written by a
+different cache version or scikit-learn release are ignored.
+"""
+import os
+import pickle
+import threading
+
+from features import FEATURE_SCHEMA
+
+CACHE_VERSION = 1
+
+
+def _sklearn_version():
+    import sklearn
+    return sklearn.__version__
+
+
+class ModelCache:
+    """In-memory + on-disk store of fitted models and search results"""
+
+    def __init__(self, root=None):
+        self.root = root or os.getenv(
+            'MODEL_CACHE_DIR',
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'models')
+        )
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def model_key(symbol, params):
+        symbol = symbol.upper().replace('/', '')
+        return (f"{symbol}-{FEATURE_SCHEMA}-w{params['window']}"
+                f"-n{params['n_estimators']}-d{params['max_depth']}")
+
+    @staticmethod
+    def search_key(symbol):
+        return f"{symbol.upper().replace('/', '')}-{FEATURE_SCHEMA}-search"
+
+    def _path(self, key):
+        return os.path.join(self.root, key + '.pkl')
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    entry = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+                return None
+            with self._lock:
+                self._entries[key] = entry
+        if entry.get('version') != CACHE_VERSION or entry.get('sklearn') != _sklearn_version():
+            return None
+        return entry
+
+    def _put(self, key, entry):
+        entry = dict(entry, version=CACHE_VERSION, sklearn=_sklearn_version())
+        with self._lock:
+            self._entries[key] = entry
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = self._path(key) + f'.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print("Error saving model cache:", str(e))
+
+    def get_models(self, symbol, params):
+        return self._get(self.model_key(symbol, params))
+
+    def put_models(self, symbol, params, entry):
+        self._put(self.model_key(symbol, params), entry)
+
+    def get_search(self, symbol):
+        return self._get(self.search_key(symbol))
+
+    def put_search(self, symbol, best_params, timestamp):
+        self._put(self.search_key(symbol), {'params': best_params, 'timestamp': timestamp})
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide cache rooted at MODEL_CACHE_DIR"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ModelCache()
+    return _default_cache
@@ -0,0 +1,311 @@
+"""
+Next-price predictor: random forest + linear regression ensemble whose
+window and forest parameters are re-tuned on recent bars on every call.
+
+Grid candidates are independent, so the search fans them out over a
+reusable process pool sized by a CPU budget. With a deadline, whatever
+has finished by then decides the parameters (the search waits past it
+for the first candidate), and fits still running are stopped.
+
+When a symbol is given, the chosen parameters and the live models are
+kept in the model cache. The search is only repeated every RESEARCH_BARS
+bars, and new data is folded into the cached forest by growing a few
+warm-started trees and retiring the oldest ones.
+"""
+import copy
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+import warnings
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from bar_store import bar_interval
+from features import FeatureMatrix
+from model_cache import get_cache
+
+PARAM_GRID = [
+    {'window': test_window, 'n_estimators': n_estimators, 'max_depth': max_depth}
+    for test_window in [15, 20, 25]
+    for n_estimators in [200, 300]
+    for max_depth in [8, 12]
+]
+
+MIN_BARS = 40
+
+# Re-run the grid search once this many bars have passed since the last one
+RESEARCH_BARS = 12
+# Trailing rows each search candidate is scored on out-of-sample
+HOLDOUT_BARS = 5
+# Share of the forest replaced by each warm refit, and refits between full fits
+WARM_START_FRACTION = 0.1
+MAX_WARM_REFITS = 10
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def cpu_budget(requested=None):
+    """Cores to use: requested if positive, else every core"""
+    available = os.cpu_count() or 1
+    if requested and requested > 0:
+        return min(int(requested), available)
+    return available
+
+
+def get_pool(workers):
+    """Process pool reused across calls; rebuilt when the size changes or it broke"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        # A pool whose worker died is unusable
+        if _pool is None or _pool_workers != workers or _pool._broken:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # Don't fork a process that owns a Tk interpreter
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        _pool_workers = 0
+
+
+def _recycle_pool(pool):
+    """
+    Stop a pool whose abandoned fits are still running, so they don't keep
+    the cores busy after the search has returned. The next call starts a
+    fresh pool.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+            _pool_workers = 0
+    # The executor has no public way to stop a running task. Its queued
+    # futures fail with BrokenProcessPool once the workers are gone.
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False)
+
+
+def fit_models(X, y, n_estimators, max_depth, n_jobs=1):
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.linear_model import LinearRegression
+    rf = RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth, random_state=42, n_jobs=n_jobs)
+    rf.fit(X, y)
+    lr = LinearRegression()
+    lr.fit(X, y)
+    return rf, lr
+
+
+def grow_forest(rf, X, y, n_new, n_jobs=1, seed=None):
+    """
+    A copy of rf with n_new warm-started trees fitted on (X, y) and the
+    n_new oldest retired. rf itself is left alone, since other threads may
+    be predicting with it.
+
+    The new trees' seeds are drawn from `seed` (default: rf's own). With a
+    fixed seed they repeat once old trees are retired, because the forest
+    is back to the same size, so pass a value never used before.
+    """
+    rf = copy.deepcopy(rf)
+    rf.set_params(warm_start=True, n_estimators=len(rf.estimators_) + n_new, n_jobs=n_jobs)
+    if seed is not None:
+        rf.set_params(random_state=seed)
+    rf.fit(X, y)
+    del rf.estimators_[:n_new]
+    rf.set_params(n_estimators=len(rf.estimators_))
+    return rf
+
+
+_live_lock = threading.Lock()
+
+
+def live_models(X, y, params, n_jobs=1, symbol=None, cache=None):
+    """
+    Models for the live prediction. Without a symbol they are fitted from
+    scratch; otherwise the cached pair is reused as-is when the training
+    data is unchanged, warm-refitted when it moved on, and fully refitted
+    every MAX_WARM_REFITS refits or when nothing usable is cached.
+    Cached models are never changed in place; a refit stores new ones.
+
+    The last target is the newest close, which moves with every quote
+    while its bar forms. It is left out of the comparison, so models are
+    refitted (and rewritten to disk) once per new bar, not once per tick.
+    """
+    if symbol is None:
+        return fit_models(X, y, params['n_estimators'], params['max_depth'], n_jobs)
+    cache = cache or get_cache()
+    fingerprint = hashlib.sha1(X.tobytes() + y[:-1].tobytes()).hexdigest()
+    with _live_lock:
+        entry = cache.get_models(symbol, params)
+        if entry is not None and entry['fingerprint'] == fingerprint:
+            return entry['rf'], entry['lr']
+        if entry is None or entry['refits'] >= MAX_WARM_REFITS or entry['rf'].n_features_in_ != X.shape[1]:
+            rf, lr = fit_models(X, y, params['n_estimators'], params['max_depth'], n_jobs)
+            refits, grown = 0, params['n_estimators']
+        else:
+            from sklearn.linear_model import LinearRegression
+            n_new = max(1, int(params['n_estimators'] * WARM_START_FRACTION))
+            # Trees grown so far in this forest's lineage; a new seed per refit
+            grown = entry.get('grown', len(entry['rf'].estimators_))
+            rf = grow_forest(entry['rf'], X, y, n_new, n_jobs, seed=grown)
+            lr = LinearRegression()
+            lr.fit(X, y)
+            refits, grown = entry['refits'] + 1, grown + n_new
+        cache.put_models(symbol, params, {'rf': rf, 'lr': lr, 'fingerprint': fingerprint, 'refits': refits,
+                                          'grown': grown})
+    return rf, lr
+
+
+def score_candidate(X, y, params, n_jobs=1):
+    """
+    Out-of-sample MAE for one parameter set: fit on all but the last
+    HOLDOUT_BARS pairs and score the ensemble on those.
+    """
+    warnings.filterwarnings("ignore")
+    h = HOLDOUT_BARS
+    rf, lr = fit_models(X[:-h], y[:-h], params['n_estimators'], params['max_depth'], n_jobs)
+    avg_pred = (rf.predict(X[-h:]) + lr.predict(X[-h:])) / 2
+    return params, float(np.mean(np.abs(avg_pred - y[-h:])))
+
+
+def search(features, grid=PARAM_GRID, cpus=None, deadline=None):
+    """
+    Score every candidate in `grid` against `features` and return
+    (best_params, scores). With more than one CPU the fits run in the
+    process pool; each forest gets n_jobs when there are more cores than
+    candidates.
+
+    After `deadline` seconds the best finished candidate wins. The search
+    doesn't return before one has finished, so the first result may come
+    later than the deadline. Unstarted candidates are then cancelled, and
+    if fits are still running the pool is recycled to stop them. Run
+    serially, a candidate always finishes once started.
+    """
+    jobs = []
+    for params in grid:
+        rows = params['window'] + 20 + HOLDOUT_BARS
+        if len(features) < rows:
+            continue
+        X, y = features.training_set(rows)
+        jobs.append((X, y, params))
+    if not jobs:
+        return None, []
+
+    cpus = cpu_budget(cpus)
+    started = time.monotonic()
+    scores = []
+    if cpus == 1:
+        for X, y, params in jobs:
+            if deadline is not None and scores and time.monotonic() - started > deadline:
+                break
+            scores.append(score_candidate(X, y, params))
+    else:
+        workers = min(cpus, len(jobs))
+        n_jobs = max(1, cpus // workers)
+        pool = get_pool(workers)
+        pending = {pool.submit(score_candidate, X, y, params, n_jobs) for X, y, params in jobs}
+        while pending:
+            # Until a candidate has finished there's nothing to return, so block for it
+            timeout = None
+            if deadline is not None and scores:
+                timeout = max(deadline - (time.monotonic() - started), 0)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    scores.append(future.result())
+                except (BrokenProcessPool, CancelledError):
+                    # A concurrent search recycled the pool
+                    pass
+            if deadline is not None and time.monotonic() - started >= deadline and scores:
+                if any(future.running() for future in pending):
+                    _recycle_pool(pool)
+                else:
+                    for future in pending:
+                        future.cancel()
+                break
+
+    if not scores:
+        return None, []
+    best_params, _ = min(scores, key=lambda item: item[1])
+    return best_params, scores
+
+
+def predict_next_price(closes, window=20, cpus=None, deadline=None, symbol=None, timestamp=None, cache=None):
+    """
+    Adaptive prediction: runs a quick backtest to optimize window/model params for recent data.
+    Returns (predicted_price, signal_quality) where signal_quality is 'strong', 'weak', or 'none'.
+    Pass symbol and the newest bar's timestamp to reuse cached parameters and models.
+    """
+    warnings.filterwarnings("ignore")
+    if len(closes) < MIN_BARS:
+        return None, 'none'
+
+    # Features are computed once; each candidate trains on a slice of the same rows
+    features = FeatureMatrix(closes)
+    best_params = None
+    if symbol is not None:
+        cache = cache or get_cache()
+        cached = cache.get_search(symbol)
+        if cached is not None and timestamp is not None and \
+                0 <= timestamp - cached['timestamp'] < RESEARCH_BARS * bar_interval(symbol):
+            best_params = cached['params']
+    if best_params is None:
+        best_params, _ = search(features, cpus=cpus, deadline=deadline)
+        if best_params is not None and symbol is not None and timestamp is not None:
+            cache.put_search(symbol, best_params, timestamp)
+    if best_params is None:
+        best_params = {'window': window, 'n_estimators': 300, 'max_depth': 12}
+
+    # Use best params for live prediction, with the whole budget on one forest
+    window = best_params['window']
+    if len(features) < window + 15:
+        return None, 'none'
+    X, y = features.training_set(window + 15)
+    rf, lr = live_models(X, y, best_params, cpu_budget(cpus), symbol, cache)
+    last_row = features.live_row()
+    avg_pred = (rf.predict(last_row)[0] + lr.predict(last_row)[0]) / 2
+    return float(avg_pred), signal_quality(features, avg_pred, window)
+
+
+def signal_quality(features, predicted, window):
+    return signal_qualities(features, np.array([predicted]), np.array([len(features) - 1]), window)[0]
+
+
+def signal_qualities(features, predicted, rows, window):
+    """
+    Grade predictions made at feature rows `rows` as 'strong', 'weak' or
+    'none' from trend strength (ADX), volatility (ATR vs. the mean close of
+    the training window), MACD and the size of the predicted move.
+    """
+    rows = np.asarray(rows)
+    adx_val = features.column('adx')[rows]
+    atr_val = features.column('atr')[rows]
+    macd_val = features.column('macd')[rows]
+    last_close = features.close[rows]
+    # Mean close over the window + 15 rows ending at each row
+    span = window + 15
+    csum = np.concatenate(([0.0], np.cumsum(features.close)))
+    lo = np.maximum(rows + 1 - span, 0)
+    mean_close = (csum[rows + 1] - csum[lo]) / (rows + 1 - lo)
+    pred_move = np.abs(predicted - last_close)
+    pip_size = np.where(last_close < 100, 0.0001, 1.0)
+    min_move_pips = np.where(last_close < 100, 5, 10)
+
+    strong = (adx_val > 22) & (atr_val > 0.0007 * mean_close) & (np.abs(macd_val) > 0.0005) & \
+        (pred_move / pip_size > min_move_pips)
+    weak = (adx_val > 18) & (atr_val > 0.0003 * mean_close) & (pred_move / pip_size > 2)
+    return np.where(strong, 'strong', np.where(weak, 'weak', 'none'))
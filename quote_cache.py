@@ -0,0 +1,145 @@
+"""
+Per-symbol stale-while-revalidate cache for market snapshots.
+
+A snapshot (quote plus the indicators derived from it) is served from
+memory while it is younger than `ttl`. Up to `max_stale` seconds past
+that it is still served, but a background refresh is started; older
+entries are refreshed synchronously. Failed loads are remembered for
+`negative_ttl` seconds so a dead upstream isn't hammered on every
+request. Concurrent loads for one symbol are coalesced.
+
+With a `shared` cache (see shared_cache.SharedCache) loads also go
+through a store common to several processes: a snapshot a sibling worker
+loaded within `ttl` is reused, and only one process at a time loads a
+given symbol upstream.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from market_data import SingleFlight
+
+
+class QuoteCache:
+    """Stale-while-revalidate snapshots keyed by symbol"""
+
+    def __init__(self, loader, ttl=5.0, max_stale=30.0, negative_ttl=5.0, shared=None):
+        self.loader = loader
+        self.shared = shared
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.negative_ttl = negative_ttl
+        # symbol -> (loaded_at, snapshot); failures -> (failed_at, error message)
+        self._entries = {}
+        self._failures = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='quote-cache')
+        self._fanout = ThreadPoolExecutor(max_workers=8, thread_name_prefix='quote-cache-fanout')
+        self.counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'negative_hits': 0, 'refreshes': 0, 'errors': 0,
+                         'shared_hits': 0}
+
+    def get(self, symbol):
+        """
+        Snapshot for symbol, or None if it can't be loaded. Snapshots are
+        never older than ttl + max_stale seconds.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is not None:
+                age = now - entry[0]
+                if age < self.ttl:
+                    self.counters['hits'] += 1
+                    return entry[1]
+                if age < self.ttl + self.max_stale:
+                    self.counters['stale_hits'] += 1
+                    if symbol not in self._refreshing:
+                        self._refreshing.add(symbol)
+                        self._executor.submit(self._refresh, symbol)
+                    return entry[1]
+            failure = self._failures.get(symbol)
+            if failure is not None and now - failure[0] < self.negative_ttl:
+                self.counters['negative_hits'] += 1
+                return None
+            self.counters['misses'] += 1
+        try:
+            return self._flights.do(symbol, self._load, symbol)
+        except Exception:
+            return None
+
+    def get_many(self, symbols):
+        """{symbol: snapshot or None}; symbols that miss the cache are loaded concurrently"""
+        if len(symbols) <= 1:
+            return {symbol: self.get(symbol) for symbol in symbols}
+        return dict(zip(symbols, self._fanout.map(self.get, symbols)))
+
+    def error(self, symbol):
+        """Message of the last failed load for symbol, if it is still negatively cached"""
+        failure = self._failures.get(symbol)
+        if failure is not None and time.monotonic() - failure[0] < self.negative_ttl:
+            return failure[1]
+        return None
+
+    def _load(self, symbol):
+        try:
+            age, snapshot = self._load_shared(symbol) if self.shared is not None else (0.0, self.loader(symbol))
+            if snapshot is None:
+                raise LookupError(f"No data for {symbol}")
+        except Exception as e:
+            print(f"Error loading {symbol} snapshot:", str(e))
+            with self._lock:
+                self.counters['errors'] += 1
+                self._failures[symbol] = (time.monotonic(), str(e))
+            raise
+        with self._lock:
+            # A sibling's snapshot keeps the age it already has
+            self._entries[symbol] = (time.monotonic() - age, snapshot)
+            self._failures.pop(symbol, None)
+        return snapshot
+
+    def _load_shared(self, symbol):
+        """(age, snapshot): a sibling process's fresh snapshot, or a new load under the symbol's lock"""
+        hit = self.shared.get(symbol, self.ttl)
+        if hit is None:
+            with self.shared.lock(symbol):
+                # Whoever held the lock may just have loaded it
+                hit = self.shared.get(symbol, self.ttl)
+                if hit is None:
+                    snapshot = self.loader(symbol)
+                    if snapshot is not None:
+                        self.shared.put(symbol, snapshot)
+                    return 0.0, snapshot
+        with self._lock:
+            self.counters['shared_hits'] += 1
+        return hit
+
+    def _refresh(self, symbol):
+        try:
+            with self._lock:
+                self.counters['refreshes'] += 1
+            self._flights.do(symbol, self._load, symbol)
+        except Exception:
+            # The stale entry keeps being served until it ages out
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(symbol)
+
+    def invalidate(self, symbol=None):
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+                self._failures.clear()
+            else:
+                self._entries.pop(symbol, None)
+                self._failures.pop(symbol, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['symbols'] = sorted(self._entries)
+        served = stats['hits'] + stats['stale_hits'] + stats['misses'] + stats['negative_hits']
+        stats['hit_rate'] = (stats['hits'] + stats['stale_hits']) / served if served else 0.0
+        return stats
@@ -0,0 +1,86 @@
+"""
+Snapshot cache shared by the worker processes of one server.
+
+Under gunicorn every worker has its own QuoteCache, and without this
+each of them would fetch the same quotes upstream. Snapshots are written
+to a small SQLite file as JSON. A per-key file lock lets one worker load
+a missing key while the others wait and then read its result. Where
+fcntl isn't available (Windows) the lock only covers this process.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class SharedCache:
+    """JSON values with write times in SQLite, plus cross-process per-key locks"""
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv(
+            'SHARED_CACHE_PATH',
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'shared_cache.sqlite')
+        )
+        self.lock_dir = self.path + '.locks'
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._db = None
+        self._pid = None
+
+    def _connect(self):
+        # A connection opened before a fork belongs to the parent
+        if self._db is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, updated REAL, value TEXT)')
+            self._pid = os.getpid()
+        return self._db
+
+    def get(self, key, max_age):
+        """(age in seconds, value) if key was written less than max_age seconds ago, else None"""
+        with self._lock:
+            try:
+                row = self._connect().execute('SELECT updated, value FROM entries WHERE key = ?', (key,)).fetchone()
+            except sqlite3.Error as e:
+                print("Error reading shared cache:", str(e))
+                return None
+        if row is None:
+            return None
+        age = max(0.0, time.time() - row[0])
+        return (age, json.loads(row[1])) if age < max_age else None
+
+    def put(self, key, value):
+        data = json.dumps(value)
+        with self._lock:
+            try:
+                db = self._connect()
+                with db:
+                    db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)', (key, time.time(), data))
+            except sqlite3.Error as e:
+                print("Error saving shared cache:", str(e))
+
+    @contextmanager
+    def lock(self, key):
+        """Hold key's lock across threads and, where supported, processes"""
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            fd = None
+            if fcntl is not None:
+                os.makedirs(self.lock_dir, exist_ok=True)
+                fd = os.open(os.path.join(self.lock_dir, f"{key}.lock"), os.O_RDWR | os.O_CREAT)
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fd is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
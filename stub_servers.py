@@ -0,0 +1,333 @@
+"""
+Local stand-ins for the Binance, Frankfurter and OpenAI APIs.
+
+Benchmarks and load tests point MarketDataClient at these through
+BINANCE_API_URL / FRANKFURTER_API_URL, and the openai SDK through
+OPENAI_BASE_URL, so they run offline and reproducibly. Prices follow a
+seeded random walk; chat completions are a canned trading plan built
+around the price in the prompt, blocking or streamed.
+
+Each server counts the requests it served and can add a latency per
+response (fixed or drawn from a distribution, see latency_model), fail a
+fraction of requests with 500 and throttle to a request rate with 429.
+
+Usage:
+    servers = start_upstreams(latency=0.05)
+    os.environ.update(upstream_env(servers))
+    ...
+    stop_upstreams(servers)
+"""
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+BAR_SECONDS = 300
+UPSTREAMS = ('binance', 'frankfurter', 'openai')
+
+
+def latency_model(spec, seed=0):
+    """
+    Seconds-per-response callable from a spec: '0.05' (fixed),
+    'uniform:LOW:HIGH' or 'lognormal:MEDIAN:SIGMA'.
+    """
+    if callable(spec):
+        return spec
+    kind, _, args = str(spec).partition(':')
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    if kind == 'uniform':
+        low, high = (float(v) for v in args.split(':'))
+
+        def uniform():
+            with lock:
+                return rng.uniform(low, high)
+        return uniform
+    if kind == 'lognormal':
+        median, sigma = (float(v) for v in args.split(':'))
+
+        def lognormal():
+            with lock:
+                return median * rng.lognormvariate(0, sigma)
+        return lognormal
+    seconds = float(spec)
+    return lambda: seconds
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, in bursts of up to `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class StubServer:
+    """
+    HTTP server answering route(path, query, body) -> (status, body) on a
+    background thread. A dict/list body is sent as JSON; any other
+    iterable is streamed as server-sent events, one `data:` line per item.
+    """
+
+    def __init__(self, route, latency=0.0, error_rate=0.0, rate_limit=None, seed=0, host='127.0.0.1', port=0):
+        self.route = route
+        self.latency = latency_model(latency, seed)
+        self.error_rate = error_rate
+        self.bucket = TokenBucket(rate_limit) if rate_limit else None
+        self.hits = 0
+        self.errors = 0
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; don't let Nagle hold the body back
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self)
+
+            def do_POST(self):
+                server._handle(self)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_port}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='stub-server', daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'errors': self.errors, 'throttled': self.throttled}
+
+    def _handle(self, request):
+        length = int(request.headers.get('Content-Length') or 0)
+        payload = request.rfile.read(length) if length else b''
+        with self._lock:
+            self.hits += 1
+            fail = self.error_rate and self._random.random() < self.error_rate
+        if self.bucket is not None and not self.bucket.take():
+            with self._lock:
+                self.throttled += 1
+            self._send(request, 429, {'error': {'message': 'Rate limit exceeded', 'type': 'rate_limit_error'}},
+                       {'Retry-After': '1'})
+            return
+        delay = self.latency()
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            with self._lock:
+                self.errors += 1
+            self._send(request, 500, {'error': {'message': 'Injected upstream failure', 'type': 'server_error'}})
+            return
+        parts = urlsplit(request.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        try:
+            body = json.loads(payload) if payload else None
+        except ValueError:
+            self._send(request, 400, {'error': {'message': 'Invalid JSON body', 'type': 'invalid_request_error'}})
+            return
+        status, body = self.route(parts.path, query, body)
+        if isinstance(body, (dict, list)):
+            self._send(request, status, body)
+        else:
+            self._stream(request, status, body)
+
+    def _send(self, request, status, body, headers=None):
+        data = json.dumps(body).encode()
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(data)
+
+    def _stream(self, request, status, events):
+        # No Content-Length, so the end of the stream is the end of the connection
+        request.close_connection = True
+        request.send_response(status)
+        request.send_header('Content-Type', 'text/event-stream')
+        request.send_header('Connection', 'close')
+        request.end_headers()
+        for event in events:
+            data = event if isinstance(event, str) else json.dumps(event)
+            request.wfile.write(f"data: {data}\n\n".encode())
+            request.wfile.flush()
+
+
+class RandomWalk:
+    """Thread-safe seeded random walk of prices"""
+
+    def __init__(self, start, step, seed=0):
+        self.price = start
+        self.step = step
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            self.price *= 1 + self._random.gauss(0, self.step)
+            return self.price
+
+
+def binance_route(walk=None):
+    walk = walk or RandomWalk(60000.0, 0.001, seed=1)
+
+    def route(path, query, body=None):
+        if path == '/api/v3/ticker/price':
+            return 200, {'symbol': query.get('symbol', 'BTCUSDT'), 'price': f"{walk.next():.2f}"}
+        if path == '/api/v3/klines':
+            limit = int(query.get('limit', 500))
+            now = int(time.time()) // BAR_SECONDS * BAR_SECONDS
+            rows = []
+            for i in range(limit):
+                open_time = (now - BAR_SECONDS * (limit - 1 - i)) * 1000
+                o, c = walk.price, walk.next()
+                rows.append([open_time, f"{o:.2f}", f"{max(o, c):.2f}", f"{min(o, c):.2f}", f"{c:.2f}", "1.0",
+                             open_time + BAR_SECONDS * 1000 - 1])
+            return 200, rows
+        return 404, {'code': -1, 'msg': 'Not found'}
+
+    return route
+
+
+def frankfurter_route(walk=None):
+    walk = walk or RandomWalk(1.08, 0.002, seed=2)
+
+    def route(path, query, body=None):
+        today = datetime.now(timezone.utc).date()
+        if path == '/latest':
+            return 200, {'amount': 1.0, 'base': 'EUR', 'date': today.isoformat(), 'rates': {'USD': round(walk.next(), 5)}}
+        match = re.fullmatch(r'/(\d{4}-\d{2}-\d{2})\.\.(\d{4}-\d{2}-\d{2})?', path)
+        if match:
+            day = datetime.strptime(match.group(1), '%Y-%m-%d').date()
+            end = datetime.strptime(match.group(2), '%Y-%m-%d').date() if match.group(2) else today
+            rates = {}
+            while day <= end:
+                if day.weekday() < 5:
+                    rates[day.isoformat()] = {'USD': round(walk.next(), 5)}
+                day += timedelta(days=1)
+            return 200, {'amount': 1.0, 'base': 'EUR', 'rates': rates}
+        return 404, {'message': 'not found'}
+
+    return route
+
+
+def advice_text(prompt):
+    """A trading plan in the shape the advice prompt asks for, around the prompt's current price"""
+    match = re.search(r'Current Price:\s*([\d.]+)', prompt)
+    price = float(match.group(1)) if match else 100.0
+    digits = 5 if price < 10 else 2
+    return (
+        f"Advice: Wait for a pullback before buying.\n"
+        f"Entry: {price:.{digits}f}\n"
+        f"Stop-Loss: {price * 0.99:.{digits}f}\n"
+        f"Take-Profit: {price * 1.02:.{digits}f}\n"
+        "RSI and MACD are neutral, so support and resistance carried the most weight."
+    )
+
+
+def openai_route(token_delay=0.0):
+    """Chat completions (blocking and stream=True) in the shape the openai SDK expects"""
+    counter = iter(range(1, 1 << 62))
+
+    def route(path, query, body=None):
+        if not path.rstrip('/').endswith('/chat/completions'):
+            return 404, {'error': {'message': f'Unknown path {path}', 'type': 'invalid_request_error'}}
+        body = body or {}
+        model = body.get('model', 'gpt-4')
+        messages = body.get('messages') or [{}]
+        text = advice_text(messages[-1].get('content', ''))
+        # Words stand in for tokens
+        prompt_tokens = sum(len(str(m.get('content', '')).split()) for m in messages)
+        completion_id = f"chatcmpl-stub{next(counter)}"
+        created = int(time.time())
+        if body.get('stream'):
+            return 200, _completion_chunks(completion_id, created, model, text, token_delay)
+        return 200, {
+            'id': completion_id, 'object': 'chat.completion', 'created': created, 'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(text.split()),
+                      'total_tokens': prompt_tokens + len(text.split())},
+        }
+
+    return route
+
+
+def _completion_chunks(completion_id, created, model, text, token_delay):
+    def chunk(delta, finish_reason=None):
+        return {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+
+    yield chunk({'role': 'assistant'})
+    for word in re.findall(r'\S+\s*', text):
+        if token_delay:
+            time.sleep(token_delay)
+        yield chunk({'content': word})
+    yield chunk({}, 'stop')
+    yield '[DONE]'
+
+
+ROUTES = {'binance': binance_route, 'frankfurter': frankfurter_route, 'openai': openai_route}
+
+
+def start_upstreams(latency=0.0, error_rate=0.0, rate_limit=None, profiles=None, seed=0):
+    """
+    Start stub Binance, Frankfurter and OpenAI servers; returns {name: StubServer}.
+    profiles maps a name to StubServer settings (latency, error_rate,
+    rate_limit) overriding the shared ones.
+    """
+    servers = {}
+    for i, name in enumerate(UPSTREAMS):
+        settings = {'latency': latency, 'error_rate': error_rate, 'rate_limit': rate_limit}
+        settings.update((profiles or {}).get(name, {}))
+        servers[name] = StubServer(ROUTES[name](), seed=seed + i, **settings)
+        servers[name].start()
+    return servers
+
+
+def upstream_env(servers):
+    """Environment variables pointing MarketDataClient and the openai SDK at the stubs"""
+    env = {
+        'BINANCE_API_URL': servers['binance'].url,
+        'FRANKFURTER_API_URL': servers['frankfurter'].url,
+    }
+    if 'openai' in servers:
+        env.update(OPENAI_BASE_URL=servers['openai'].url + '/v1', OPENAI_API_KEY='sk-stub')
+    return env
+
+
+def stop_upstreams(servers):
+    for server in servers.values():
+        server.stop()
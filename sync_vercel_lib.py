@@ -0,0 +1,56 @@
+"""
+Copy the modules the Vercel handlers share with the desktop app and
+web_api.py into web-frontend/api/_lib.
+
+Vercel deploys web-frontend on its own, so the handlers can't import the
+top-level modules directly. The top-level files are the source of truth;
+run this after changing one of them. --check only reports copies that
+are out of date and exits non-zero if there are any (the tests run it).
+
+Usage:
+    python sync_vercel_lib.py
+    python sync_vercel_lib.py --check
+"""
+import argparse
+import filecmp
+import os
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+LIB_DIR = os.path.join(ROOT, 'web-frontend', 'api', '_lib')
+SHARED_MODULES = [
+    'advice_cache.py',
+    'bar_store.py',
+    'indicators.py',
+    'llm_advice.py',
+    'market_data.py',
+    'metrics.py',
+    'quote_cache.py',
+]
+
+
+def stale_copies():
+    """Shared modules whose copy in LIB_DIR is missing or differs from the original"""
+    return [name for name in SHARED_MODULES
+            if not os.path.exists(os.path.join(LIB_DIR, name))
+            or not filecmp.cmp(os.path.join(ROOT, name), os.path.join(LIB_DIR, name), shallow=False)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Copy the shared modules into the Vercel handlers' _lib")
+    parser.add_argument('--check', action='store_true', help='Only report out-of-date copies')
+    args = parser.parse_args(argv)
+    stale = stale_copies()
+    if args.check:
+        for name in stale:
+            print(f"web-frontend/api/_lib/{name} is out of date; run python sync_vercel_lib.py")
+        return 1 if stale else 0
+    for name in stale:
+        shutil.copyfile(os.path.join(ROOT, name), os.path.join(LIB_DIR, name))
+        print(f"Updated web-frontend/api/_lib/{name}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
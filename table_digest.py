@@ -0,0 +1,265 @@
+"""
+Streaming ingestion of uploaded CSV/XLSX tables.
+
+Files are read in fixed-size row chunks, so memory stays flat however
+large the export is. While streaming, a TableDigest keeps per-column
+statistics (counts, nulls, min/max/mean/std, top values), detects OHLC /
+price / volume / time columns and tracks returns and drawdown on the
+close. Only the last TAIL_BARS closes are kept, which is enough for the
+latest indicator values. The digest renders as a short text summary
+for the model in place of the raw rows.
+"""
+import math
+import os
+import re
+from collections import Counter, deque
+
+import numpy as np
+import pandas as pd
+
+import indicators
+
+CHUNK_ROWS = 100_000
+TAIL_BARS = 500
+# Distinct values tracked per text column before it's reported as high-cardinality
+MAX_DISTINCT = 1000
+MAX_COLUMNS = 40
+
+# Column name patterns for OHLC detection, first match wins
+ROLE_PATTERNS = {
+    'time': r'^(time|timestamp|date|datetime|date ?time|open ?time|ts)$',
+    'open': r'^(o|open|open ?price)$',
+    'high': r'^(h|high|high ?price)$',
+    'low': r'^(l|low|low ?price)$',
+    'close': r'^(c|close|close ?price|adj ?close|last|price|rate)$',
+    'volume': r'^(v|vol|volume|qty|quantity|amount)$',
+}
+
+
+def is_table(path):
+    return os.path.splitext(path)[1].lower() in ('.csv', '.xlsx')
+
+
+def iter_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yield the table in DataFrames of at most chunk_rows rows"""
+    if path.lower().endswith('.xlsx'):
+        yield from _iter_xlsx(path, chunk_rows)
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows, encoding_errors='replace')
+
+
+def _iter_xlsx(path, chunk_rows):
+    # read_only mode streams rows from the sheet XML instead of loading the workbook
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c) if c is not None else f"column_{i}" for i, c in enumerate(header)]
+        batch = []
+        for row in rows:
+            batch.append(row[:len(columns)])
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def preview(path, rows=5):
+    """First rows of the table as text, reading no more than needed"""
+    df = next(iter_chunks(path, rows), None)
+    if df is None:
+        return "(empty file)"
+    return df.head(rows).to_string()
+
+
+class _ColumnStats:
+    def __init__(self, name, numeric):
+        self.name = name
+        self.numeric = numeric
+        self.count = 0
+        self.nulls = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.values = Counter()
+        self.high_cardinality = False
+
+    def update(self, series):
+        self.nulls += int(series.isna().sum())
+        series = series.dropna()
+        if self.numeric:
+            values = pd.to_numeric(series, errors='coerce').dropna().to_numpy(dtype=np.float64)
+            if len(values):
+                self.count += len(values)
+                self.min = min(self.min, float(values.min()))
+                self.max = max(self.max, float(values.max()))
+                self.total += float(values.sum())
+                self.total_sq += float(np.square(values).sum())
+            return
+        self.count += len(series)
+        if not self.high_cardinality:
+            self.values.update(series.astype(str).str.slice(0, 40).value_counts().to_dict())
+            if len(self.values) > MAX_DISTINCT:
+                self.high_cardinality = True
+                self.values = Counter()
+
+    def describe(self):
+        if self.numeric:
+            if not self.count:
+                return f"{self.name}: numeric, all null"
+            mean = self.total / self.count
+            std = math.sqrt(max(self.total_sq / self.count - mean * mean, 0.0))
+            return (f"{self.name}: numeric, n={self.count}, nulls={self.nulls}, "
+                    f"min={self.min:.6g}, max={self.max:.6g}, mean={mean:.6g}, std={std:.6g}")
+        text = f"{self.name}: text, n={self.count}, nulls={self.nulls}"
+        if self.high_cardinality:
+            return f"{text}, distinct>{MAX_DISTINCT}"
+        top = ', '.join(f"{value!r}×{n}" for value, n in self.values.most_common(5))
+        return f"{text}, distinct={len(self.values)}, top: {top}"
+
+
+class TableDigest:
+    """Bounded-memory summary of a table fed one chunk at a time"""
+
+    def __init__(self, tail_bars=TAIL_BARS):
+        self.rows = 0
+        self.columns = None
+        self.roles = {}
+        self.time_range = None
+        self.first_close = None
+        self.last_close = None
+        self.peak = -math.inf
+        self.max_drawdown = 0.0
+        self.returns_n = 0
+        self.returns_sum = 0.0
+        self.returns_sq = 0.0
+        self.tail = {role: deque(maxlen=tail_bars) for role in ('high', 'low', 'close')}
+
+    def _setup(self, chunk):
+        self.columns = {}
+        for name in list(chunk.columns)[:MAX_COLUMNS]:
+            column = chunk[name]
+            numeric = pd.api.types.is_numeric_dtype(column)
+            if not numeric and column.dtype == object and column.notna().any():
+                numeric = pd.to_numeric(column, errors='coerce').notna().mean() >= 0.9
+            self.columns[name] = _ColumnStats(str(name), numeric)
+        for role, pattern in ROLE_PATTERNS.items():
+            for name, stats in self.columns.items():
+                if name in self.roles.values():
+                    continue
+                if re.match(pattern, str(name).strip().lower()) and (stats.numeric or role == 'time'):
+                    self.roles[role] = name
+                    break
+
+    def update(self, chunk):
+        if self.columns is None:
+            self._setup(chunk)
+        self.rows += len(chunk)
+        for name, stats in self.columns.items():
+            stats.update(chunk[name])
+        if 'time' in self.roles:
+            self._update_time(chunk[self.roles['time']])
+        if 'close' in self.roles:
+            self._update_close(chunk)
+
+    def _update_time(self, column):
+        if pd.api.types.is_numeric_dtype(column):
+            # Epoch seconds or milliseconds
+            unit = 'ms' if column.dropna().abs().max() > 1e11 else 's'
+            times = pd.to_datetime(column, unit=unit, errors='coerce')
+        else:
+            times = pd.to_datetime(column, errors='coerce')
+        times = times.dropna()
+        if len(times):
+            lo, hi = times.min(), times.max()
+            if self.time_range is None:
+                self.time_range = (lo, hi)
+            else:
+                self.time_range = (min(self.time_range[0], lo), max(self.time_range[1], hi))
+
+    def _update_close(self, chunk):
+        close = pd.to_numeric(chunk[self.roles['close']], errors='coerce').to_numpy(dtype=np.float64)
+        valid = ~np.isnan(close)
+        close = close[valid]
+        if not len(close):
+            return
+        if self.first_close is None:
+            self.first_close = float(close[0])
+        # Log returns, including the step from the previous chunk's last close
+        if self.last_close is None:
+            previous, current = close[:-1], close[1:]
+        else:
+            previous, current = np.concatenate(([self.last_close], close[:-1])), close
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.log(current / previous)
+        returns = returns[np.isfinite(returns)]
+        self.returns_n += len(returns)
+        self.returns_sum += float(returns.sum())
+        self.returns_sq += float(np.square(returns).sum())
+        # Drawdown from the running peak carried across chunks
+        peaks = np.maximum.accumulate(np.concatenate(([self.peak], close)))[1:]
+        self.peak = float(peaks[-1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drawdowns = np.where(peaks > 0, 1 - close / peaks, 0.0)
+        self.max_drawdown = max(self.max_drawdown, float(np.nanmax(drawdowns)))
+        self.last_close = float(close[-1])
+        self.tail['close'].extend(close[-self.tail['close'].maxlen:])
+        for role in ('high', 'low'):
+            if role in self.roles:
+                values = pd.to_numeric(chunk[self.roles[role]], errors='coerce').to_numpy(dtype=np.float64)[valid]
+                self.tail[role].extend(values[-self.tail[role].maxlen:])
+
+    def indicator_values(self):
+        """Latest indicator values over the retained tail of closes"""
+        closes = np.array(self.tail['close'])
+        if len(closes) < 2:
+            return {}
+        highs = np.array(self.tail['high']) if 'high' in self.roles else None
+        lows = np.array(self.tail['low']) if 'low' in self.roles else None
+        series = indicators.run(closes, highs, lows)
+        return {name: float(values[-1]) for name, values in series.items() if not np.isnan(values[-1])}
+
+    def to_text(self, path=None):
+        """Compact description for the model"""
+        lines = []
+        if path:
+            lines.append(f"File: {os.path.basename(path)} ({os.path.getsize(path):,} bytes)")
+        lines.append(f"Rows: {self.rows:,}; columns: {len(self.columns or {})}")
+        if self.roles:
+            lines.append("Detected columns: " + ', '.join(f"{role}={name}" for role, name in self.roles.items()))
+        if self.time_range is not None:
+            lines.append(f"Time range: {self.time_range[0]} to {self.time_range[1]}")
+        lines.append("Column statistics:")
+        lines.extend(f"- {stats.describe()}" for stats in (self.columns or {}).values())
+        if self.first_close is not None:
+            change = (self.last_close / self.first_close - 1) * 100 if self.first_close else float('nan')
+            lines.append(f"Close: first {self.first_close:.6g}, last {self.last_close:.6g} ({change:+.2f}%), "
+                         f"max drawdown {self.max_drawdown * 100:.2f}%")
+            if self.returns_n > 1:
+                mean = self.returns_sum / self.returns_n
+                std = math.sqrt(max(self.returns_sq / self.returns_n - mean * mean, 0.0))
+                lines.append(f"Per-row log returns: mean {mean:.3g}, std {std:.3g} over {self.returns_n:,} steps")
+            values = self.indicator_values()
+            if values:
+                lines.append(f"Latest indicators (last {len(self.tail['close'])} rows): " +
+                             ', '.join(f"{name}={value:.5g}" for name, value in values.items()))
+        return '\n'.join(lines)
+
+
+def digest_file(path, chunk_rows=CHUNK_ROWS, check=None, on_progress=None):
+    """Stream path through a TableDigest; on_progress(rows) after each chunk"""
+    digest = TableDigest()
+    for chunk in iter_chunks(path, chunk_rows):
+        if check is not None:
+            check()
+        digest.update(chunk)
+        if on_progress is not None:
+            on_progress(digest.rows)
+    return digest
@@ -0,0 +1,38 @@
+import threading
+
+import llm_advice
+from advice_cache import AdviceCache
+
+
+def rows(cache):
+    with cache._db_lock:
+        return cache._connect().execute('SELECT COUNT(*) FROM advice').fetchone()[0]
+
+
+def test_price_bands_use_the_symbols_pip_size(tmp_path):
+    cache = AdviceCache(str(tmp_path / 'advice.sqlite'), price_pips=20)
+    # A BTC price below 100 still moves in whole-dollar pips, like the pip distances shown
+    assert llm_advice.pip_size('BTCUSD') == 1.0
+    assert cache.buckets('BTCUSD', 50.0, 50.0, 0.0)[0] == 2
+    assert cache.buckets('EUR/USD', 1.0850, 50.0, 0.0)[0] == 542
+
+
+def test_memory_hits_dont_wait_for_sqlite(tmp_path):
+    cache = AdviceCache(str(tmp_path / 'advice.sqlite'))
+    cache.put('key', 'Buy')
+    answers = []
+    with cache._db_lock:
+        # Stands in for a slow disk write by another thread
+        reader = threading.Thread(target=lambda: answers.append(cache.get('key')))
+        reader.start()
+        reader.join(timeout=2)
+    assert answers == ['Buy']
+
+
+def test_expired_rows_are_swept_every_n_puts(tmp_path):
+    cache = AdviceCache(str(tmp_path / 'advice.sqlite'), ttl=-1, sweep_every=3)
+    cache.put('a', 'Buy')
+    cache.put('b', 'Sell')
+    assert rows(cache) == 2
+    cache.put('c', 'Hold')
+    assert rows(cache) == 0
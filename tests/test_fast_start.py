@@ -0,0 +1,15 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_report_includes_eager_imports():
+    code = "import fast_start\nimport json\nimport bar_store\nfast_start.mark('imports')\nfast_start.report()"
+    env = dict(os.environ, STARTUP_REPORT='1')
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True,
+                         check=True).stdout
+    imports = out.split('Module imports:')[1]
+    # bar_store is charged for numpy, which it imports first
+    assert 'bar_store' in imports and 'numpy' not in imports
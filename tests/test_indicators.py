@@ -0,0 +1,130 @@
+"""
+indicators.py against the ta library, on a seeded random walk and on
+recorded daily MSFT bars (tests/data/msft_daily.csv, from matplotlib's
+sample data), with and without high/low columns.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+from bar_store import BarStore
+
+ta = pytest.importorskip('ta')
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def random_walk(n=400, seed=7):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 1e-2, n)))
+    opens = np.concatenate(([closes[0]], closes[:-1]))
+    spread = np.abs(rng.normal(0, 5e-3, n)) * closes
+    timestamps = 1_700_000_000 + np.arange(n, dtype=np.int64) * 300
+    return timestamps, opens, np.maximum(opens, closes) + spread, np.minimum(opens, closes) - spread, closes
+
+
+def recorded():
+    df = pd.read_csv(os.path.join(DATA, 'msft_daily.csv'))
+    timestamps = pd.to_datetime(df['date']).astype('int64').to_numpy() // 10**9
+    return (timestamps, df['open'].to_numpy(), df['high'].to_numpy(),
+            df['low'].to_numpy(), df['close'].to_numpy())
+
+
+SERIES = {'random walk': random_walk, 'msft daily': recorded}
+
+
+def reference(closes, highs, lows):
+    """The app's features computed with ta, column by column"""
+    close, high, low = pd.Series(closes), pd.Series(highs), pd.Series(lows)
+    bb = ta.volatility.BollingerBands(close, 5, 2)
+    return {
+        'rsi': ta.momentum.RSIIndicator(close, 14).rsi(),
+        'macd': ta.trend.MACD(close).macd_diff(),
+        'sma': ta.trend.SMAIndicator(close, 5).sma_indicator(),
+        'ema9': ta.trend.EMAIndicator(close, 9).ema_indicator(),
+        'ema21': ta.trend.EMAIndicator(close, 21).ema_indicator(),
+        'adx': ta.trend.ADXIndicator(high, low, close, 14).adx(),
+        'stoch_k': ta.momentum.StochasticOscillator(high, low, close, 14).stoch(),
+        'cci': ta.trend.CCIIndicator(high, low, close, 14).cci(),
+        'bb_middle': bb.bollinger_mavg(),
+        'bb_upper': bb.bollinger_hband(),
+        'bb_lower': bb.bollinger_lband(),
+        'atr': ta.volatility.AverageTrueRange(high, low, close, 5).average_true_range(),
+        'ret1': close.pct_change(1),
+        'ret2': close.pct_change(2),
+        'ret3': close.pct_change(3),
+    }
+
+
+def assert_features_equal(actual, expected):
+    for name in indicators.FEATURES:
+        np.testing.assert_allclose(actual[name], expected[name], rtol=1e-9, atol=1e-9, err_msg=name)
+
+
+@pytest.mark.parametrize('high_low', [True, False], ids=['ohlc', 'close only'])
+@pytest.mark.parametrize('series', list(SERIES))
+def test_run_matches_ta(series, high_low):
+    _, _, highs, lows, closes = SERIES[series]()
+    if high_low:
+        out = indicators.run(closes, highs, lows)
+        expected = reference(closes, highs, lows)
+    else:
+        out = indicators.run(closes)
+        expected = reference(closes, closes, closes)
+    with np.errstate(invalid='ignore'):
+        for name in indicators.FEATURES:
+            theirs = expected[name].to_numpy()
+            if name.startswith('ema'):
+                # The engine's EMAs report from the first bar; ta waits for a full window
+                defined = ~np.isnan(theirs)
+                np.testing.assert_allclose(out[name][defined], theirs[defined], rtol=1e-9, err_msg=name)
+            else:
+                np.testing.assert_allclose(out[name], theirs, rtol=1e-9, atol=1e-9, err_msg=name)
+
+
+@pytest.mark.parametrize('series', list(SERIES))
+def test_incremental_update_matches_run(series):
+    _, _, highs, lows, closes = SERIES[series]()
+    expected = indicators.run(closes, highs, lows)
+    engine = indicators.IndicatorEngine()
+    actual = {name: np.empty(len(closes)) for name in indicators.FEATURES}
+    for i in range(len(closes)):
+        # Try a different bar first and rewind, like a forming bar updated by quotes
+        state = engine.snapshot()
+        engine.update(closes[i] * 1.01, highs[i] * 1.02, lows[i] * 0.99)
+        engine.restore(state)
+        values = engine.update(closes[i], highs[i], lows[i])
+        for name in indicators.FEATURES:
+            actual[name][i] = values[name]
+    assert_features_equal(actual, expected)
+
+
+@pytest.mark.parametrize('high_low', [True, False], ids=['ohlc', 'close only'])
+@pytest.mark.parametrize('series', list(SERIES))
+def test_store_indicators_follow_the_forming_bar(tmp_path, series, high_low):
+    timestamps, opens, highs, lows, closes = SERIES[series]()
+    store = BarStore(str(tmp_path))
+    state = indicators.StoreIndicators(store, high_low=high_low)
+
+    def expected():
+        bars = store.tail('TEST')
+        if high_low:
+            out = indicators.run(bars.close, bars.high, bars.low)
+        else:
+            out = indicators.run(bars.close)
+        return {name: out[name][-1] for name in indicators.FEATURES}
+
+    half = len(closes) // 2
+    store.append_bars('TEST', timestamps[:half], opens[:half], highs[:half], lows[:half], closes[:half])
+    assert_features_equal(state.latest('TEST'), expected())
+    for i in range(half, len(closes)):
+        store.append_bars('TEST', timestamps[i:i + 1], opens[i:i + 1], highs[i:i + 1], lows[i:i + 1], closes[i:i + 1])
+        assert_features_equal(state.latest('TEST'), expected())
+        # Live quotes move the forming bar up and down
+        for move in (1.01, 0.98):
+            store.append_quote('TEST', closes[i] * move, timestamp=timestamps[i] + 1)
+            assert_features_equal(state.latest('TEST'), expected())
+        assert_features_equal(state.latest('TEST'), expected())
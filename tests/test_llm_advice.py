@@ -0,0 +1,28 @@
+import pytest
+
+import llm_advice
+from stub_servers import StubServer, advice_text, openai_route
+
+pytest.importorskip('openai')
+
+PROMPT = "Current Price: 61234.50\nUser Question: buy now?"
+
+
+@pytest.fixture
+def api_key(monkeypatch):
+    server = StubServer(openai_route())
+    monkeypatch.setenv('OPENAI_BASE_URL', server.url + '/v1')
+    server.start()
+    # Clients are kept per key; a fresh key picks up this server's URL
+    yield f"sk-test-{server.url}"
+    server.stop()
+
+
+def test_complete(api_key):
+    assert llm_advice.complete(PROMPT, api_key) == advice_text(PROMPT)
+
+
+def test_stream_completion(api_key):
+    pieces = list(llm_advice.stream_completion(PROMPT, api_key))
+    assert len(pieces) > 1
+    assert ''.join(pieces) == advice_text(PROMPT)
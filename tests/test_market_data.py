@@ -0,0 +1,63 @@
+import asyncio
+import socket
+import threading
+
+from market_data import MarketDataClient, MarketDataError
+from stub_servers import StubServer, binance_route
+
+
+def test_concurrent_quotes_share_one_upstream_request():
+    server = StubServer(binance_route(), latency=0.5)
+    server.start()
+    try:
+        client = MarketDataClient(binance_url=server.url, pool_size=8)
+        callers = 200
+        barrier = threading.Barrier(callers)
+        prices = []
+
+        def call():
+            barrier.wait()
+            prices.append(client.quote('BTCUSD', record=False))
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.stop()
+    assert len(prices) == callers and len(set(prices)) == 1
+    assert client.upstream_calls['binance'] == 1
+    assert server.stats()['hits'] == 1
+
+
+def test_async_quotes_share_one_upstream_request():
+    server = StubServer(binance_route(), latency=0.2)
+    server.start()
+    try:
+        client = MarketDataClient(binance_url=server.url, pool_size=8)
+
+        async def main():
+            return await asyncio.gather(*(client.aquote('BTCUSD', record=False) for _ in range(50)))
+
+        prices = asyncio.run(main())
+    finally:
+        server.stop()
+    assert len(prices) == 50 and len(set(prices)) == 1
+    assert server.stats()['hits'] == 1
+
+
+def test_async_quotes_return_failures_as_values():
+    server = StubServer(binance_route())
+    server.start()
+    try:
+        # Nothing listens on the Frankfurter URL
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            dead_url = f"http://127.0.0.1:{s.getsockname()[1]}"
+        client = MarketDataClient(binance_url=server.url, frankfurter_url=dead_url, timeout=2)
+        results = asyncio.run(client.aquotes(['BTCUSD', 'EUR/USD'], record=False))
+    finally:
+        server.stop()
+    assert isinstance(results['BTCUSD'], float)
+    assert isinstance(results['EURUSD'], MarketDataError)
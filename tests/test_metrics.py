@@ -0,0 +1,51 @@
+import json
+
+import metrics
+
+
+def process_families(requests, in_flight, ratio):
+    return [
+        {'name': 'requests_total', 'kind': 'counter', 'help': 'Requests', 'labels': ['route'],
+         'series': [[['/price'], requests]]},
+        {'name': 'latency_seconds', 'kind': 'histogram', 'help': 'Latency', 'labels': [], 'buckets': [0.1, 1.0],
+         'series': [[[], [[requests, 0, 0], 0.01 * requests]]]},
+        {'name': 'in_flight', 'kind': 'gauge', 'help': 'In flight', 'labels': [], 'mode': 'sum',
+         'series': [[[], in_flight]]},
+        {'name': 'hit_ratio', 'kind': 'gauge', 'help': 'Ratio', 'labels': [], 'mode': 'pid',
+         'series': [[[], ratio]]},
+    ]
+
+
+def by_name(families):
+    return {family['name']: family for family in families}
+
+
+def test_merge_sums_counters_histograms_and_gauges():
+    merged = by_name(metrics.merge([(101, process_families(3, 1, 0.5)), (102, process_families(4, 2, 0.25))]))
+    assert merged['requests_total']['series'] == [[['/price'], 7]]
+    assert merged['latency_seconds']['series'] == [[[], [[7, 0, 0], 0.07]]]
+    assert merged['in_flight']['series'] == [[[], 3]]
+    assert merged['hit_ratio']['labels'] == ['pid']
+    assert sorted(merged['hit_ratio']['series']) == [[['101'], 0.5], [['102'], 0.25]]
+
+
+def test_dead_workers_keep_their_counts_but_not_their_gauges(tmp_path):
+    for pid, requests in ((101, 3), (102, 4)):
+        (tmp_path / f'{pid}.json').write_text(json.dumps(process_families(requests, 1, 0.5)))
+    metrics.mark_process_dead(101, str(tmp_path))
+    metrics.mark_process_dead(102, str(tmp_path))
+    assert sorted(p.name for p in tmp_path.iterdir()) == [metrics.ARCHIVE_FILE]
+    archived = by_name(metrics._read(str(tmp_path / metrics.ARCHIVE_FILE)))
+    assert archived['requests_total']['series'] == [[['/price'], 7]]
+    assert 'in_flight' not in archived and 'hit_ratio' not in archived
+
+
+def test_histogram_exposition():
+    lines = metrics._format_family(process_families(2, 0, 0)[1])
+    assert lines[2:] == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 2',
+        'latency_seconds_sum 0.02',
+        'latency_seconds_count 2',
+    ]
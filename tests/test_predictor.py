@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+import predictor
+from model_cache import ModelCache
+
+pytest.importorskip('sklearn')
+
+
+def test_grow_forest_leaves_the_cached_forest_alone():
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(60, 4)), rng.normal(size=60)
+    rf, _ = predictor.fit_models(X, y, n_estimators=20, max_depth=4)
+    trees = list(rf.estimators_)
+    before = rf.predict(X)
+
+    grown = predictor.grow_forest(rf, X + 0.1, y, n_new=5)
+
+    assert grown is not rf
+    assert rf.estimators_ == trees
+    np.testing.assert_array_equal(rf.predict(X), before)
+    assert len(grown.estimators_) == 20
+    # The 15 newest original trees are kept (as copies)
+    for kept, original in zip(grown.estimators_[:15], trees[5:]):
+        np.testing.assert_array_equal(kept.tree_.threshold, original.tree_.threshold)
+
+
+def test_grown_trees_get_new_seeds():
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(60, 4)), rng.normal(size=60)
+    rf, _ = predictor.fit_models(X, y, n_estimators=10, max_depth=4)
+    seeds = {tree.random_state for tree in rf.estimators_}
+    grown = 10
+    for _ in range(3):
+        rf = predictor.grow_forest(rf, X, y, n_new=5, seed=grown)
+        grown += 5
+        new = {tree.random_state for tree in rf.estimators_[-5:]}
+        assert not new & seeds
+        seeds |= new
+
+
+def test_forming_bar_doesnt_refit_the_live_models(tmp_path):
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(40, 4)), rng.normal(size=40)
+    params = {'window': 25, 'n_estimators': 20, 'max_depth': 4}
+    cache = ModelCache(str(tmp_path))
+    writes = []
+    put_models = cache.put_models
+    cache.put_models = lambda *args: writes.append(args) or put_models(*args)
+
+    rf, _ = predictor.live_models(X, y, params, symbol='BTCUSD', cache=cache)
+    # Only the newest close moved: same models, nothing written
+    y_tick = y.copy()
+    y_tick[-1] += 0.5
+    assert predictor.live_models(X, y_tick, params, symbol='BTCUSD', cache=cache)[0] is rf
+    assert len(writes) == 1
+    # A new closed bar shifts the training rows: warm refit
+    X_next, y_next = np.vstack([X[1:], rng.normal(size=(1, 4))]), np.append(y[1:], 0.0)
+    assert predictor.live_models(X_next, y_next, params, symbol='BTCUSD', cache=cache)[0] is not rf
+    assert len(writes) == 2 and writes[-1][2]['grown'] == 22
@@ -0,0 +1,20 @@
+import cold_start_report
+import stub_servers
+import sync_vercel_lib
+
+
+def test_vercel_copies_match_the_top_level_modules():
+    assert sync_vercel_lib.stale_copies() == [], "run python sync_vercel_lib.py"
+
+
+def test_cold_price_handler_fetches_only_the_quote(monkeypatch):
+    servers = stub_servers.start_upstreams()
+    try:
+        for name, value in stub_servers.upstream_env(servers).items():
+            monkeypatch.setenv(name, value)
+        result = cold_start_report.measure('price', warm_calls=1)
+        assert result['status'] == 200
+        # One ticker request, no klines backfill
+        assert servers['binance'].stats()['hits'] == 1
+    finally:
+        stub_servers.stop_upstreams(servers)
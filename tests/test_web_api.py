@@ -0,0 +1,74 @@
+import json
+import math
+import os
+
+import pytest
+
+import stub_servers
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    servers = stub_servers.start_upstreams()
+    root = tmp_path_factory.mktemp('web_api')
+    saved = dict(os.environ)
+    os.environ.update(stub_servers.upstream_env(servers), WARM_UP='0', BAR_STORE_DIR=str(root / 'bars'),
+                      ADVICE_CACHE_PATH=str(root / 'advice.sqlite'))
+    import web_api
+    yield web_api.app.test_client()
+    stub_servers.stop_upstreams(servers)
+    os.environ.clear()
+    os.environ.update(saved)
+
+
+def strict_json(response):
+    def reject(constant):
+        raise ValueError(f"{constant} is not valid JSON")
+    return json.loads(response.get_data(as_text=True), parse_constant=reject)
+
+
+def test_price_and_rsi(client):
+    for route, field in (('/price', 'price'), ('/rsi', 'rsi')):
+        response = client.get(f'{route}?symbol=BTCUSD')
+        assert response.status_code == 200
+        assert isinstance(strict_json(response)[field], float)
+
+
+def test_warming_up_values_are_null(client, monkeypatch):
+    import web_api
+    snapshot = dict(web_api.snapshots.get('BTCUSD'), rsi=math.nan, macd=math.nan)
+    monkeypatch.setattr(web_api.snapshots, 'get', lambda symbol: snapshot)
+    assert strict_json(client.get('/rsi?symbol=BTCUSD'))['rsi'] is None
+    assert strict_json(client.get('/price?symbol=BTCUSD'))['price'] == snapshot['price']
+
+
+def test_streams_over_the_limit_get_503(client, monkeypatch):
+    import web_api
+    monkeypatch.setattr(web_api, 'stream_slots', web_api.stream_slots)
+    web_api.limit_streams(1)
+
+    def rejected():
+        return sum(value for _, value in web_api.STREAM_REJECTED.family()['series'])
+
+    before = rejected()
+    first = client.get('/stream?symbols=BTCUSD', buffered=False)
+    assert first.status_code == 200
+    second = client.get('/stream?symbols=BTCUSD')
+    assert second.status_code == 503
+    assert second.headers['Retry-After']
+    assert rejected() == before + 1
+    # Leaving frees the slot and the subscription
+    first.close()
+    assert web_api.live_feed.stats()['subscribers'] == 0
+    third = client.get('/stream?symbols=BTCUSD', buffered=False)
+    assert third.status_code == 200
+    third.close()
+
+
+def test_indicators_filters_by_name(client):
+    body = strict_json(client.get('/indicators?symbols=BTCUSD&names=rsi,MACD'))
+    assert set(body['indicators']['BTCUSD']) == {'rsi', 'macd', 'price'}
+    response = client.get('/indicators?symbols=BTCUSD&names=rsi,bogus')
+    assert response.status_code == 400
+    body = strict_json(response)
+    assert 'bogus' in body['error'] and 'rsi' in body['available']
@@ -0,0 +1,267 @@
+"""
+Stage timing for the desktop analysis pipeline.
+
+span(name) times a block and @traced(name) a function. Spans that run
+while a trace is active on the thread (one per question or file
+analysis, see Trace) are also added to that trace. Trace.summary()
+gives the per-stage breakdown the status bar shows. Every span is kept
+as a Chrome trace event; save_trace() writes them in a file that
+chrome://tracing, Perfetto and speedscope open.
+
+Off by default, when span() costs an attribute check. With allocation
+tracking on, tracemalloc runs and each span records the net change in
+traced memory. tracemalloc is process-wide, so concurrent work on other
+threads is counted too, and it slows Python code down noticeably. With
+profiling on, each trace runs under cProfile on its worker thread, and
+save_profile() writes the merged stats for pstats or snakeviz.
+
+TRACE=1 turns tracing on at startup; the app's settings override it.
+"""
+import collections
+import cProfile
+import functools
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+ENABLED = os.getenv('TRACE', '0') == '1'
+MEMORY = False
+PROFILE = False
+MAX_EVENTS = 200_000
+
+_events = collections.deque(maxlen=MAX_EVENTS)
+_threads = {}
+_local = threading.local()
+_lock = threading.Lock()
+_profile_stats = None
+
+
+def configure(enabled=None, memory=None, profile=None):
+    """Switch tracing, allocation tracking and profiling on or off at runtime"""
+    global ENABLED, MEMORY, PROFILE
+    if enabled is not None:
+        ENABLED = bool(enabled)
+    if memory is not None:
+        MEMORY = bool(memory)
+    if profile is not None:
+        PROFILE = bool(profile)
+    tracking = ENABLED and MEMORY
+    if tracking and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not tracking and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _traced_memory():
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+
+
+def _record(name, start, duration, alloc, args=None):
+    thread = threading.current_thread()
+    event = {'name': name, 'ph': 'X', 'ts': start / 1000, 'dur': duration / 1000,
+             'pid': os.getpid(), 'tid': thread.ident}
+    if alloc is not None or args:
+        event['args'] = dict(args or {})
+        if alloc is not None:
+            event['args']['alloc_kb'] = round(alloc / 1024, 1)
+    with _lock:
+        _threads[thread.ident] = thread.name
+        _events.append(event)
+
+
+class Span:
+    def __init__(self, name, args=None):
+        self.name = name
+        self.args = args
+        self.duration = None
+        self.alloc = None
+
+    def __enter__(self):
+        self.trace = getattr(_local, 'trace', None)
+        self.depth = getattr(_local, 'depth', 0)
+        _local.depth = self.depth + 1
+        self._memory = _traced_memory()
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.duration = time.perf_counter_ns() - self._start
+        if self._memory is not None:
+            memory = _traced_memory()
+            self.alloc = memory - self._memory if memory is not None else None
+        _local.depth = self.depth
+        _record(self.name, self._start, self.duration, self.alloc, self.args)
+        if self.trace is not None and self.depth == 0:
+            self.trace.add(self)
+        return False
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **args):
+    """Context manager timing a stage (a no-op while tracing is off)"""
+    return Span(name, args) if ENABLED else _NULL_SPAN
+
+
+def traced(name=None):
+    """Decorator running the function in span(name or its name)"""
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with Span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class Trace:
+    """
+    One request through the pipeline. Activate it on each thread that works
+    on the request; spans directly inside become its stages.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = []
+        self._start = time.perf_counter_ns()
+        self._lock = threading.Lock()
+        self.duration = None
+
+    def add(self, span):
+        with self._lock:
+            self.stages.append((span.name, span.duration, span.alloc))
+
+    def finish(self):
+        if self.duration is None:
+            self.duration = time.perf_counter_ns() - self._start
+            _record(self.name, self._start, self.duration, None, {'stages': len(self.stages)})
+        return self
+
+    def breakdown(self):
+        """[(stage, total ns, total bytes or None)] in first-seen order"""
+        totals = {}
+        with self._lock:
+            stages = list(self.stages)
+        for name, duration, alloc in stages:
+            entry = totals.setdefault(name, [0, None])
+            entry[0] += duration
+            if alloc is not None:
+                entry[1] = (entry[1] or 0) + alloc
+        return [(name, duration, alloc) for name, (duration, alloc) in totals.items()]
+
+    def summary(self):
+        """e.g. 'question 2.41 s: intent 0.2 ms · fetch 120 ms · predict 1.80 s'"""
+        total = self.duration if self.duration is not None else time.perf_counter_ns() - self._start
+        parts = []
+        for name, duration, alloc in self.breakdown():
+            part = f"{name} {format_duration(duration)}"
+            if alloc is not None:
+                part += f" ({format_bytes(alloc)})"
+            parts.append(part)
+        return f"{self.name} {format_duration(total)}" + (": " + " · ".join(parts) if parts else "")
+
+
+class _Activation:
+    """Makes a trace current on this thread (and profiles it when profiling is on)"""
+
+    def __init__(self, trace):
+        self.trace = trace
+
+    def __enter__(self):
+        self.previous = getattr(_local, 'trace', None), getattr(_local, 'depth', 0)
+        if self.trace is not None:
+            _local.trace = self.trace
+            _local.depth = 0
+        self.profiler = None
+        if self.trace is not None and PROFILE:
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # Another profiler is already active on this thread
+                self.profiler = None
+        return self.trace
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            self.profiler.disable()
+            _add_profile(self.profiler)
+        _local.trace, _local.depth = self.previous
+        return False
+
+
+def start(name):
+    """A new Trace while tracing is on, else None (activate(None) is a no-op)"""
+    return Trace(name) if ENABLED else None
+
+
+def activate(trace):
+    return _Activation(trace)
+
+
+def _add_profile(profiler):
+    global _profile_stats
+    with _lock:
+        if _profile_stats is None:
+            _profile_stats = pstats.Stats(profiler)
+        else:
+            _profile_stats.add(profiler)
+
+
+def format_duration(ns):
+    if ns >= 1e9:
+        return f"{ns / 1e9:.2f} s"
+    if ns >= 1e6:
+        return f"{ns / 1e6:.0f} ms"
+    return f"{ns / 1e6:.1f} ms"
+
+
+def format_bytes(size):
+    if abs(size) >= 1048576:
+        return f"{size / 1048576:+.1f} MB"
+    return f"{size / 1024:+.0f} KB"
+
+
+def save_trace(path):
+    """Write the recorded spans as Chrome trace JSON; returns how many were written"""
+    with _lock:
+        events = list(_events)
+        threads = dict(_threads)
+    pid = os.getpid()
+    names = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+             for tid, name in threads.items()]
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': names + events, 'displayTimeUnit': 'ms'}, f)
+    return len(events)
+
+
+def save_profile(path):
+    """Write the merged cProfile stats of the profiled traces; False if there are none"""
+    with _lock:
+        if _profile_stats is None:
+            return False
+        _profile_stats.dump_stats(path)
+    return True
+
+
+def clear():
+    global _profile_stats
+    with _lock:
+        _events.clear()
+        _profile_stats = None
@@ -1,28 +1,40 @@
+import fast_start
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
-import openai
-import requests
-import pandas as pd
-import numpy as np
-from ta.momentum import RSIIndicator
-from ta.trend import MACD
-from ta.volatility import BollingerBands, AverageTrueRange
 from dotenv import load_dotenv
 import os
 from datetime import datetime, timedelta
-from PIL import Image, ImageTk
-import base64
 from tkinter import font
 import tkinterdnd2 as tkdnd
-import plotly.graph_objects as go
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import json
-import threading
+from bar_store import get_store, HISTORY_BARS
+from advice_cache import get_advice_cache
+import llm_advice
+import file_analysis
+from gui_tasks import TaskCancelled, TaskRunner
+import indicators
+import predictor
+import tracing
+
+# pandas, matplotlib, PIL, requests, openai and sklearn are imported where
+# they're first used; these are loaded in the background once the window
+# is up (or right here with FAST_START=0)
+WARM_UP_MODULES = [
+    'matplotlib.figure', 'matplotlib.backends.backend_tkagg', 'chart_view',
+    'pandas', 'market_data', 'PIL.Image', 'PIL.ImageTk', 'openai',
+    'sklearn.ensemble', 'sklearn.linear_model', 'table_digest', 'image_analysis',
+]
+fast_start.preload(WARM_UP_MODULES)
+fast_start.mark('imports')
 
 # Load environment variables
 load_dotenv()
 
+# Characters of a .txt upload shown in the preview
+PREVIEW_CHARS = 64 * 1024
+# Stored bars handed to the chart; it downsamples to the axes width itself
+CHART_BARS = 200_000
+
 class TradingAssistant:
     def __init__(self, root):
         if not isinstance(root, tkdnd.Tk):
@@ -34,6 +46,9 @@ class TradingAssistant:
         # Initialize _after_id
         self._after_id = None
 
+        # Network, indicator and model work runs here, off the Tk thread
+        self.tasks = TaskRunner(self.root)
+
         # Supported symbols
         self.symbols = ['EUR/USD', 'BTC/USD']
         self.selected_symbol = tk.StringVar(value=self.symbols[0])
@@ -56,9 +71,12 @@ class TradingAssistant:
         self.exchangerate_key = os.getenv("EXCHANGERATE_API_KEY")
         
         # Store historical prices and uploaded file
-        self.price_history = pd.DataFrame()
+        self.price_history = None
+        self.indicator_state = indicators.StoreIndicators(get_store())
+        self.advice_cache = get_advice_cache()
         self.uploaded_file_path = None
         self.uploaded_image = None
+        self.active_openai_key = self.openai_key
         
         # Load window geometry
         self.load_window_geometry()
@@ -75,7 +93,12 @@ class TradingAssistant:
             'theme': 'light',
             'chart_style': 'line',
             'update_interval': 60,  # seconds
-            'font_size': 12
+            'font_size': 12,
+            'search_cpus': 0,  # 0 = all cores
+            'search_deadline': 20,  # seconds
+            'tracing': tracing.ENABLED,
+            'trace_memory': False,
+            'trace_profile': False
         }
         try:
             if os.path.exists('preferences.json'):
@@ -84,6 +107,13 @@ class TradingAssistant:
                     self.preferences.update(saved_prefs)
         except Exception:
             pass
+        self.configure_tracing()
+
+    def configure_tracing(self):
+        """Apply the tracing preferences (TRACE=1 forces tracing on)"""
+        tracing.configure(enabled=self.preferences['tracing'] or os.getenv('TRACE') == '1',
+                          memory=self.preferences['trace_memory'],
+                          profile=self.preferences['trace_profile'])
             
     def save_preferences(self):
         """Save user preferences to file"""
@@ -270,12 +300,9 @@ class TradingAssistant:
         self.chart_frame.grid_columnconfigure(0, weight=1)
         self.chart_frame.grid_rowconfigure(0, weight=1)
         
-        # Create figure for the chart
-        self.fig = Figure(figsize=(6, 4), dpi=100)
-        self.ax = self.fig.add_subplot(111)
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.chart_frame)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().grid(row=0, column=0, sticky='nsew')
+        # The figure is created once the window has been painted (matplotlib is slow to import)
+        self.chart = None
+        self.root.after_idle(self.setup_chart_canvas, self.chart_frame)
         
         current_row += 1
         
@@ -371,11 +398,8 @@ class TradingAssistant:
         # Setup keyboard shortcuts
         self.setup_bindings()
         
-        # Start market data updates
-        self.update_market_data()
-        
-        # Initialize empty chart
-        self.update_chart()
+        # Start market data updates and background imports once the window is up
+        self.root.after_idle(self.on_first_paint)
         
         # Setup toolbar
         self.setup_toolbar()
@@ -407,269 +431,64 @@ class TradingAssistant:
         widget.bind('<Leave>', leave)
 
     def get_eurusd_price(self):
-        """Fetch EUR/USD price data from Frankfurter API and simulate short-term data"""
-        try:
-            url = "https://api.frankfurter.app/latest?from=EUR&to=USD"
-            try:
-                r = requests.get(url, timeout=10)  # Add timeout
-                data = r.json()
-            except requests.exceptions.ConnectionError as e:
-                raise Exception("Failed to connect to Frankfurter API. Please check your internet connection.") from e
-            except requests.exceptions.Timeout:
-                raise Exception("Connection to Frankfurter API timed out. Please try again.") from e
-            except requests.exceptions.RequestException as e:
-                raise Exception(f"Error connecting to Frankfurter API: {str(e)}") from e
-            
-            if 'rates' not in data:
-                error_msg = data.get('error', 'Unknown error')
-                raise Exception(f"API Error: {error_msg}")
-            
-            current_rate = data['rates']['USD']
-            
-            # Create simulated price data for technical analysis
-            # Generate 100 data points with small random variations around the current price
-            timestamps = [datetime.now() - timedelta(minutes=5*i) for i in range(100)]
-            noise = np.random.normal(0, 0.0002, 100)  # Small random variations
-            prices = [current_rate * (1 + n) for n in noise]
-            
-            df = pd.DataFrame({
-                'close': prices,
-                'timestamp': timestamps
-            }).set_index('timestamp').sort_index()
-            
-            return df
-            
-        except Exception as e:
-            error_msg = str(e)
-            # Show error in GUI
-            messagebox.showerror("API Error", error_msg)
-            self.status_bar.config(text=f"Error: {error_msg}")
-            return pd.DataFrame()
+        """Fetch the EUR/USD rate from Frankfurter API and return stored bar history"""
+        return self.fetch_bars('EURUSD')
 
     def get_btcusd_price(self):
-        """Fetch BTC/USD price data from Binance public API and simulate short-term data"""
-        try:
-            url = "https://api.binance.com/api/v3/ticker/price?symbol=BTCUSDT"
-            try:
-                r = requests.get(url, timeout=10)
-                data = r.json()
-            except requests.exceptions.ConnectionError as e:
-                raise Exception("Failed to connect to Binance API. Please check your internet connection.") from e
-            except requests.exceptions.Timeout:
-                raise Exception("Connection to Binance API timed out. Please try again.") from e
-            except requests.exceptions.RequestException as e:
-                raise Exception(f"Error connecting to Binance API: {str(e)}") from e
-
-            if 'price' not in data:
-                # Log the response for debugging
-                print("Binance API response:", data)
-                messagebox.showerror("API Error", f"Could not fetch BTC/USD price. API response: {data}")
-                raise Exception(f"API Error: Could not fetch BTC/USD price. API response: {data}")
-
-            current_rate = float(data['price'])
-
-            # Create simulated price data for technical analysis
-            timestamps = [datetime.now() - timedelta(minutes=5*i) for i in range(100)]
-            noise = np.random.normal(0, 0.002, 100)  # Slightly larger variation for BTC
-            prices = [current_rate * (1 + n) for n in noise]
-
-            df = pd.DataFrame({
-                'close': prices,
-                'timestamp': timestamps
-            }).set_index('timestamp').sort_index()
-
-            return df
+        """Fetch the BTC/USD price from Binance public API and return stored bar history"""
+        return self.fetch_bars('BTCUSD')
 
+    def fetch_bars(self, symbol):
+        """Record the latest quote via the shared market-data client and return stored bars"""
+        from market_data import get_client
+        try:
+            with tracing.span('quote', symbol=symbol):
+                get_client().quote(symbol)
+            return self.bars_frame(symbol)
         except Exception as e:
-            error_msg = str(e)
-            messagebox.showerror("API Error", error_msg)
-            self.status_bar.config(text=f"Error: {error_msg}")
+            # Runs on worker threads; the error dialog goes through the Tk thread
+            self.tasks.call_soon(self.show_api_error, str(e))
+            import pandas as pd
             return pd.DataFrame()
 
-    def compute_indicators(self, df):
-        """Calculate technical indicators"""
+    def show_api_error(self, error_msg):
+        messagebox.showerror("API Error", error_msg)
+        self.status_bar.config(text=f"Error: {error_msg}")
+
+    @tracing.traced('bars')
+    def bars_frame(self, symbol, bars=HISTORY_BARS):
+        """Wrap the last `bars` stored bars in a DataFrame indexed by bar time"""
+        return get_store().frame(symbol, bars)
+
+    @tracing.traced('indicators')
+    def compute_indicators(self, df, symbol=None):
+        """Calculate technical indicators (incrementally from the bar store when symbol is given)"""
         if df.empty:
             return 0, 0
-        rsi = RSIIndicator(df['close']).rsi().iloc[-1]
-        macd = MACD(df['close']).macd_diff().iloc[-1]
-        return rsi, macd
+        if symbol is not None:
+            values = self.indicator_state.latest(symbol)
+        else:
+            values = {name: series[-1] for name, series in indicators.run(df['close'].values).items()}
+        return values['rsi'], values['macd']
 
-    def predict_next_price(self, df, window=20):
+    @tracing.traced('predict')
+    def predict_next_price(self, df, window=20, symbol=None):
         """
         Adaptive prediction: runs a quick backtest to optimize window/model params for recent data.
         Returns (predicted_price, signal_quality) where signal_quality is 'strong', 'weak', or 'none'.
+        With a symbol, cached search results and fitted models are reused.
         """
-        import warnings
-        warnings.filterwarnings("ignore")
-        if df.empty or len(df) < 40:
-            return None, 'none'
-
-        closes = df['close']
-        best_score = float('inf')
-        best_params = {'window': window, 'n_estimators': 300, 'max_depth': 12}
-        # Try several window sizes and model params
-        for test_window in [15, 20, 25]:
-            for n_estimators in [200, 300]:
-                for max_depth in [8, 12]:
-                    if len(closes) < test_window + 20:
-                        continue
-                    # Prepare features for backtest
-                    closes_bt = closes.tail(test_window + 20)
-                    rsi_series = RSIIndicator(closes_bt).rsi()
-                    macd_series = MACD(closes_bt).macd_diff()
-                    sma_series = closes_bt.rolling(window=5).mean()
-                    ema_9 = closes_bt.ewm(span=9, adjust=False).mean()
-                    ema_21 = closes_bt.ewm(span=21, adjust=False).mean()
-                    try:
-                        from ta.trend import ADXIndicator
-                        adx_series = ADXIndicator(high=closes_bt, low=closes_bt, close=closes_bt, window=14).adx()
-                    except Exception:
-                        adx_series = pd.Series([0]*len(closes_bt), index=closes_bt.index)
-                    try:
-                        from ta.momentum import StochasticOscillator
-                        stoch_k = StochasticOscillator(high=closes_bt, low=closes_bt, close=closes_bt, window=14).stoch()
-                    except Exception:
-                        stoch_k = pd.Series([0]*len(closes_bt), index=closes_bt.index)
-                    try:
-                        from ta.trend import CCIIndicator
-                        cci_series = CCIIndicator(high=closes_bt, low=closes_bt, close=closes_bt, window=14).cci()
-                    except Exception:
-                        cci_series = pd.Series([0]*len(closes_bt), index=closes_bt.index)
-                    bb = BollingerBands(closes_bt, window=5)
-                    bb_middle = bb.bollinger_mavg()
-                    bb_upper = bb.bollinger_hband()
-                    bb_lower = bb.bollinger_lband()
-                    atr = AverageTrueRange(high=closes_bt, low=closes_bt, close=closes_bt, window=5).average_true_range()
-                    returns_1 = closes_bt.pct_change(1)
-                    returns_2 = closes_bt.pct_change(2)
-                    returns_3 = closes_bt.pct_change(3)
-                    features_df = pd.DataFrame({
-                        'close': closes_bt.values,
-                        'rsi': rsi_series.values,
-                        'macd': macd_series.values,
-                        'sma': sma_series.values,
-                        'ema9': ema_9.values,
-                        'ema21': ema_21.values,
-                        'adx': adx_series.values,
-                        'stoch_k': stoch_k.values,
-                        'cci': cci_series.values,
-                        'bb_middle': bb_middle.values,
-                        'bb_upper': bb_upper.values,
-                        'bb_lower': bb_lower.values,
-                        'atr': atr.values,
-                        'ret1': returns_1.values,
-                        'ret2': returns_2.values,
-                        'ret3': returns_3.values,
-                        'time': np.arange(len(closes_bt))
-                    }).dropna()
-                    if len(features_df) < test_window:
-                        continue
-                    feature_cols = [
-                        'time', 'rsi', 'macd', 'sma', 'ema9', 'ema21', 'adx', 'stoch_k', 'cci',
-                        'bb_middle', 'bb_upper', 'bb_lower', 'atr', 'ret1', 'ret2', 'ret3'
-                    ]
-                    X = features_df[feature_cols].iloc[:-1].values
-                    y = features_df['close'].iloc[1:].values
-                    from sklearn.ensemble import RandomForestRegressor
-                    rf = RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth, random_state=42)
-                    rf.fit(X, y)
-                    from sklearn.linear_model import LinearRegression
-                    lr = LinearRegression()
-                    lr.fit(X, y)
-                    rf_pred = rf.predict(X)
-                    lr_pred = lr.predict(X)
-                    avg_pred = (rf_pred + lr_pred) / 2
-                    score = np.mean(np.abs(avg_pred - y))  # MAE
-                    if score < best_score:
-                        best_score = score
-                        best_params = {'window': test_window, 'n_estimators': n_estimators, 'max_depth': max_depth}
-
-        # Use best params for live prediction
-        window = best_params['window']
-        n_estimators = best_params['n_estimators']
-        max_depth = best_params['max_depth']
-        closes = df['close'].tail(window + 15)
-        rsi_series = RSIIndicator(closes).rsi()
-        macd_series = MACD(closes).macd_diff()
-        sma_series = closes.rolling(window=5).mean()
-        ema_9 = closes.ewm(span=9, adjust=False).mean()
-        ema_21 = closes.ewm(span=21, adjust=False).mean()
-        try:
-            from ta.trend import ADXIndicator
-            adx_series = ADXIndicator(high=closes, low=closes, close=closes, window=14).adx()
-        except Exception:
-            adx_series = pd.Series([0]*len(closes), index=closes.index)
-        try:
-            from ta.momentum import StochasticOscillator
-            stoch_k = StochasticOscillator(high=closes, low=closes, close=closes, window=14).stoch()
-        except Exception:
-            stoch_k = pd.Series([0]*len(closes), index=closes.index)
-        try:
-            from ta.trend import CCIIndicator
-            cci_series = CCIIndicator(high=closes, low=closes, close=closes, window=14).cci()
-        except Exception:
-            cci_series = pd.Series([0]*len(closes), index=closes.index)
-        bb = BollingerBands(closes, window=5)
-        bb_middle = bb.bollinger_mavg()
-        bb_upper = bb.bollinger_hband()
-        bb_lower = bb.bollinger_lband()
-        atr = AverageTrueRange(high=closes, low=closes, close=closes, window=5).average_true_range()
-        returns_1 = closes.pct_change(1)
-        returns_2 = closes.pct_change(2)
-        returns_3 = closes.pct_change(3)
-        features_df = pd.DataFrame({
-            'close': closes.values,
-            'rsi': rsi_series.values,
-            'macd': macd_series.values,
-            'sma': sma_series.values,
-            'ema9': ema_9.values,
-            'ema21': ema_21.values,
-            'adx': adx_series.values,
-            'stoch_k': stoch_k.values,
-            'cci': cci_series.values,
-            'bb_middle': bb_middle.values,
-            'bb_upper': bb_upper.values,
-            'bb_lower': bb_lower.values,
-            'atr': atr.values,
-            'ret1': returns_1.values,
-            'ret2': returns_2.values,
-            'ret3': returns_3.values,
-            'time': np.arange(len(closes))
-        }).dropna()
-        if len(features_df) < window:
+        if df.empty:
             return None, 'none'
-        feature_cols = [
-            'time', 'rsi', 'macd', 'sma', 'ema9', 'ema21', 'adx', 'stoch_k', 'cci',
-            'bb_middle', 'bb_upper', 'bb_lower', 'atr', 'ret1', 'ret2', 'ret3'
-        ]
-        X = features_df[feature_cols].iloc[:-1].values
-        y = features_df['close'].iloc[1:].values
-        from sklearn.ensemble import RandomForestRegressor
-        rf = RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth, random_state=42)
-        rf.fit(X, y)
-        from sklearn.linear_model import LinearRegression
-        lr = LinearRegression()
-        lr.fit(X, y)
-        last_row = features_df[feature_cols].iloc[-1].values.reshape(1, -1)
-        rf_pred = rf.predict(last_row)[0]
-        lr_pred = lr.predict(last_row)[0]
-        avg_pred = (rf_pred + lr_pred) / 2
-
-        adx_val = features_df['adx'].iloc[-1]
-        atr_val = features_df['atr'].iloc[-1]
-        macd_val = features_df['macd'].iloc[-1]
-        last_close = features_df['close'].iloc[-1]
-        pred_move = abs(avg_pred - last_close)
-        pip_size = 0.0001 if last_close < 100 else 1.0
-        min_move_pips = 5 if last_close < 100 else 10
-
-        if adx_val > 22 and atr_val > 0.0007 * closes.mean() and abs(macd_val) > 0.0005 and pred_move / pip_size > min_move_pips:
-            return float(avg_pred), 'strong'
-        elif adx_val > 18 and atr_val > 0.0003 * closes.mean() and pred_move / pip_size > 2:
-            return float(avg_pred), 'weak'
-        else:
-            return float(avg_pred), 'none'
+        return predictor.predict_next_price(
+            df['close'].values, window,
+            cpus=self.preferences.get('search_cpus'),
+            deadline=self.preferences.get('search_deadline'),
+            symbol=symbol,
+            timestamp=int(df.index[-1].timestamp()) if symbol is not None else None
+        )
 
+    @tracing.traced('prompt')
     def build_prompt(self, user_input, price, rsi, macd, predicted_price=None, symbol="EUR/USD"):
         """Build the prompt for OpenAI"""
         trend = "Uptrend" if macd > 0 else "Downtrend"
@@ -691,85 +510,77 @@ class TradingAssistant:
         )
         return prompt
 
-    def get_openai_response(self, prompt):
-        """Get trading advice from OpenAI"""
+    @tracing.traced('openai')
+    def get_openai_response(self, prompt, cache_key=None, on_text=None):
+        """
+        Get trading advice from OpenAI, answering from the advice cache when
+        cache_key is given. With on_text, the completion is streamed and
+        on_text is called with each piece as it arrives.
+        """
+        if cache_key is not None:
+            with tracing.span('advice cache'):
+                advice = self.advice_cache.get(cache_key)
+            if advice is not None:
+                if on_text is not None:
+                    on_text(advice)
+                return advice
+        api_key = self.active_openai_key
         try:
-            openai.api_key = self.openai_key or self.openai_entry.get()
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a trading expert."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return response.choices[0].message['content']
+            if on_text is None:
+                advice = llm_advice.complete(prompt, api_key)
+            else:
+                parts = []
+                for text in llm_advice.stream_completion(prompt, api_key):
+                    parts.append(text)
+                    on_text(text)
+                advice = ''.join(parts)
+            if cache_key is not None:
+                self.advice_cache.put(cache_key, advice)
+            return advice
+        except TaskCancelled:
+            raise
         except Exception as e:
-            return f"Error getting AI response: {str(e)}"
+            error = f"Error getting AI response: {str(e)}"
+            if on_text is not None:
+                on_text(error)
+            return error
+
+    def setup_chart_canvas(self, master):
+        """Create the matplotlib figure and chart renderer inside master"""
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from chart_view import ChartRenderer
 
-    def setup_chart(self):
-        """Setup the price chart"""
-        chart_frame = ttk.LabelFrame(self.left_panel, text="Price Chart", padding="10")
-        chart_frame.grid(row=3, column=0, sticky='nsew', padx=10, pady=5)
-        
-        # Create figure for the chart
         self.fig = Figure(figsize=(6, 4), dpi=100)
         self.ax = self.fig.add_subplot(111)
-        self.canvas = FigureCanvasTkAgg(self.fig, master=chart_frame)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
         self.canvas.draw()
         self.canvas.get_tk_widget().grid(row=0, column=0, sticky='nsew')
+        self.chart = ChartRenderer(self.ax, self.canvas, self.colors, self.preferences['chart_style'])
+        fast_start.mark('chart ready')
         
         # Initialize empty chart
         self.update_chart()
+
+    def on_first_paint(self):
+        fast_start.mark('window painted')
+        self.update_market_data()
+        if fast_start.ENABLED:
+            fast_start.warm_up(WARM_UP_MODULES)
         
     def update_chart(self):
         """Update the price chart with new data"""
-        if self.price_history.empty:
+        if self.chart is None or self.price_history is None or self.price_history.empty:
             return
             
-        self.ax.clear()
-        
-        if self.preferences['chart_style'] == 'candlestick':
-            # Convert data for candlestick
-            df = self.price_history.copy()
-            df['open'] = df['close'].shift(1)
-            df['high'] = df[['open', 'close']].max(axis=1)
-            df['low'] = df[['open', 'close']].min(axis=1)
-            
-            # Plot candlesticks
-            up = df[df.close >= df.open]
-            down = df[df.close < df.open]
-            
-            # Up candlesticks
-            self.ax.bar(up.index, up.close - up.open, bottom=up.open, 
-                       width=0.8, color=self.colors['success'])
-            self.ax.bar(up.index, up.high - up.close, bottom=up.close,
-                       width=0.1, color=self.colors['success'])
-            self.ax.bar(up.index, up.low - up.open, bottom=up.open,
-                       width=0.1, color=self.colors['success'])
-            
-            # Down candlesticks
-            self.ax.bar(down.index, down.close - down.open, bottom=down.open,
-                       width=0.8, color=self.colors['danger'])
-            self.ax.bar(down.index, down.high - down.open, bottom=down.open,
-                       width=0.1, color=self.colors['danger'])
-            self.ax.bar(down.index, down.low - down.close, bottom=down.close,
-                       width=0.1, color=self.colors['danger'])
-        else:
-            # Line chart
-            self.ax.plot(self.price_history.index, self.price_history['close'],
-                        color=self.colors['accent'], linewidth=2)
-        
         # Add timeframe selector if not exists
         if not hasattr(self, 'timeframe_var'):
             self.setup_chart_controls()
         
         symbol = self.selected_symbol.get() if hasattr(self, 'selected_symbol') else "EUR/USD"
-        self.ax.set_title(f'{symbol} Price History')
-        self.ax.set_xlabel('Time')
-        self.ax.set_ylabel('Price')
-        self.ax.grid(True, alpha=0.3)
-        self.fig.autofmt_xdate()
-        self.canvas.draw()
+        self.chart.set_colors(self.colors)
+        self.chart.set_style(self.preferences['chart_style'])
+        self.chart.update(self.price_history, f'{symbol} Price History')
         
     def setup_chart_controls(self):
         """Setup chart control panel with zoom controls"""
@@ -827,68 +638,72 @@ class TradingAssistant:
         self.save_preferences()
         self.update_chart()
         
-    import threading
-
     def update_market_data(self):
-        """Update market data periodically using a background thread"""
-        def fetch_and_update():
-            try:
-                symbol = self.selected_symbol.get()
-                if symbol == 'EUR/USD':
-                    df = self.get_eurusd_price()
-                    symbol_label = "EUR/USD"
-                elif symbol == 'BTC/USD':
-                    df = self.get_btcusd_price()
-                    symbol_label = "BTC/USD"
-                else:
-                    df = pd.DataFrame()
-                    symbol_label = symbol
-
-                def update_ui():
-                    if not df.empty:
-                        self.price_history = df
-                        last_price = df['close'].iloc[-1]
-                        rsi, macd = self.compute_indicators(df)
-                        predicted_price_tuple = self.predict_next_price(df)
-                        if isinstance(predicted_price_tuple, tuple):
-                            predicted_price, _ = predicted_price_tuple
-                        else:
-                            predicted_price = predicted_price_tuple
-
-                        # Update labels with colors based on values
-                        self.price_label.config(
-                            text=f"{symbol_label}: {last_price:.5f}",
-                            foreground=self.colors['text']
-                        )
-                        self.rsi_label.config(
-                            text=f"RSI: {rsi:.2f}",
-                            foreground=self.colors['danger'] if rsi > 70 or rsi < 30 else self.colors['text']
-                        )
-                        self.macd_label.config(
-                            text=f"MACD: {macd:.2f}",
-                            foreground=self.colors['success'] if macd > 0 else self.colors['danger']
-                        )
-                        # Show predicted price in status bar
-                        if predicted_price is not None:
-                            self.status_bar.config(
-                                text=f"Last updated: {datetime.now().strftime('%H:%M:%S')} | Predicted Next Price: {predicted_price:.5f}"
-                            )
-                        else:
-                            self.status_bar.config(
-                                text=f"Last updated: {datetime.now().strftime('%H:%M:%S')}"
-                            )
-                        # Update chart
-                        self.update_chart()
-                self.root.after(0, update_ui)
-            except Exception as e:
-                self.root.after(0, lambda: self.status_bar.config(text=f"Error updating market data: {str(e)}"))
-            # Schedule next update in 60 seconds
-            self._after_id = self.root.after(60000, self.update_market_data)
-
-        threading.Thread(target=fetch_and_update, daemon=True).start()
+        """Refresh market data in the background; a newer refresh supersedes one still running"""
+        # Schedule the next update after the configured interval
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+        interval_ms = max(1, int(self.preferences['update_interval'])) * 1000
+        self._after_id = self.root.after(interval_ms, self.update_market_data)
+        self.tasks.submit(
+            'market', self.load_market_data, self.selected_symbol.get(),
+            on_done=self.show_market_data,
+            on_error=lambda e: self.status_bar.config(text=f"Error updating market data: {str(e)}")
+        )
+
+    def load_market_data(self, task, symbol):
+        """Worker side of a refresh: bars, indicators and the model prediction"""
+        if symbol not in ('EUR/USD', 'BTC/USD'):
+            return None
+        df = self.fetch_bars(symbol.replace('/', ''))
+        if df.empty:
+            return None
+        chart = self.bars_frame(symbol.replace('/', ''), CHART_BARS)
+        task.check()
+        rsi, macd = self.compute_indicators(df, symbol)
+        predicted_price_tuple = self.predict_next_price(df, symbol=symbol)
+        if isinstance(predicted_price_tuple, tuple):
+            predicted_price, _ = predicted_price_tuple
+        else:
+            predicted_price = predicted_price_tuple
+        return symbol, df, chart, rsi, macd, predicted_price
+
+    def show_market_data(self, result):
+        if result is None:
+            return
+        symbol_label, df, chart, rsi, macd, predicted_price = result
+        self.price_history = chart
+        if fast_start.mark('first market data'):
+            self.root.after_idle(fast_start.report)
+        last_price = df['close'].iloc[-1]
+
+        # Update labels with colors based on values
+        self.price_label.config(
+            text=f"{symbol_label}: {last_price:.5f}",
+            foreground=self.colors['text']
+        )
+        self.rsi_label.config(
+            text=f"RSI: {rsi:.2f}",
+            foreground=self.colors['danger'] if rsi > 70 or rsi < 30 else self.colors['text']
+        )
+        self.macd_label.config(
+            text=f"MACD: {macd:.2f}",
+            foreground=self.colors['success'] if macd > 0 else self.colors['danger']
+        )
+        # Show predicted price in status bar
+        if predicted_price is not None:
+            self.status_bar.config(
+                text=f"Last updated: {datetime.now().strftime('%H:%M:%S')} | Predicted Next Price: {predicted_price:.5f}"
+            )
+        else:
+            self.status_bar.config(
+                text=f"Last updated: {datetime.now().strftime('%H:%M:%S')}"
+            )
+        # Update chart
+        self.update_chart()
 
     def on_submit(self, event=None):
-        """Handle question submission"""
+        """Handle question submission; the work runs in the background and supersedes any earlier question"""
         question = self.question_entry.get()
         if not question:
             return
@@ -912,174 +727,180 @@ class TradingAssistant:
             r"\brsi\b.*\b(btc|eur|usd|eurusd|btc\/usd|eur\/usd|bitcoin)\b",
             r"\b(btc|eur|usd|eurusd|btc\/usd|eur\/usd|bitcoin)\b.*\brsi\b"
         ]
-        matched_btc = any(re.search(p, q) for p in btc_patterns)
-        matched_eurusd = any(re.search(p, q) for p in eurusd_patterns)
-        matched_rsi = any(re.search(p, q) for p in rsi_patterns)
+        trace = tracing.start('question')
+        with tracing.activate(trace), tracing.span('intent'):
+            matched_btc = any(re.search(p, q) for p in btc_patterns)
+            matched_eurusd = any(re.search(p, q) for p in eurusd_patterns)
+            matched_rsi = any(re.search(p, q) for p in rsi_patterns)
 
         if matched_btc:
-            self.show_loading("Fetching BTC/USD price...")
-            try:
-                df = self.get_btcusd_price()
-                if not df.empty:
-                    last_price = df['close'].iloc[-1]
-                    self.response_text.delete(1.0, tk.END)
-                    self.response_text.insert(tk.END, f"Current BTC/USD price: {last_price:.2f} USD")
-                else:
-                    self.response_text.delete(1.0, tk.END)
-                    self.response_text.insert(tk.END, "Could not fetch BTC/USD price at this time.")
-            finally:
-                self.hide_loading()
-                self.status_bar.config(text="Ready")
-            return
+            self.run_in_background('question', "Fetching BTC/USD price...", self.price_answer, 'BTC/USD', "{:.2f}",
+                                   trace=trace)
+        elif matched_eurusd:
+            self.run_in_background('question', "Fetching EUR/USD price...", self.price_answer, 'EUR/USD', "{:.5f}",
+                                   trace=trace)
+        elif matched_rsi:
+            # Determine which symbol the user is asking about
+            symbol = "BTC/USD" if "btc" in q or "bitcoin" in q else "EUR/USD"
+            self.run_in_background('question', "Fetching RSI value...", self.rsi_answer, symbol, trace=trace)
+        else:
+            self.status_bar.config(text="Getting trading advice...")
+            self.run_in_background('question', "Getting trading advice...", self.advice_answer,
+                                   self.selected_symbol.get(), question, trace=trace)
 
-        if matched_eurusd:
-            self.show_loading("Fetching EUR/USD price...")
-            try:
-                df = self.get_eurusd_price()
-                if not df.empty:
-                    last_price = df['close'].iloc[-1]
-                    self.response_text.delete(1.0, tk.END)
-                    self.response_text.insert(tk.END, f"Current EUR/USD price: {last_price:.5f} USD")
-                else:
-                    self.response_text.delete(1.0, tk.END)
-                    self.response_text.insert(tk.END, "Could not fetch EUR/USD price at this time.")
-            finally:
-                self.hide_loading()
-                self.status_bar.config(text="Ready")
-            return
+    def run_in_background(self, channel, message, work, *args, error_format="{}", trace=None):
+        """
+        Run work(task, *args) on a task channel behind a cancellable loading
+        dialog. work returns the text for response_text, or None to leave it.
+        While tracing, the stage breakdown ends up in the status bar.
+        """
+        # Widgets can only be read here on the Tk thread
+        self.active_openai_key = self.openai_key or self.openai_entry.get()
+        self.hide_loading()
+        self.show_loading(message, on_cancel=lambda: self.cancel_task(channel))
+        trace = trace or tracing.start(channel)
 
-        if matched_rsi:
-            self.show_loading("Fetching RSI value...")
-            try:
-                # Determine which symbol the user is asking about
-                if "btc" in q or "bitcoin" in q:
-                    df = self.get_btcusd_price()
-                    symbol = "BTC/USD"
-                else:
-                    df = self.get_eurusd_price()
-                    symbol = "EUR/USD"
-                if not df.empty:
-                    rsi = RSIIndicator(df['close']).rsi().iloc[-1]
-                    self.response_text.delete(1.0, tk.END)
-                    self.response_text.insert(tk.END, f"Current RSI for {symbol}: {rsi:.2f}")
-                else:
-                    self.response_text.delete(1.0, tk.END)
-                    self.response_text.insert(tk.END, f"Could not fetch data to compute RSI for {symbol}.")
-            finally:
-                self.hide_loading()
-                self.status_bar.config(text="Ready")
-            return
+        def traced_work(task, *args):
+            with tracing.activate(trace):
+                return work(task, *args)
 
-        self.show_loading("Getting trading advice...")
-        self.status_bar.config(text="Getting trading advice...")
-        self.root.update()
-        
-        try:
-            symbol = self.selected_symbol.get()
-            if symbol == 'EUR/USD':
-                df = self.get_eurusd_price()
-            elif symbol == 'BTC/USD':
-                df = self.get_btcusd_price()
-            else:
-                df = pd.DataFrame()
-
-            if not df.empty:
-                last_price = df['close'].iloc[-1]
-                rsi, macd = self.compute_indicators(df)
-                predicted_price_tuple = self.predict_next_price(df)
-                if isinstance(predicted_price_tuple, tuple):
-                    predicted_price, signal_quality = predicted_price_tuple
-                else:
-                    predicted_price, signal_quality = predicted_price_tuple, 'weak'
-
-                # If signal is 'none', warn user and suggest no trade
-                if signal_quality == 'none':
-                    self.response_text.delete(1.0, tk.END)
-                    # Compute support/resistance levels for actionable alerts
-                    support = None
-                    resistance = None
-                    if not df.empty and len(df) > 20:
-                        closes = df['close'].tail(50)
-                        support = closes.min()
-                        resistance = closes.max()
-                    symbol_display = symbol if symbol else "the asset"
-                    alert_line = ""
-                    if support and resistance:
-                        alert_line = (
-                            f"• Set alerts for {symbol_display} crossing above resistance (${resistance:.2f}) "
-                            f"or below support (${support:.2f}).\n"
-                        )
-                    else:
-                        alert_line = "• Set alerts for key support/resistance levels based on recent price action.\n"
-                    self.response_text.insert(
-                        tk.END,
-                        "⚠️ No strong trading signal detected. Market is likely choppy or trend is weak.\n"
-                        "Actionable advice:\n"
-                        "• Review higher timeframes for clarity.\n"
-                        "• Avoid overtrading in choppy conditions.\n"
-                        f"{alert_line}"
-                        "• Consider reducing position size or staying in cash until a clear trend emerges.\n"
-                    )
-                    return
-
-                prompt = self.build_prompt(question, last_price, rsi, macd, predicted_price, symbol=symbol)
-                advice = self.get_openai_response(prompt)
-
-                # Try to extract entry, SL, TP from the advice and append pip values if not present
-                pip_size = 0.0001 if symbol == 'EUR/USD' else 1.0
-                entry = None
-                sl = None
-                tp = None
-                entry_match = re.search(r'Entry[:\s]*([\d\.]+)', advice)
-                sl_match = re.search(r'Stop[- ]?Loss[:\s]*([\d\.]+)', advice, re.IGNORECASE)
-                tp_match = re.search(r'Take[- ]?Profit[:\s]*([\d\.]+)', advice, re.IGNORECASE)
-                if entry_match:
-                    entry = float(entry_match.group(1))
-                if sl_match:
-                    sl = float(sl_match.group(1))
-                if tp_match:
-                    tp = float(tp_match.group(1))
-                pip_info = ""
-                if entry is not None and sl is not None:
-                    sl_pips = abs(entry - sl) / pip_size
-                    pip_info += f"\nStop-Loss Distance: {sl_pips:.1f} pips"
-                if entry is not None and tp is not None:
-                    tp_pips = abs(tp - entry) / pip_size
-                    pip_info += f"\nTake-Profit Distance: {tp_pips:.1f} pips"
+        def ready():
+            if trace is None:
+                return "Ready"
+            return f"Ready · {trace.finish().summary()}"
 
+        def finish(text):
+            if text is not None:
                 self.response_text.delete(1.0, tk.END)
-                if predicted_price is not None:
-                    self.response_text.insert(tk.END, f"Model Predicted Next Price: {predicted_price:.5f} ({signal_quality.upper()} SIGNAL)\n\n")
-                self.response_text.insert(tk.END, advice)
-                if pip_info:
-                    self.response_text.insert(tk.END, f"\n{pip_info}\n")
-
-                # --- Explainable AI: Visual Indicator Breakdown ---
-                breakdown = "\n\n--- Indicator Breakdown ---\n"
-                breakdown += f"RSI: {rsi:.2f} "
-                if rsi > 70:
-                    breakdown += "(Overbought)\n"
-                elif rsi < 30:
-                    breakdown += "(Oversold)\n"
-                else:
-                    breakdown += "(Neutral)\n"
-                breakdown += f"MACD: {macd:.2f} "
-                if macd > 0:
-                    breakdown += "(Bullish)\n"
-                elif macd < 0:
-                    breakdown += "(Bearish)\n"
-                else:
-                    breakdown += "(Neutral)\n"
-                # Support/Resistance from last 50 closes
-                closes = df['close'].tail(50)
-                support = closes.min()
-                resistance = closes.max()
-                breakdown += f"Support: {support:.2f}\n"
-                breakdown += f"Resistance: {resistance:.2f}\n"
-                self.response_text.insert(tk.END, breakdown)
-        finally:
+                self.response_text.insert(tk.END, text)
             self.hide_loading()
-            self.status_bar.config(text="Ready")
+            self.status_bar.config(text=ready())
+
+        def failed(error):
+            self.hide_loading()
+            messagebox.showerror("Error", error_format.format(error))
+            self.status_bar.config(text=ready())
+
+        self.tasks.submit(channel, traced_work, *args, on_done=finish, on_error=failed)
+
+    def cancel_task(self, channel):
+        self.tasks.cancel(channel)
+        self.hide_loading()
+        self.status_bar.config(text="Cancelled")
+
+    def price_answer(self, task, symbol, price_format):
+        df = self.fetch_bars(symbol.replace('/', ''))
+        if df.empty:
+            return f"Could not fetch {symbol} price at this time."
+        last_price = price_format.format(df['close'].iloc[-1])
+        return f"Current {symbol} price: {last_price} USD"
+
+    def rsi_answer(self, task, symbol):
+        df = self.fetch_bars(symbol.replace('/', ''))
+        if df.empty:
+            return f"Could not fetch data to compute RSI for {symbol}."
+        rsi, _ = self.compute_indicators(df, symbol)
+        return f"Current RSI for {symbol}: {rsi:.2f}"
+
+    def advice_answer(self, task, symbol, question):
+        """
+        Worker side of an advice question. Returns the text to show, or None
+        when the answer was streamed into response_text as it arrived.
+        """
+        if symbol not in ('EUR/USD', 'BTC/USD'):
+            return None
+        df = self.fetch_bars(symbol.replace('/', ''))
+        if df.empty:
+            return None
+        task.check()
+        last_price = df['close'].iloc[-1]
+        rsi, macd = self.compute_indicators(df, symbol)
+        predicted_price_tuple = self.predict_next_price(df, symbol=symbol)
+        if isinstance(predicted_price_tuple, tuple):
+            predicted_price, signal_quality = predicted_price_tuple
+        else:
+            predicted_price, signal_quality = predicted_price_tuple, 'weak'
+        task.check()
+
+        # Support/Resistance from last 50 closes
+        closes = df['close'].tail(50)
+        support = closes.min()
+        resistance = closes.max()
+
+        # If signal is 'none', warn user and suggest no trade
+        if signal_quality == 'none':
+            symbol_display = symbol if symbol else "the asset"
+            if len(df) > 20 and support and resistance:
+                alert_line = (
+                    f"• Set alerts for {symbol_display} crossing above resistance (${resistance:.2f}) "
+                    f"or below support (${support:.2f}).\n"
+                )
+            else:
+                alert_line = "• Set alerts for key support/resistance levels based on recent price action.\n"
+            return (
+                "⚠️ No strong trading signal detected. Market is likely choppy or trend is weak.\n"
+                "Actionable advice:\n"
+                "• Review higher timeframes for clarity.\n"
+                "• Avoid overtrading in choppy conditions.\n"
+                f"{alert_line}"
+                "• Consider reducing position size or staying in cash until a clear trend emerges.\n"
+            )
+
+        prompt = self.build_prompt(question, last_price, rsi, macd, predicted_price, symbol=symbol)
+        cache_key = self.advice_cache.key(symbol, question, last_price, rsi, macd, predicted_price)
+
+        header = ""
+        if predicted_price is not None:
+            header = f"Model Predicted Next Price: {predicted_price:.5f} ({signal_quality.upper()} SIGNAL)\n\n"
+
+        def start_answer():
+            # The spinner only covers the wait for the first token
+            self.hide_loading()
+            self.response_text.delete(1.0, tk.END)
+            self.response_text.insert(tk.END, header)
+
+        def append_text(text):
+            self.response_text.insert(tk.END, text)
+            self.response_text.see(tk.END)
+
+        started = []
+
+        def show_text(text):
+            task.check()
+            if not started:
+                started.append(True)
+                task.post(start_answer)
+            task.post(append_text, text)
+
+        advice = self.get_openai_response(prompt, cache_key, on_text=show_text)
+
+        # Once the whole answer is in, append pip distances for its entry/SL/TP
+        tail = ""
+        with tracing.span('pips'):
+            pip_info = llm_advice.pip_distances(advice, symbol)
+        if pip_info:
+            tail += f"\n{pip_info}\n"
+
+        # --- Explainable AI: Visual Indicator Breakdown ---
+        breakdown = "\n\n--- Indicator Breakdown ---\n"
+        breakdown += f"RSI: {rsi:.2f} "
+        if rsi > 70:
+            breakdown += "(Overbought)\n"
+        elif rsi < 30:
+            breakdown += "(Oversold)\n"
+        else:
+            breakdown += "(Neutral)\n"
+        breakdown += f"MACD: {macd:.2f} "
+        if macd > 0:
+            breakdown += "(Bullish)\n"
+        elif macd < 0:
+            breakdown += "(Bearish)\n"
+        else:
+            breakdown += "(Neutral)\n"
+        breakdown += f"Support: {support:.2f}\n"
+        breakdown += f"Resistance: {resistance:.2f}\n"
+        task.post(append_text, tail + breakdown)
+        return None
 
     def upload_file(self):
         """Upload a file for analysis"""
@@ -1101,8 +922,10 @@ class TradingAssistant:
 
     def preview_image(self, file_path):
         """Preview the uploaded image file"""
+        from PIL import Image, ImageTk
         try:
             img = Image.open(file_path)
+            img.draft('RGB', (400, 400))
             img.thumbnail((400, 400))
             self.uploaded_image = ImageTk.PhotoImage(img)
 
@@ -1114,15 +937,12 @@ class TradingAssistant:
     def preview_text_file(self, file_path):
         """Preview the uploaded text or CSV file"""
         try:
-            if file_path.endswith('.csv'):
-                df = pd.read_csv(file_path)
-                text = df.head().to_string()
-            elif file_path.endswith('.xlsx'):
-                df = pd.read_excel(file_path)
-                text = df.head().to_string()
+            import table_digest
+            if table_digest.is_table(file_path):
+                text = table_digest.preview(file_path)
             else:
-                with open(file_path, 'r') as file:
-                    text = file.read()
+                with open(file_path, 'r', errors='replace') as file:
+                    text = file.read(PREVIEW_CHARS)
 
             self.response_text.delete(1.0, tk.END)
             self.response_text.insert(tk.END, text)
@@ -1130,153 +950,51 @@ class TradingAssistant:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open file: {str(e)}")
 
-    def chunk_content(self, content, max_chunk_size=4000):
-        """Split content into chunks that fit within token limits"""
-        chunks = []
-        current_chunk = ""
-        
-        # For text content, split by newlines
-        if isinstance(content, str):
-            lines = content.split('\n')
-            for line in lines:
-                if len(current_chunk) + len(line) < max_chunk_size:
-                    current_chunk += line + '\n'
-                else:
-                    chunks.append(current_chunk)
-                    current_chunk = line + '\n'
-            if current_chunk:
-                chunks.append(current_chunk)
-        # For binary content (images), use base64 chunks
-        else:
-            encoded = base64.b64encode(content).decode('utf-8')
-            chunk_size = max_chunk_size
-            chunks = [encoded[i:i+chunk_size] for i in range(0, len(encoded), chunk_size)]
-        
-        return chunks
-
     def analyze_file(self):
         """Analyze the uploaded file with OpenAI"""
         if not self.uploaded_file_path:
             messagebox.showwarning("No file selected", "Please upload a file first.")
             return
 
-        self.show_loading("Analyzing file...")
         self.status_bar.config(text="Analyzing file...")
-        self.root.update()
+        self.run_in_background('analysis', "Analyzing file...", self.file_analysis, self.uploaded_file_path,
+                               error_format="Failed to analyze file: {}")
 
-        try:
-            with open(self.uploaded_file_path, 'rb') as file:
-                file_content = file.read()
+    def file_analysis(self, task, file_path):
+        """Worker side of analyze_file; returns the text to show"""
+        import image_analysis
+        import table_digest
+        if table_digest.is_table(file_path):
+            # Stream the table into a local digest; only the digest goes to the model
+            with tracing.span('digest'):
+                digest = table_digest.digest_file(
+                    file_path, check=task.check,
+                    on_progress=lambda rows: task.post(
+                        lambda: self.status_bar.config(text=f"Read {rows:,} rows...")))
+            task.check()
+            with tracing.span('openai'):
+                return file_analysis.analyze_digest(digest.to_text(file_path), self.active_openai_key,
+                                                    check=task.check)
 
-            # Determine if it's a text file
-            is_text = False
-            ext = os.path.splitext(self.uploaded_file_path)[1].lower()
-            if ext in ['.txt', '.csv', '.xlsx']:
+        content = None
+        if os.path.splitext(file_path)[1].lower() == '.txt':
+            with open(file_path, 'rb') as file:
                 try:
-                    file_content = file_content.decode('utf-8')
-                    is_text = True
+                    content = file.read().decode('utf-8')
                 except UnicodeDecodeError:
                     pass
+        if content is None:
+            # Images are cropped and downscaled before upload; repeat uploads come from the cache
+            with tracing.span('image'):
+                return image_analysis.analyze_image(file_path, self.active_openai_key, check=task.check)
 
-            if not is_text:
-                try:
-                    # For images, convert to base64 and analyze
-                    encoded_image = base64.b64encode(file_content).decode('utf-8')
-                    base64_uri = f"data:image/jpeg;base64,{encoded_image}"
-                    
-                    openai.api_key = self.openai_key or self.openai_entry.get()
-                    response = openai.ChatCompletion.create(
-                        model="gpt-4o",  # Updated to use new model
-                        messages=[
-                            {
-                                "role": "user",
-                                "content": [
-                                    {
-                                        "type": "text",
-                                        "text": "Please analyze this trading chart or financial image and provide detailed observations about the market patterns, indicators, and potential trading opportunities:"
-                                    },
-                                    {
-                                        "type": "image_url",
-                                        "image_url": {
-                                            "url": base64_uri,
-                                            "detail": "high"
-                                        }
-                                    }
-                                ]
-                            }
-                        ],
-                        max_tokens=500
-                    )
-                    
-                    analysis = response.choices[0].message['content']
-                    self.response_text.delete(1.0, tk.END)
-                    self.response_text.insert(tk.END, f"Image Analysis:\n{analysis}")
-                    
-                except Exception as e:
-                    self.response_text.delete(1.0, tk.END)
-                    self.response_text.insert(tk.END, f"Error analyzing image: {str(e)}")
-                    # Fallback to gpt-4o-mini if gpt-4o fails
-                    try:
-                        response = openai.ChatCompletion.create(
-                            model="gpt-4o-mini",
-                            messages=[
-                                {
-                                    "role": "user",
-                                    "content": [
-                                        {
-                                            "type": "text",
-                                            "text": "Please analyze this trading chart or financial image and provide detailed observations about the market patterns, indicators, and potential trading opportunities:"
-                                        },
-                                        {
-                                            "type": "image_url",
-                                            "image_url": {
-                                                "url": base64_uri,
-                                                "detail": "high"
-                                            }
-                                        }
-                                    ]
-                                }
-                            ],
-                            max_tokens=500
-                        )
-                        analysis = response.choices[0].message['content']
-                        self.response_text.delete(1.0, tk.END)
-                        self.response_text.insert(tk.END, f"Image Analysis (using backup model):\n{analysis}")
-                    except Exception as e2:
-                        self.response_text.insert(tk.END, f"\nBackup model also failed: {str(e2)}")
-            else:
-                # Handle text files with chunks
-                chunks = self.chunk_content(file_content)
-                combined_analysis = ""
-                
-                for i, chunk in enumerate(chunks):
-                    try:
-                        response = openai.ChatCompletion.create(
-                            model="gpt-4",
-                            messages=[
-                                {"role": "system", "content": "You are a data analysis expert."},
-                                {"role": "user", "content": f"Analyze this text content (part {i+1}/{len(chunks)}):\n\n{chunk}\n\nProvide insights and summary."}
-                            ],
-                            max_tokens=1000
-                        )
-                        chunk_analysis = response.choices[0].message['content']
-                        combined_analysis += f"\nPart {i+1} Analysis:\n{chunk_analysis}\n"
-                        
-                        self.status_bar.config(text=f"Analyzing part {i+1}/{len(chunks)}...")
-                        self.root.update()
-                        
-                    except Exception as e:
-                        combined_analysis += f"\nError analyzing part {i+1}: {str(e)}\n"
-
-                # Display combined analysis
-                self.response_text.delete(1.0, tk.END)
-                self.response_text.insert(tk.END, combined_analysis)
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to analyze file: {str(e)}")
-        finally:
-            self.hide_loading()
-            self.status_bar.config(text="Ready")
+        # Text files: parts are analyzed concurrently, then merged into one summary
+        with tracing.span('openai'):
+            return file_analysis.analyze_text(
+                content, self.active_openai_key, check=task.check,
+                on_progress=lambda done, total: task.post(
+                    lambda: self.status_bar.config(text=f"Analyzed part {done}/{total}..."))
+            )
 
     def handle_drop(self, event):
         """Handle dropped files"""
@@ -1301,15 +1019,22 @@ class TradingAssistant:
         else:
             messagebox.showerror("Error", "File not found")
 
-    def show_loading(self, message="Loading..."):
-        """Show loading indicator"""
+    def show_loading(self, message="Loading...", on_cancel=None):
+        """
+        Show loading indicator. With on_cancel the work runs in the
+        background: the dialog gets a Cancel button and doesn't grab input,
+        so the main window stays usable.
+        """
         self.loading_window = tk.Toplevel(self.root)
         self.loading_window.transient(self.root)
-        self.loading_window.grab_set()
+        if on_cancel is None:
+            self.loading_window.grab_set()
+        else:
+            self.loading_window.protocol("WM_DELETE_WINDOW", on_cancel)
         
         # Center the loading window
         window_width = 200
-        window_height = 100
+        window_height = 100 if on_cancel is None else 140
         screen_width = self.root.winfo_screenwidth()
         screen_height = self.root.winfo_screenheight()
         x = (screen_width - window_width) // 2
@@ -1327,7 +1052,10 @@ class TradingAssistant:
         self.progress = ttk.Progressbar(self.loading_window, mode='indeterminate')
         self.progress.pack(fill='x', padx=20)
         self.progress.start(10)
-        
+
+        if on_cancel is not None:
+            ttk.Button(self.loading_window, text="Cancel", command=on_cancel).pack(pady=10)
+            return
         self.root.update()
 
     def hide_loading(self):
@@ -1335,6 +1063,7 @@ class TradingAssistant:
         if hasattr(self, 'loading_window'):
             self.progress.stop()
             self.loading_window.destroy()
+            del self.loading_window
 
     def setup_bindings(self):
         """Setup keyboard shortcuts"""
@@ -1379,7 +1108,7 @@ class TradingAssistant:
         """Show settings dialog"""
         settings = tk.Toplevel(self.root)
         settings.title("Settings")
-        settings.geometry("400x300")
+        settings.geometry("400x520")
         settings.transient(self.root)
         settings.grab_set()
         
@@ -1414,12 +1143,44 @@ class TradingAssistant:
                                  state='readonly')
         style_combo.grid(row=2, column=1, sticky='ew', padx=5)
         
+        # Prediction search budget
+        ttk.Label(main_frame, text="Prediction CPUs (0 = all):").grid(row=3, column=0, sticky='w', pady=5)
+        cpus_var = tk.StringVar(value=str(self.preferences['search_cpus']))
+        cpus_entry = ttk.Entry(main_frame, textvariable=cpus_var)
+        cpus_entry.grid(row=3, column=1, sticky='ew', padx=5)
+        
+        ttk.Label(main_frame, text="Prediction Deadline (seconds):").grid(row=4, column=0, sticky='w', pady=5)
+        deadline_var = tk.StringVar(value=str(self.preferences['search_deadline']))
+        deadline_entry = ttk.Entry(main_frame, textvariable=deadline_var)
+        deadline_entry.grid(row=4, column=1, sticky='ew', padx=5)
+        
+        # Diagnostics: stage tracing, allocations and profiling
+        tracing_var = tk.BooleanVar(value=self.preferences['tracing'])
+        ttk.Checkbutton(main_frame, text="Trace analysis stages (breakdown in status bar)",
+                        variable=tracing_var).grid(row=5, column=0, columnspan=2, sticky='w', pady=2)
+        memory_var = tk.BooleanVar(value=self.preferences['trace_memory'])
+        ttk.Checkbutton(main_frame, text="Track allocations per stage (slower)",
+                        variable=memory_var).grid(row=6, column=0, columnspan=2, sticky='w', pady=2)
+        profile_var = tk.BooleanVar(value=self.preferences['trace_profile'])
+        ttk.Checkbutton(main_frame, text="Profile traced requests with cProfile",
+                        variable=profile_var).grid(row=7, column=0, columnspan=2, sticky='w', pady=2)
+        
+        export_frame = ttk.Frame(main_frame)
+        export_frame.grid(row=8, column=0, columnspan=2, sticky='w', pady=5)
+        ttk.Button(export_frame, text="Save Trace...", command=self.save_trace).grid(row=0, column=0, padx=(0, 5))
+        ttk.Button(export_frame, text="Save Profile...", command=self.save_profile).grid(row=0, column=1)
+        
         # Save button
         def save_settings():
             try:
                 self.preferences['update_interval'] = int(interval_var.get())
                 self.preferences['font_size'] = int(font_var.get())
                 self.preferences['chart_style'] = style_var.get()
+                self.preferences['search_cpus'] = int(cpus_var.get())
+                self.preferences['search_deadline'] = float(deadline_var.get())
+                self.preferences['tracing'] = tracing_var.get()
+                self.preferences['trace_memory'] = memory_var.get()
+                self.preferences['trace_profile'] = profile_var.get()
                 self.save_preferences()
                 self.apply_settings()
                 settings.destroy()
@@ -1427,7 +1188,33 @@ class TradingAssistant:
                 messagebox.showerror("Error", "Invalid input values")
         
         save_btn = ttk.Button(main_frame, text="Save", command=save_settings, style='Accent.TButton')
-        save_btn.grid(row=3, column=0, columnspan=2, pady=20)
+        save_btn.grid(row=9, column=0, columnspan=2, pady=20)
+        
+    def save_trace(self):
+        """Save the recorded stage spans as Chrome trace JSON (also opens in speedscope)"""
+        path = filedialog.asksaveasfilename(defaultextension='.json', initialfile='trace.json',
+                                            filetypes=[("Chrome trace", "*.json")])
+        if not path:
+            return
+        try:
+            count = tracing.save_trace(path)
+            self.status_bar.config(text=f"Saved {count:,} spans to {path}")
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save trace: {str(e)}")
+
+    def save_profile(self):
+        """Save the merged cProfile stats of the profiled requests"""
+        path = filedialog.asksaveasfilename(defaultextension='.prof', initialfile='profile.prof',
+                                            filetypes=[("cProfile stats", "*.prof")])
+        if not path:
+            return
+        try:
+            if tracing.save_profile(path):
+                self.status_bar.config(text=f"Saved profile to {path}")
+            else:
+                messagebox.showinfo("Profile", "Nothing profiled yet. Enable profiling and ask a question first.")
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save profile: {str(e)}")
         
     def apply_settings(self):
         """Apply settings changes"""
@@ -1439,8 +1226,9 @@ class TradingAssistant:
         # Update chart style
         self.update_chart()
         
+        self.configure_tracing()
+        
         # Update market data refresh interval
-        self.root.after_cancel(self._after_id)
         self.update_market_data()
         
     def load_window_geometry(self):
@@ -1461,39 +1249,26 @@ class TradingAssistant:
     def on_closing(self):
         """Handle window closing"""
         self.save_preferences()
+        self.tasks.shutdown()
+        predictor.shutdown_pool()
         self.root.destroy()
         
     def zoom_chart(self, factor):
         """Zoom in or out of the chart"""
         try:
-            current_xlim = self.ax.get_xlim()
-            current_ylim = self.ax.get_ylim()
-            
-            # Calculate new limits
-            center_x = sum(current_xlim) / 2
-            center_y = sum(current_ylim) / 2
-            
-            new_range_x = (current_xlim[1] - current_xlim[0]) / factor
-            new_range_y = (current_ylim[1] - current_ylim[0]) / factor
-            
-            self.ax.set_xlim(center_x - new_range_x/2, center_x + new_range_x/2)
-            self.ax.set_ylim(center_y - new_range_y/2, center_y + new_range_y/2)
-            
-            self.canvas.draw()
+            self.chart.zoom(factor)
         except Exception as e:
             self.status_bar.config(text=f"Error zooming chart: {str(e)}")
 
     def reset_zoom(self):
         """Reset chart zoom to default"""
         try:
-            if not self.price_history.empty:
-                self.ax.relim()
-                self.ax.autoscale()
-                self.canvas.draw()
+            if self.chart is not None and self.price_history is not None and not self.price_history.empty:
+                self.chart.reset_zoom()
         except Exception as e:
             self.status_bar.config(text=f"Error resetting zoom: {str(e)}")
 
-    # ...existing code...
+
 if __name__ == "__main__":
     try:
         root = tkdnd.Tk()  # Use tkdnd.Tk() instead of tk.Tk() for drag and drop support
@@ -0,0 +1,178 @@
+"""
+Walk-forward evaluation of the price predictor.
+
+Features are computed once for the whole history. Each fold fits the
+random forest + linear regression pair on the rows before it, then
+scores the next `refit_every` rows out-of-sample in a single vectorized
+predict call. Folds are independent, so a whole parameter grid can be
+evaluated across the predictor's process pool.
+
+Cost is roughly one forest fit per fold per parameter set. A year of 5m
+bars (~105k) with --refit-every 288 (daily refits) is ~4.4k fits for the
+default grid, a few minutes across 8 cores; the live model refits every
+bar, so smaller values track it more closely at a proportional cost.
+
+Usage:
+    python walk_forward.py --symbol BTCUSD --refit-every 50
+    python walk_forward.py --csv btc_5m.csv --expanding --json report.json
+"""
+import argparse
+import json
+import sys
+import time
+import warnings
+from concurrent.futures import as_completed
+
+import numpy as np
+
+import predictor
+from features import FeatureMatrix
+
+QUALITIES = ('strong', 'weak', 'none')
+
+
+def evaluate(features, params, refit_every=20, expanding=False, start=None):
+    """
+    Walk `params` forward over `features`. The training window is the
+    live model's window + 15 rows (or everything so far if expanding).
+    Returns a report dict with out-of-sample error, directional hit rate
+    and a signal-quality confusion table.
+    """
+    warnings.filterwarnings("ignore")
+    window = params['window']
+    train_rows = window + 15
+    n = len(features)
+    first = max(start or train_rows, train_rows)
+    started = time.perf_counter()
+
+    rows, preds = [], []
+    fits = 0
+    for end in range(first, n, refit_every):
+        test = np.arange(end - 1, min(end - 1 + refit_every, n - 1))
+        if len(test) == 0:
+            break
+        lo = 0 if expanding else end - train_rows
+        rf, lr = predictor.fit_models(
+            features.X[lo:end - 1], features.close[lo + 1:end],
+            params['n_estimators'], params['max_depth']
+        )
+        fits += 1
+        X_test = features.X[test]
+        rows.append(test)
+        preds.append((rf.predict(X_test) + lr.predict(X_test)) / 2)
+
+    report = {'params': params, 'predictions': 0, 'fits': fits}
+    if not rows:
+        return report
+    rows = np.concatenate(rows)
+    preds = np.concatenate(preds)
+    last = features.close[rows]
+    actual = features.close[rows + 1]
+    errors = preds - actual
+    hits = np.sign(preds - last) == np.sign(actual - last)
+    qualities = predictor.signal_qualities(features, preds, rows, window)
+
+    confusion = {}
+    for quality in QUALITIES:
+        mask = qualities == quality
+        count = int(mask.sum())
+        confusion[quality] = {
+            'count': count,
+            'hits': int(hits[mask].sum()),
+            'misses': int(count - hits[mask].sum()),
+            'hit_rate': float(hits[mask].mean()) if count else None,
+            'mae': float(np.abs(errors[mask]).mean()) if count else None,
+        }
+
+    report.update({
+        'predictions': int(len(rows)),
+        'mae': float(np.abs(errors).mean()),
+        'rmse': float(np.sqrt((errors ** 2).mean())),
+        'mape': float(np.abs(errors / actual).mean() * 100),
+        'hit_rate': float(hits.mean()),
+        'confusion': confusion,
+        'seconds': time.perf_counter() - started,
+    })
+    return report
+
+
+def evaluate_grid(closes, grid=predictor.PARAM_GRID, refit_every=20, expanding=False, cpus=None):
+    """Evaluate every parameter set in `grid`; returns reports sorted by MAE"""
+    features = FeatureMatrix(closes)
+    start = max(params['window'] for params in grid) + 15
+    cpus = predictor.cpu_budget(cpus)
+    if cpus == 1:
+        reports = [evaluate(features, params, refit_every, expanding, start) for params in grid]
+    else:
+        pool = predictor.get_pool(min(cpus, len(grid)))
+        futures = [pool.submit(evaluate, features, params, refit_every, expanding, start) for params in grid]
+        reports = [future.result() for future in as_completed(futures)]
+    return sorted(reports, key=lambda r: r.get('mae', float('inf')))
+
+
+def format_report(reports):
+    lines = [
+        f"{'window':>6} {'trees':>5} {'depth':>5} {'preds':>6} {'fits':>5} "
+        f"{'MAE':>12} {'RMSE':>12} {'MAPE%':>7} {'hit%':>6} "
+        f"{'strong hit%':>11} {'weak hit%':>9} {'none hit%':>9}"
+    ]
+    for r in reports:
+        if not r['predictions']:
+            continue
+        p = r['params']
+        quality_rates = []
+        for quality in QUALITIES:
+            rate = r['confusion'][quality]['hit_rate']
+            count = r['confusion'][quality]['count']
+            quality_rates.append('-' if rate is None else f"{rate * 100:.1f} ({count})")
+        lines.append(
+            f"{p['window']:>6} {p['n_estimators']:>5} {p['max_depth']:>5} {r['predictions']:>6} {r['fits']:>5} "
+            f"{r['mae']:>12.6f} {r['rmse']:>12.6f} {r['mape']:>7.3f} {r['hit_rate'] * 100:>6.1f} "
+            f"{quality_rates[0]:>11} {quality_rates[1]:>9} {quality_rates[2]:>9}"
+        )
+    return '\n'.join(lines)
+
+
+def load_closes(symbol=None, csv_path=None, bars=None):
+    if csv_path:
+        import pandas as pd
+        df = pd.read_csv(csv_path)
+        column = next((c for c in df.columns if c.lower() == 'close'), None)
+        if column is None:
+            raise ValueError(f"No 'close' column in {csv_path}")
+        closes = df[column].to_numpy(dtype=np.float64)
+        return closes[-bars:] if bars else closes
+    from bar_store import get_store
+    return np.array(get_store().tail(symbol, bars).close)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Walk-forward evaluation of the price predictor")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--symbol', default='BTCUSD', help="bar store symbol (default BTCUSD)")
+    source.add_argument('--csv', help="CSV file with a close column")
+    parser.add_argument('--bars', type=int, help="only use the last N bars")
+    parser.add_argument('--refit-every', type=int, default=20, help="bars scored per fit (default 20)")
+    parser.add_argument('--expanding', action='store_true', help="train on all prior bars instead of a rolling window")
+    parser.add_argument('--cpus', type=int, default=0, help="process pool size (0 = all cores)")
+    parser.add_argument('--json', help="also write the reports to this file")
+    args = parser.parse_args(argv)
+
+    closes = load_closes(args.symbol, args.csv, args.bars)
+    if len(closes) < predictor.MIN_BARS:
+        print(f"Need at least {predictor.MIN_BARS} bars, got {len(closes)}", file=sys.stderr)
+        return 1
+    started = time.perf_counter()
+    reports = evaluate_grid(closes, refit_every=args.refit_every, expanding=args.expanding, cpus=args.cpus)
+    print(f"Walk-forward over {len(closes)} bars, {len(reports)} parameter sets, "
+          f"{time.perf_counter() - started:.1f}s")
+    print(format_report(reports))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+    predictor.shutdown_pool()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
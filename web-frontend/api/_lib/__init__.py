@@ -0,0 +1,15 @@
+"""
+Modules the handlers share. Everything here except utils.py is a copy of
+the top-level module of the same name, written by sync_vercel_lib.py at
+the repository root; edit the original and re-run it. Importing this
+package puts it on sys.path, so the copies import each other by their
+top-level names as they do in the desktop app and web_api.py.
+
+The leading underscore keeps Vercel from deploying these as functions.
+"""
+import os
+import sys
+
+_here = os.path.dirname(os.path.abspath(__file__))
+if _here not in sys.path:
+    sys.path.insert(0, _here)
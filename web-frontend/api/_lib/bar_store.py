@@ -0,0 +1,278 @@
+"""
+Append-only OHLCV bar store backed by memory-mapped column files.
+
+Every symbol gets its own directory under the store root holding one
+fixed-width file per column (timestamp, open, high, low, close, volume)
+plus an 8-byte row counter. Files are preallocated and grown by doubling,
+so appends never rewrite existing rows and readers get zero-copy NumPy
+views straight out of the page cache.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+COLUMNS = [
+    ('timestamp', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.float64),
+]
+
+Bars = namedtuple('Bars', [name for name, _ in COLUMNS])
+
+# Bar width in seconds. Frankfurter only publishes daily reference rates,
+# so EURUSD bars are daily; Binance quotes are bucketed into 5m bars.
+BAR_INTERVALS = {'BTCUSD': 300, 'EURUSD': 86400}
+DEFAULT_INTERVAL = 300
+
+# Number of bars the fetchers keep backfilled for indicators/prediction
+HISTORY_BARS = 100
+
+INITIAL_CAPACITY = 4096
+
+
+def normalize_symbol(symbol):
+    """Map 'EUR/USD', 'eurusd', ... to the store key 'EURUSD'"""
+    return symbol.upper().replace('/', '')
+
+
+def bar_interval(symbol):
+    return BAR_INTERVALS.get(normalize_symbol(symbol), DEFAULT_INTERVAL)
+
+
+class _SymbolFiles:
+    """Memory-mapped column files for a single symbol"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        count_path = os.path.join(path, 'count')
+        if not os.path.exists(count_path):
+            with open(count_path, 'wb') as f:
+                f.write(np.zeros(1, dtype=np.int64).tobytes())
+        self.count = np.memmap(count_path, dtype=np.int64, mode='r+', shape=(1,))
+        self.lock_path = os.path.join(path, 'lock')
+        self.capacity = 0
+        self.columns = {}
+        self.remap(INITIAL_CAPACITY)
+
+    def remap(self, min_capacity):
+        """(Re)open the column maps with room for at least min_capacity rows"""
+        capacity = min_capacity
+        for name, dtype in COLUMNS:
+            file_path = os.path.join(self.path, name + '.bin')
+            if os.path.exists(file_path):
+                capacity = max(capacity, os.path.getsize(file_path) // np.dtype(dtype).itemsize)
+        for name, dtype in COLUMNS:
+            file_path = os.path.join(self.path, name + '.bin')
+            needed = capacity * np.dtype(dtype).itemsize
+            with open(file_path, 'ab') as f:
+                if os.path.getsize(file_path) < needed:
+                    f.truncate(needed)
+            self.columns[name] = np.memmap(file_path, dtype=dtype, mode='r+', shape=(capacity,))
+        self.capacity = capacity
+
+    def ensure_capacity(self, rows):
+        if rows > self.capacity:
+            capacity = self.capacity
+            while capacity < rows:
+                capacity *= 2
+            self.remap(capacity)
+
+
+class BarStore:
+    """Per-symbol columnar OHLCV store with append-only writes"""
+
+    def __init__(self, root=None):
+        self.root = root or os.getenv(
+            'BAR_STORE_DIR',
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'bars')
+        )
+        self._files = {}
+        self._lock = threading.RLock()
+
+    def _symbol_files(self, symbol):
+        key = normalize_symbol(symbol)
+        files = self._files.get(key)
+        if files is None:
+            with self._lock:
+                files = self._files.get(key)
+                if files is None:
+                    files = _SymbolFiles(os.path.join(self.root, key))
+                    self._files[key] = files
+        return files
+
+    @contextmanager
+    def _write_lock(self, files):
+        """Serialize writers across threads and, where supported, processes"""
+        with self._lock:
+            fd = None
+            if fcntl is not None:
+                fd = os.open(files.lock_path, os.O_RDWR | os.O_CREAT)
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                # Another process may have grown the files since we mapped them
+                files.ensure_capacity(int(files.count[0]))
+                yield
+            finally:
+                if fd is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
+
+    def count(self, symbol):
+        return int(self._symbol_files(symbol).count[0])
+
+    def tail(self, symbol, n=None):
+        """Return the last n bars (all bars if n is None) as read-only array views"""
+        files = self._symbol_files(symbol)
+        count = int(files.count[0])
+        if count > files.capacity:
+            with self._lock:
+                files.ensure_capacity(count)
+        start = 0 if n is None else max(count - n, 0)
+        views = []
+        for name, _ in COLUMNS:
+            view = files.columns[name][start:count].view(np.ndarray)
+            view.flags.writeable = False
+            views.append(view)
+        return Bars(*views)
+
+    def frame(self, symbol, n=None):
+        """The last n bars as a pandas DataFrame indexed by bar time"""
+        import pandas as pd
+        view = self.tail(symbol, n)
+        return pd.DataFrame({
+            'open': view.open,
+            'high': view.high,
+            'low': view.low,
+            'close': view.close,
+            'volume': view.volume,
+        }, index=pd.to_datetime(view.timestamp, unit='s').rename('timestamp'))
+
+    def last_timestamp(self, symbol):
+        files = self._symbol_files(symbol)
+        count = int(files.count[0])
+        if count == 0:
+            return None
+        if count > files.capacity:
+            with self._lock:
+                files.ensure_capacity(count)
+        return int(files.columns['timestamp'][count - 1])
+
+    def append_bars(self, symbol, timestamps, opens, highs, lows, closes, volumes=None):
+        """
+        Append complete bars. Rows at or before the last stored timestamp are
+        skipped so backfills can overlap what is already on disk.
+        Returns the number of rows written.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if volumes is None:
+            volumes = np.zeros(len(timestamps))
+        values = {
+            'timestamp': timestamps,
+            'open': np.asarray(opens, dtype=np.float64),
+            'high': np.asarray(highs, dtype=np.float64),
+            'low': np.asarray(lows, dtype=np.float64),
+            'close': np.asarray(closes, dtype=np.float64),
+            'volume': np.asarray(volumes, dtype=np.float64),
+        }
+        files = self._symbol_files(symbol)
+        with self._write_lock(files):
+            count = int(files.count[0])
+            if count:
+                keep = timestamps > files.columns['timestamp'][count - 1]
+                values = {name: col[keep] for name, col in values.items()}
+            rows = len(values['timestamp'])
+            if rows == 0:
+                return 0
+            files.ensure_capacity(count + rows)
+            for name, col in values.items():
+                files.columns[name][count:count + rows] = col
+            # Publish the rows only after the data is in place
+            files.count[0] = count + rows
+        return rows
+
+    def append_quote(self, symbol, price, timestamp=None, volume=0.0):
+        """
+        Fold a spot quote into the current bar, opening a new bar when the
+        quote falls into a later interval. Quotes older than the last bar
+        are ignored.
+        """
+        interval = bar_interval(symbol)
+        timestamp = int(time.time() if timestamp is None else timestamp)
+        bucket = timestamp - timestamp % interval
+        price = float(price)
+        files = self._symbol_files(symbol)
+        with self._write_lock(files):
+            count = int(files.count[0])
+            cols = files.columns
+            last = int(cols['timestamp'][count - 1]) if count else None
+            if last is not None and bucket == last:
+                i = count - 1
+                cols['high'][i] = max(cols['high'][i], price)
+                cols['low'][i] = min(cols['low'][i], price)
+                cols['close'][i] = price
+                cols['volume'][i] += volume
+            elif last is None or bucket > last:
+                files.ensure_capacity(count + 1)
+                cols['timestamp'][count] = bucket
+                cols['open'][count] = price
+                cols['high'][count] = price
+                cols['low'][count] = price
+                cols['close'][count] = price
+                cols['volume'][count] = volume
+                files.count[0] = count + 1
+
+    def needs_backfill(self, symbol, min_bars=HISTORY_BARS):
+        """True when the store is too short or has fallen behind the live feed"""
+        count = self.count(symbol)
+        if count < min_bars:
+            return True
+        # Allow a few missing intervals (weekends for daily FX bars)
+        return self.last_timestamp(symbol) < time.time() - 4 * bar_interval(symbol)
+
+    def record_quote(self, symbol, price, timestamp=None, min_bars=HISTORY_BARS, history=None):
+        """
+        Fold the live quote into the store. If the store is short or stale
+        and a history(symbol, limit) source is given, backfill from it first.
+        """
+        if history is not None and self.needs_backfill(symbol, min_bars):
+            try:
+                bars = history(symbol, max(min_bars, HISTORY_BARS))
+            except Exception as e:
+                print(f"Error backfilling {normalize_symbol(symbol)} history:", str(e))
+                bars = None
+            if bars is not None:
+                self.append_bars(symbol, *bars)
+        self.append_quote(symbol, price, timestamp)
+
+
+def frankfurter_timestamp(date_str):
+    """Epoch seconds for a Frankfurter 'YYYY-MM-DD' rate date"""
+    return int(datetime.strptime(date_str, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide store rooted at BAR_STORE_DIR"""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = BarStore()
+    return _default_store
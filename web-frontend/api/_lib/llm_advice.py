@@ -0,0 +1,119 @@
+"""
+GPT-4 advice completions, blocking or streamed token by token, and the
+pip-distance post-processing applied to a finished answer.
+"""
+import os
+import re
+import threading
+import time
+
+import metrics
+
+MODEL = "gpt-4"
+SYSTEM_PROMPT = "You are a trading expert."
+# Seconds before a completion request is abandoned
+TIMEOUT = float(os.getenv('LLM_TIMEOUT', '60'))
+
+LLM_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+LLM_SECONDS = metrics.Histogram('llm_request_duration_seconds', 'Chat completion latency, to the last token when streamed',
+                                ('model', 'mode'), buckets=LLM_BUCKETS)
+LLM_FIRST_TOKEN = metrics.Histogram('llm_time_to_first_token_seconds', 'Streamed chat completion time to first text',
+                                    ('model',), buckets=LLM_BUCKETS)
+LLM_TOKENS = metrics.Counter('llm_tokens_total', 'Tokens reported by the API (streams: completion chunks received)',
+                             ('model', 'kind'))
+LLM_ERRORS = metrics.Counter('llm_errors_total', 'Failed chat completions', ('model', 'mode'))
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def client(api_key):
+    """
+    OpenAI client for api_key, kept so its connection pool is reused.
+    OPENAI_BASE_URL points it at another endpoint (the load test's stub).
+    """
+    from openai import OpenAI
+    with _clients_lock:
+        llm = _clients.get(api_key)
+        if llm is None:
+            # No SDK retries: callers cache, fall back or retry on their own
+            llm = _clients[api_key] = OpenAI(api_key=api_key, timeout=TIMEOUT, max_retries=0)
+    return llm
+
+
+def _messages(prompt):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def complete(prompt, api_key):
+    """Whole completion text"""
+    llm = client(api_key)
+    start = time.perf_counter()
+    try:
+        response = llm.chat.completions.create(model=MODEL, messages=_messages(prompt))
+    except Exception:
+        LLM_ERRORS.inc(MODEL, 'blocking')
+        raise
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - start, MODEL, 'blocking')
+    if response.usage is not None:
+        LLM_TOKENS.inc(MODEL, 'prompt', amount=response.usage.prompt_tokens)
+        LLM_TOKENS.inc(MODEL, 'completion', amount=response.usage.completion_tokens)
+    return response.choices[0].message.content
+
+
+def stream_completion(prompt, api_key):
+    """Yield completion text pieces as the API produces them"""
+    llm = client(api_key)
+    start = time.perf_counter()
+    chunks = 0
+    try:
+        for chunk in llm.chat.completions.create(model=MODEL, messages=_messages(prompt), stream=True):
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                if not chunks:
+                    LLM_FIRST_TOKEN.observe(time.perf_counter() - start, MODEL)
+                chunks += 1
+                yield text
+    except Exception:
+        LLM_ERRORS.inc(MODEL, 'stream')
+        raise
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - start, MODEL, 'stream')
+        LLM_TOKENS.inc(MODEL, 'completion', amount=chunks)
+
+
+def pip_size(symbol):
+    return 0.0001 if symbol.upper().replace('/', '') == 'EURUSD' else 1.0
+
+
+def pip_distances(advice, symbol):
+    """
+    Stop-loss/take-profit distances in pips for the entry, SL and TP quoted
+    in the advice, as extra lines to show after it ('' if not found).
+    """
+    size = pip_size(symbol)
+    entry_match = re.search(r'Entry[:\s]*([\d\.]+)', advice)
+    sl_match = re.search(r'Stop[- ]?Loss[:\s]*([\d\.]+)', advice, re.IGNORECASE)
+    tp_match = re.search(r'Take[- ]?Profit[:\s]*([\d\.]+)', advice, re.IGNORECASE)
+    try:
+        entry = float(entry_match.group(1)) if entry_match else None
+        sl = float(sl_match.group(1)) if sl_match else None
+        tp = float(tp_match.group(1)) if tp_match else None
+    except ValueError:
+        # e.g. a sentence-ending '.' captured on its own
+        return ""
+    pip_info = ""
+    if entry is not None and sl is not None:
+        sl_pips = abs(entry - sl) / size
+        pip_info += f"\nStop-Loss Distance: {sl_pips:.1f} pips"
+    if entry is not None and tp is not None:
+        tp_pips = abs(tp - entry) / size
+        pip_info += f"\nTake-Profit Distance: {tp_pips:.1f} pips"
+    return pip_info
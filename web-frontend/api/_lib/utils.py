@@ -0,0 +1,79 @@
+import json
+import math
+import os
+from bar_store import BarStore, HISTORY_BARS
+from market_data import MarketDataClient, SUPPORTED_SYMBOLS
+from quote_cache import QuoteCache
+from indicators import StoreIndicators
+
+# Everything here is module-level so it survives across invocations in a
+# warm container. The price/rsi path only needs numpy and requests; pandas,
+# ta and openai stay out of it. /price only needs a quote, so it doesn't
+# touch the bar store; history and indicators are loaded for /rsi and
+# /advice only.
+
+# The deployment bundle is read-only; /tmp survives for the life of a warm container
+store = BarStore(os.getenv('BAR_STORE_DIR', '/tmp/bars'))
+# Reuses its keep-alive connections across warm invocations
+client = MarketDataClient(store=store)
+# Streaming indicator state; warm invocations only fold in bars added since the last one
+indicator_state = StoreIndicators(store)
+
+def load_snapshot(symbol, bars=HISTORY_BARS):
+    price = client.quote(symbol)
+    closes = store.tail(symbol, bars).close
+    values = indicator_state.latest(symbol)
+    return {
+        'price': price,
+        'rsi': float(values['rsi']),
+        'macd': float(values['macd']),
+        'support': float(closes.min()),
+        'resistance': float(closes.max()),
+        'last_price': float(closes[-1]),
+    }
+
+def load_quote(symbol):
+    # Not recorded: recording backfills the store's history first
+    return client.quote(symbol, record=False)
+
+# A frozen container can't refresh in the background: a refresh started
+# after a response only runs when the next request thaws the container,
+# so that request would get the stale value anyway. By default a value is
+# therefore either fresh or reloaded while the request waits. Once the
+# store holds history, a snapshot reload is one quote request plus an O(1)
+# indicator update, so the wait is about one upstream round trip.
+CACHE_SETTINGS = {
+    'ttl': float(os.getenv('QUOTE_CACHE_TTL', '5')),
+    'max_stale': float(os.getenv('QUOTE_CACHE_MAX_STALE', '0')),
+    'negative_ttl': float(os.getenv('QUOTE_CACHE_NEGATIVE_TTL', '5')),
+}
+quotes = QuoteCache(load_quote, **CACHE_SETTINGS)
+snapshots = QuoteCache(load_snapshot, **CACHE_SETTINGS)
+
+def get_quote(symbol):
+    """Cached price for a supported symbol, or None"""
+    if symbol not in SUPPORTED_SYMBOLS:
+        return None
+    return quotes.get(symbol)
+
+def get_snapshot(symbol):
+    """Cached quote and indicators for a supported symbol, or None"""
+    if symbol not in SUPPORTED_SYMBOLS:
+        return None
+    return snapshots.get(symbol)
+
+def json_value(value):
+    # NaN (still warming up) isn't valid JSON
+    return None if math.isnan(value) else value
+
+def json_response(body, status=200):
+    return (json.dumps(body), status, {'Content-Type': 'application/json'})
+
+def openai_key():
+    """OPENAI_API_KEY, loading a local .env only when the environment doesn't have it"""
+    key = os.getenv('OPENAI_API_KEY')
+    if not key:
+        from dotenv import load_dotenv
+        load_dotenv()
+        key = os.getenv('OPENAI_API_KEY')
+    return key
@@ -1,36 +1,29 @@
 import os
-import json
-from utils import get_price_series, compute_rsi, compute_macd
-from dotenv import load_dotenv
-import openai
+import _lib  # puts the shared modules on sys.path
+from utils import get_snapshot, json_response, json_value, openai_key
+from advice_cache import AdviceCache
+import llm_advice
 
-load_dotenv()
+# Lives in /tmp like the bar store, so a warm container answers repeats from it
+advice_cache = AdviceCache(os.getenv('ADVICE_CACHE_PATH', '/tmp/advice_cache.sqlite'))
 
 def handler(request):
     if request.method != "POST":
-        return (
-            json.dumps({'error': 'Method not allowed'}),
-            405,
-            {'Content-Type': 'application/json'}
-        )
+        return json_response({'error': 'Method not allowed'}, 405)
     try:
         data = request.json
         symbol = data.get('symbol', 'BTCUSD').upper()
         question = data.get('question', '')
 
-        closes = get_price_series(symbol)
-        if closes is None:
-            return (
-                json.dumps({'error': 'Could not fetch price data for indicators.'}),
-                500,
-                {'Content-Type': 'application/json'}
-            )
+        snapshot = get_snapshot(symbol)
+        if snapshot is None:
+            return json_response({'error': 'Could not fetch price data for indicators.'}, 500)
 
-        rsi_val = compute_rsi(closes)
-        macd_val = compute_macd(closes)
-        support = float(closes.min())
-        resistance = float(closes.max())
-        last_price = float(closes.iloc[-1])
+        rsi_val = snapshot['rsi']
+        macd_val = snapshot['macd']
+        support = snapshot['support']
+        resistance = snapshot['resistance']
+        last_price = snapshot['last_price']
 
         prompt = (
             f"You are a professional trading assistant. Analyze {symbol} based on the following:\n"
@@ -45,43 +38,30 @@ def handler(request):
             "After your advice, add a brief explanation of which indicators or patterns (e.g., RSI, MACD, support/resistance, price action) were most influential in your recommendation, and why."
         )
 
-        openai_key = os.getenv("OPENAI_API_KEY")
-        if not openai_key:
-            return (
-                json.dumps({'error': 'OpenAI API key not set in .env. Please add OPENAI_API_KEY to your .env file.'}),
-                500,
-                {'Content-Type': 'application/json'}
-            )
-
-        openai.api_key = openai_key
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a trading expert."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        ai_advice = response.choices[0].message['content']
+        cache_key = advice_cache.key(symbol, question, last_price, rsi_val, macd_val)
+        ai_advice = advice_cache.get(cache_key)
+        cached = ai_advice is not None
+        if not cached:
+            key = openai_key()
+            if not key:
+                return json_response(
+                    {'error': 'OpenAI API key not set in .env. Please add OPENAI_API_KEY to your .env file.'}, 500)
+            # openai is imported on this first uncached call, not when the container starts
+            ai_advice = llm_advice.complete(prompt, key)
+            advice_cache.put(cache_key, ai_advice)
 
-        return (
-            json.dumps({
-                'symbol': symbol,
-                'question': question,
-                'advice': ai_advice,
-                'indicators': {
-                    'price': last_price,
-                    'rsi': rsi_val,
-                    'macd': macd_val,
-                    'support': support,
-                    'resistance': resistance
-                }
-            }),
-            200,
-            {'Content-Type': 'application/json'}
-        )
+        return json_response({
+            'symbol': symbol,
+            'question': question,
+            'advice': ai_advice,
+            'cached': cached,
+            'indicators': {
+                'price': last_price,
+                'rsi': json_value(rsi_val),
+                'macd': json_value(macd_val),
+                'support': support,
+                'resistance': resistance
+            }
+        })
     except Exception as e:
-        return (
-            json.dumps({'error': f'OpenAI API error: {str(e)}'}),
-            500,
-            {'Content-Type': 'application/json'}
-        )
\ No newline at end of file
+        return json_response({'error': f'OpenAI API error: {str(e)}'}, 500)
@@ -1,35 +1,17 @@
-from utils import get_btcusd_price, get_eurusd_price
-import json
+import _lib  # puts the shared modules on sys.path
+from utils import get_quote, json_response
+from market_data import SUPPORTED_SYMBOLS
 
 def handler(request):
     try:
         symbol = request.args.get('symbol', 'BTCUSD').upper()
-        if symbol == 'BTCUSD':
-            price = get_btcusd_price()
-        elif symbol == 'EURUSD':
-            price = get_eurusd_price()
-        else:
-            return (
-                json.dumps({'error': 'Unsupported symbol'}),
-                400,
-                {'Content-Type': 'application/json'}
-            )
+        if symbol not in SUPPORTED_SYMBOLS:
+            return json_response({'error': 'Unsupported symbol'}, 400)
+        price = get_quote(symbol)
         if price is not None:
-            return (
-                json.dumps({'symbol': symbol, 'price': price}),
-                200,
-                {'Content-Type': 'application/json'}
-            )
+            return json_response({'symbol': symbol, 'price': price})
         else:
-            return (
-                json.dumps({'error': 'Could not fetch price'}),
-                500,
-                {'Content-Type': 'application/json'}
-            )
+            return json_response({'error': 'Could not fetch price'}, 500)
     except Exception as e:
         print("API ERROR:", str(e))
-        return (
-            json.dumps({'error': f'Exception: {str(e)}'}),
-            500,
-            {'Content-Type': 'application/json'}
-        )
\ No newline at end of file
+        return json_response({'error': f'Exception: {str(e)}'}, 500)
@@ -1,19 +1,10 @@
-from utils import get_price_series, compute_rsi
-import json
+import _lib  # puts the shared modules on sys.path
+from utils import get_snapshot, json_response, json_value
 
 def handler(request):
     symbol = request.args.get('symbol', 'BTCUSD').upper()
-    closes = get_price_series(symbol)
-    if closes is not None:
-        rsi_val = compute_rsi(closes)
-        return (
-            json.dumps({'symbol': symbol, 'rsi': rsi_val}),
-            200,
-            {'Content-Type': 'application/json'}
-        )
+    snapshot = get_snapshot(symbol)
+    if snapshot is not None:
+        return json_response({'symbol': symbol, 'rsi': json_value(snapshot['rsi'])})
     else:
-        return (
-            json.dumps({'error': 'Could not compute RSI'}),
-            500,
-            {'Content-Type': 'application/json'}
-        )
\ No newline at end of file
+        return json_response({'error': 'Could not compute RSI'}, 500)
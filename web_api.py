@@ -1,17 +1,29 @@
-from flask import Flask, request, jsonify
-import requests
-import numpy as np
-from ta.momentum import RSIIndicator
-from ta.trend import MACD
+import fast_start
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-import pandas as pd
+import json
+import math
 import os
+import threading
+import time
 
 import traceback
+from bar_store import get_store, HISTORY_BARS
+from market_data import SUPPORTED_SYMBOLS, get_client
+from quote_cache import QuoteCache
+from shared_cache import SharedCache
+from live_feed import LiveFeed
+from advice_cache import get_advice_cache
+import llm_advice
+import metrics
+from indicators import FEATURES, StoreIndicators
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
+# Streaming indicator state per symbol, advanced as new bars reach the store
+indicator_state = StoreIndicators(get_store())
+
 @app.errorhandler(Exception)
 def handle_exception(e):
     tb = traceback.format_exc()
@@ -23,77 +35,208 @@ def handle_exception(e):
     }
     return jsonify(response), 500
 
-def get_btcusd_price():
-    url = "https://api.binance.com/api/v3/ticker/price?symbol=BTCUSDT"
-    r = requests.get(url, timeout=10)
-    data = r.json()
-    if 'price' in data:
-        return float(data['price'])
-    return None
-
-def get_eurusd_price():
-    url = "https://api.frankfurter.app/latest?from=EUR&to=USD"
-    r = requests.get(url, timeout=10)
-    data = r.json()
-    if 'rates' in data and 'USD' in data['rates']:
-        return float(data['rates']['USD'])
-    return None
-
-def get_price_series(symbol):
-    if symbol == 'BTCUSD':
-        price = get_btcusd_price()
-        if price is not None:
-            closes = [price * (1 + n) for n in np.random.normal(0, 0.002, 100)]
-            return pd.Series(closes)
-    elif symbol == 'EURUSD':
-        price = get_eurusd_price()
-        if price is not None:
-            closes = [price * (1 + n) for n in np.random.normal(0, 0.0002, 100)]
-            return pd.Series(closes)
-    return None
+REQUEST_SECONDS = metrics.Histogram('http_request_duration_seconds', 'Time to build each response',
+                                    ('route', 'method', 'status'))
+IN_FLIGHT = metrics.Gauge('http_requests_in_flight', 'Requests being handled', ('route',))
+SNAPSHOT_SECONDS = metrics.Histogram('snapshot_load_duration_seconds',
+                                     'Snapshot loads: live quote (with any backfill) and indicator update', ('stage',))
+
+def load_snapshot(symbol, bars=HISTORY_BARS):
+    """Refresh the live quote and derive everything the routes serve from it"""
+    start = time.perf_counter()
+    price = get_client().quote(symbol)
+    quoted = time.perf_counter()
+    closes = get_store().tail(symbol, bars).close
+    values = indicator_state.latest(symbol)
+    SNAPSHOT_SECONDS.observe(quoted - start, 'quote')
+    SNAPSHOT_SECONDS.observe(time.perf_counter() - quoted, 'indicators')
+    indicators = {name: float(values[name]) for name in FEATURES}
+    indicators['support'] = float(closes.min())
+    indicators['resistance'] = float(closes.max())
+    return {
+        'price': price,
+        'rsi': indicators['rsi'],
+        'macd': indicators['macd'],
+        'support': indicators['support'],
+        'resistance': indicators['resistance'],
+        'last_price': float(closes[-1]),
+        'indicators': indicators,
+    }
+
+INDICATOR_NAMES = FEATURES + ['support', 'resistance']
+
+# Shared by every route; TTLs in seconds. SHARED_CACHE=1 (set by gunicorn.conf.py)
+# also shares loaded snapshots between the server's worker processes.
+snapshots = QuoteCache(
+    load_snapshot,
+    ttl=float(os.getenv('QUOTE_CACHE_TTL', '5')),
+    max_stale=float(os.getenv('QUOTE_CACHE_MAX_STALE', '30')),
+    negative_ttl=float(os.getenv('QUOTE_CACHE_NEGATIVE_TTL', '5')),
+    shared=SharedCache() if os.getenv('SHARED_CACHE', '0') == '1' else None,
+)
+
+# LLM answers keyed on bucketed market state + normalized question
+advice_cache = get_advice_cache()
+
+# Completions in flight per process. Capping them below the server's thread
+# count keeps slow GPT-4 calls from tying up every thread while /price and
+# /rsi wait; over the cap, /advice answers 503 after a short wait.
+advice_slots = threading.BoundedSemaphore(int(os.getenv('ADVICE_CONCURRENCY', '8')))
+ADVICE_QUEUE_TIMEOUT = float(os.getenv('ADVICE_QUEUE_TIMEOUT', '0.5'))
+ADVICE_BUSY = 'The advice service is busy. Please try again in a few seconds.'
+ADVICE_REJECTED = metrics.Counter('advice_rejected_total', 'Advice requests turned away with every completion slot busy')
+
+def limit_advice(slots):
+    """Allow `slots` completions at once in this process"""
+    global advice_slots
+    advice_slots = threading.BoundedSemaphore(max(1, slots))
+
+def json_value(value):
+    # NaN (still warming up) isn't valid JSON
+    return None if math.isnan(value) else value
 
 @app.route('/price')
 def price():
     symbol = request.args.get('symbol', 'BTCUSD').upper()
-    if symbol == 'BTCUSD':
-        price = get_btcusd_price()
-    elif symbol == 'EURUSD':
-        price = get_eurusd_price()
-    else:
+    if symbol not in SUPPORTED_SYMBOLS:
         return jsonify({'error': 'Unsupported symbol'}), 400
-    if price is not None:
-        return jsonify({'symbol': symbol, 'price': price})
+    snapshot = snapshots.get(symbol)
+    if snapshot is not None:
+        return jsonify({'symbol': symbol, 'price': json_value(snapshot['price'])})
     else:
         return jsonify({'error': 'Could not fetch price'}), 500
 
 @app.route('/rsi')
 def rsi():
     symbol = request.args.get('symbol', 'BTCUSD').upper()
-    closes = get_price_series(symbol)
-    if closes is not None:
-        rsi_val = float(RSIIndicator(closes).rsi().iloc[-1])
-        return jsonify({'symbol': symbol, 'rsi': rsi_val})
+    snapshot = snapshots.get(symbol) if symbol in SUPPORTED_SYMBOLS else None
+    if snapshot is not None:
+        return jsonify({'symbol': symbol, 'rsi': json_value(snapshot['rsi'])})
     else:
         return jsonify({'error': 'Could not compute RSI'}), 500
 
+def list_arg(name, default):
+    """Values of a comma-separated and/or repeated query argument"""
+    values = [v.strip() for arg in request.args.getlist(name) for v in arg.split(',') if v.strip()]
+    return values or list(default)
+
+def batch_snapshots(symbols):
+    """Snapshots for the supported symbols, plus per-symbol errors"""
+    symbols = list(dict.fromkeys(s.upper().replace('/', '') for s in symbols))
+    errors = {s: 'Unsupported symbol' for s in symbols if s not in SUPPORTED_SYMBOLS}
+    found = snapshots.get_many([s for s in symbols if s not in errors])
+    for symbol, snapshot in found.items():
+        if snapshot is None:
+            errors[symbol] = snapshots.error(symbol) or 'Could not fetch price'
+    return {s: v for s, v in found.items() if v is not None}, errors
+
+@app.route('/prices')
+def prices():
+    found, errors = batch_snapshots(list_arg('symbols', SUPPORTED_SYMBOLS))
+    return jsonify({
+        'prices': {symbol: snapshot['price'] for symbol, snapshot in found.items()},
+        'errors': errors
+    })
+
+@app.route('/indicators')
+def indicators():
+    """
+    Latest indicator values for several symbols, filtered to `names`. Each
+    symbol's values are read from its cached snapshot, which its streaming
+    engine (indicators.StoreIndicators) keeps up to date one bar at a time,
+    instead of one vectorized pass over every symbol's history per request.
+    """
+    names = [name.lower() for name in list_arg('names', INDICATOR_NAMES)]
+    unknown = [name for name in names if name not in INDICATOR_NAMES]
+    if unknown:
+        return jsonify({'error': f"Unknown indicators: {', '.join(unknown)}", 'available': INDICATOR_NAMES}), 400
+    found, errors = batch_snapshots(list_arg('symbols', SUPPORTED_SYMBOLS))
+    result = {}
+    for symbol, snapshot in found.items():
+        values = snapshot['indicators']
+        result[symbol] = {name: json_value(values[name]) for name in names}
+        result[symbol]['price'] = snapshot['price']
+    return jsonify({'indicators': result, 'errors': errors})
+
+def live_ticks(symbols):
+    ticks = {}
+    for symbol, snapshot in snapshots.get_many(symbols).items():
+        if snapshot is not None:
+            ticks[symbol] = {
+                'symbol': symbol,
+                'price': snapshot['price'],
+                'rsi': json_value(snapshot['rsi']),
+                'macd': json_value(snapshot['macd']),
+                'time': time.time(),
+            }
+    return ticks
+
+# One upstream poll loop shared by every /stream client
+live_feed = LiveFeed(live_ticks, SUPPORTED_SYMBOLS, interval=float(os.getenv('STREAM_INTERVAL', '2')))
+STREAM_HEARTBEAT = 15
+
+# Open streams per process. Under a threaded server each one holds a thread
+# until the client leaves, so the cap keeps threads free for the other
+# routes; over it, /stream answers 503 at once.
+stream_slots = threading.BoundedSemaphore(int(os.getenv('STREAM_LIMIT', '100')))
+STREAM_BUSY = 'Too many open streams on this server. Please try again later.'
+STREAM_REJECTED = metrics.Counter('stream_rejected_total', 'Stream requests turned away with every stream slot taken')
+
+def limit_streams(slots):
+    """Allow `slots` open streams at once in this process"""
+    global stream_slots
+    stream_slots = threading.BoundedSemaphore(max(1, slots))
+
+@app.route('/stream')
+def stream():
+    """Server-sent events: a 'tick' event whenever a subscribed symbol's price or indicators change"""
+    symbols = [s.upper().replace('/', '') for s in list_arg('symbols', SUPPORTED_SYMBOLS)]
+    unsupported = [s for s in symbols if s not in SUPPORTED_SYMBOLS]
+    if unsupported:
+        return jsonify({'error': f"Unsupported symbol: {', '.join(unsupported)}"}), 400
+    slots = stream_slots
+    if not slots.acquire(blocking=False):
+        STREAM_REJECTED.inc()
+        return jsonify({'error': STREAM_BUSY}), 503, {'Retry-After': '30'}
+    sub = live_feed.subscribe(symbols)
+
+    def events():
+        yield 'retry: 3000\n\n'
+        while True:
+            ticks = sub.get(timeout=STREAM_HEARTBEAT)
+            if not ticks:
+                # Keeps proxies from closing an idle connection
+                yield ': keepalive\n\n'
+            for tick in ticks:
+                yield f"event: tick\ndata: {json.dumps(tick)}\n\n"
+
+    def close():
+        live_feed.unsubscribe(sub)
+        slots.release()
+
+    response = Response(events(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # The server calls this when the client leaves, even before the first event
+    response.call_on_close(close)
+    return response
+
 @app.route('/advice', methods=['POST'])
 def advice():
-    import openai
     from dotenv import load_dotenv
     load_dotenv()
     data = request.get_json()
     symbol = data.get('symbol', 'BTCUSD').upper()
     question = data.get('question', '')
 
-    closes = get_price_series(symbol)
-    if closes is None:
+    snapshot = snapshots.get(symbol) if symbol in SUPPORTED_SYMBOLS else None
+    if snapshot is None:
         return jsonify({'error': 'Could not fetch price data for indicators.'}), 500
 
-    rsi_val = float(RSIIndicator(closes).rsi().iloc[-1])
-    macd_val = float(MACD(closes).macd_diff().iloc[-1])
-    support = float(closes.min())
-    resistance = float(closes.max())
-    last_price = float(closes.iloc[-1])
+    rsi_val = snapshot['rsi']
+    macd_val = snapshot['macd']
+    support = snapshot['support']
+    resistance = snapshot['resistance']
+    last_price = snapshot['last_price']
 
     # Build prompt for OpenAI
     prompt = (
@@ -109,43 +252,154 @@ def advice():
         "After your advice, add a brief explanation of which indicators or patterns (e.g., RSI, MACD, support/resistance, price action) were most influential in your recommendation, and why."
     )
 
+    indicators = {
+        'price': last_price,
+        'rsi': json_value(rsi_val),
+        'macd': json_value(macd_val),
+        'support': support,
+        'resistance': resistance
+    }
+    cache_key = advice_cache.key(symbol, question, last_price, rsi_val, macd_val)
+    ai_advice = advice_cache.get(cache_key)
+    cached = ai_advice is not None
     openai_key = os.getenv("OPENAI_API_KEY")
-    if not openai_key:
+    if not cached and not openai_key:
         return jsonify({
             'error': 'OpenAI API key not set in .env. Please add OPENAI_API_KEY to your .env file.'
         }), 500
 
-    openai.api_key = openai_key
+    def result(ai_advice):
+        return {
+            'symbol': symbol,
+            'question': question,
+            'advice': ai_advice,
+            'pip_info': llm_advice.pip_distances(ai_advice, symbol),
+            'cached': cached,
+            'indicators': indicators
+        }
+
+    if data.get('stream') or request.args.get('stream'):
+        return Response(stream_advice(prompt, openai_key, cache_key, ai_advice, result),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    if not cached:
+        if not advice_slots.acquire(timeout=ADVICE_QUEUE_TIMEOUT):
+            ADVICE_REJECTED.inc()
+            return jsonify({'error': ADVICE_BUSY}), 503, {'Retry-After': '5'}
+        try:
+            ai_advice = llm_advice.complete(prompt, openai_key)
+        except Exception as e:
+            return jsonify({'error': f'OpenAI API error: {str(e)}'}), 500
+        finally:
+            advice_slots.release()
+        advice_cache.put(cache_key, ai_advice)
+
+    return jsonify(result(ai_advice))
+
+def stream_advice(prompt, openai_key, cache_key, cached_advice, result):
+    """
+    Server-sent events for /advice: a 'token' event per completion chunk as
+    it arrives, then 'done' with the same body the JSON response has (or
+    'error').
+    """
+    if cached_advice is not None:
+        yield f"event: token\ndata: {json.dumps({'text': cached_advice})}\n\n"
+        yield f"event: done\ndata: {json.dumps(result(cached_advice))}\n\n"
+        return
+    if not advice_slots.acquire(timeout=ADVICE_QUEUE_TIMEOUT):
+        ADVICE_REJECTED.inc()
+        yield f"event: error\ndata: {json.dumps({'error': ADVICE_BUSY})}\n\n"
+        return
+    parts = []
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a trading expert."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        ai_advice = response.choices[0].message['content']
+        for text in llm_advice.stream_completion(prompt, openai_key):
+            parts.append(text)
+            yield f"event: token\ndata: {json.dumps({'text': text})}\n\n"
     except Exception as e:
-        return jsonify({'error': f'OpenAI API error: {str(e)}'}), 500
+        yield f"event: error\ndata: {json.dumps({'error': f'OpenAI API error: {str(e)}'})}\n\n"
+        return
+    finally:
+        advice_slots.release()
+    ai_advice = ''.join(parts)
+    advice_cache.put(cache_key, ai_advice)
+    yield f"event: done\ndata: {json.dumps(result(ai_advice))}\n\n"
 
-    return jsonify({
-        'symbol': symbol,
-        'question': question,
-        'advice': ai_advice,
-        'indicators': {
-            'price': last_price,
-            'rsi': rsi_val,
-            'macd': macd_val,
-            'support': support,
-            'resistance': resistance
-        }
-    })
+@app.route('/stats')
+def stats():
+    return jsonify({'quote_cache': snapshots.stats(), 'stream': live_feed.stats(),
+                    'advice_cache': advice_cache.stats()})
 
 @app.route('/')
 def index():
     return jsonify({'message': 'Trading Assistant API is running.'})
 
+@app.route('/metrics')
+def metrics_page():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@metrics.collector
+def cache_metrics():
+    quote, advice = snapshots.stats(), advice_cache.stats()
+    return [
+        ('quote_cache_lookups_total', 'counter', 'Snapshot cache lookups by outcome',
+         [({'outcome': name}, quote[name]) for name in ('hits', 'stale_hits', 'misses', 'negative_hits')]),
+        ('quote_cache_shared_hits_total', 'counter', 'Snapshot loads answered by another worker process',
+         [({}, quote['shared_hits'])]),
+        ('advice_cache_lookups_total', 'counter', 'Advice cache lookups by outcome',
+         [({'outcome': name}, advice[name]) for name in ('hits', 'disk_hits', 'misses')]),
+        # A ratio doesn't add up across workers; sum the lookups counters for the overall one
+        ('cache_hit_ratio', 'gauge', 'Share of lookups served from cache since start',
+         [({'cache': 'quote'}, quote['hit_rate']), ({'cache': 'advice'}, advice['hit_rate'])], 'pid'),
+        ('advice_cache_entries', 'gauge', 'Advice answers held in memory', [({}, advice['entries'])]),
+        ('stream_subscribers', 'gauge', 'Open /stream connections', [({}, live_feed.stats()['subscribers'])]),
+    ]
+
+def route_label():
+    # The URL rule, not the path, so unknown paths don't each get a series
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+@app.before_request
+def start_timer():
+    request.environ['metrics.start'] = time.perf_counter()
+    IN_FLIGHT.inc(route_label())
+
+@app.after_request
+def record_request(response):
+    start = request.environ.get('metrics.start')
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, route_label(), request.method, str(response.status_code))
+    return response
+
+@app.teardown_request
+def finish_request(error=None):
+    if 'metrics.start' in request.environ:
+        IN_FLIGHT.dec(route_label())
+
+@app.after_request
+def startup_report(response):
+    if fast_start.mark('first response'):
+        fast_start.report('API startup')
+    return response
+
+def warm_snapshots():
+    snapshots.get_many(list(SUPPORTED_SYMBOLS))
+    fast_start.mark('snapshots warm')
+
+def start_warm_up():
+    """Prefetch every symbol's snapshot and, in fast-start mode, import openai in the background"""
+    threading.Thread(target=warm_snapshots, name='warm-snapshots', daemon=True).start()
+    if fast_start.ENABLED:
+        fast_start.warm_up(['openai'])
+
+# openai is only needed by /advice; import it in the background (or now with FAST_START=0)
+fast_start.preload(['openai'])
+fast_start.mark('imports')
+# gunicorn.conf.py turns this off while preloading and calls start_warm_up() in each worker
+if os.getenv('WARM_UP', '1') != '0':
+    start_warm_up()
+
 if __name__ == '__main__':
-    import os
+    # Development server; production runs under gunicorn: gunicorn -c gunicorn.conf.py web_api:app
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port, debug=True)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=port, debug=os.getenv('FLASK_DEBUG') == '1', threaded=True)
\ No newline at end of file